@@ -1,14 +1,16 @@
 import json
-import duckdb
 import csv
 import os
 from collections import defaultdict
 
-TEST_DIR = '/Users/paul/workspace/OLAPBench/test'
+from util import resultstore
 
-TPCH_PATH = '/duckdb/tpchSf1IdType_int64_sorted.csv'
+# result files relative to the test directory, can be overridden through the environment
+TEST_DIR = os.environ.get('OLAPBENCH_TEST_DIR', 'test')
+
+TPCH_PATH = os.environ.get('OLAPBENCH_BASELINE', '/duckdb/tpchSf1IdType_int64_sorted.csv')
 # TPCH_STRING_PATH = '/duckdb/tpchSf1IdType_int64_random.csv'
-TPCH_STRING_PATH = '/duckdb/tpchSf1IdType_uuid_v4.csv'
+TPCH_STRING_PATH = os.environ.get('OLAPBENCH_COMPARISON', '/duckdb/tpchSf1IdType_uuid_v4.csv')
 OUTPUT_CSV = 'analysis/operator_timings.csv'
 
 
@@ -64,7 +66,7 @@ def analyze_operator_timings(csv_path, dbms_filter=None):
     Analyze operator timings for a given CSV file, optionally filtered by DBMS.
 
     Args:
-        csv_path: Path to the CSV file
+        csv_path: Path to the result CSV or result store (.duckdb)
         dbms_filter: Optional DBMS name to filter by (e.g., 'duckdb', 'clickhouse')
 
     Returns:
@@ -79,7 +81,7 @@ def analyze_operator_timings(csv_path, dbms_filter=None):
         if dbms_filter:
             where_clause += f" AND dbms = '{dbms_filter}'"
 
-        data = duckdb.sql(f"SELECT plan, query FROM '{TEST_DIR}{csv_path}' {where_clause};")
+        data = resultstore.connect(TEST_DIR + csv_path).sql(f"SELECT plan, query FROM results_csv {where_clause};")
 
         for row in data.fetchall():
             plan_str = row[0] if row else None
@@ -149,7 +151,7 @@ def get_available_dbms(csv_path):
         List of unique DBMS names
     """
     try:
-        data = duckdb.sql(f"SELECT DISTINCT dbms FROM '{TEST_DIR}{csv_path}' WHERE state = 'success' ORDER BY dbms;")
+        data = resultstore.connect(TEST_DIR + csv_path).sql("SELECT DISTINCT dbms FROM results_csv WHERE state = 'success' ORDER BY dbms;")
         return [row[0] for row in data.fetchall()]
     except Exception as e:
         print(f"Error getting DBMS list from {csv_path}: {e}")
@@ -172,7 +174,7 @@ def extract_all_operator_timings_to_csv(output_path):
 
     for csv_path, benchmark_name in datasets:
         try:
-            data = duckdb.sql(f"SELECT dbms, query, plan FROM '{TEST_DIR}{csv_path}' WHERE state = 'success';")
+            data = resultstore.connect(TEST_DIR + csv_path).sql("SELECT dbms, query, plan FROM results_csv WHERE state = 'success';")
 
             for row in data.fetchall():
                 system_name = row[0]
@@ -1,11 +1,13 @@
 import json
+import os
 
-import duckdb
+from util import resultstore
 
-TEST_DIR = '/Users/paul/workspace/OLAPBench/test'
+# result files relative to the test directory, can be overridden through the environment
+TEST_DIR = os.environ.get('OLAPBENCH_TEST_DIR', 'test')
 
-TPCH_PATH = '/duckdb/tpchSf1.csv'
-TPCH_STRING_PATH = '/duckdb/tpchUuidSf1.csv'
+TPCH_PATH = os.environ.get('OLAPBENCH_BASELINE', '/duckdb/tpchSf1.csv')
+TPCH_STRING_PATH = os.environ.get('OLAPBENCH_COMPARISON', '/duckdb/tpchUuidSf1.csv')
 
 
 def iterate_children(plan, depth=0):
@@ -16,7 +18,7 @@ def iterate_children(plan, depth=0):
         iterate_children(child, depth + 1)
 
 def main():
-    data = duckdb.sql(f"SELECT plan FROM '{TEST_DIR}{TPCH_PATH}' OFFSET 1;")
+    data = resultstore.connect(TEST_DIR + TPCH_PATH).sql("SELECT plan FROM results_csv WHERE plan IS NOT NULL;")
     for (plan,) in data.fetchall():
         plan_parsed = json.loads(plan)
         plan = plan_parsed['queryPlan']
@@ -0,0 +1,49 @@
+import argparse
+
+from queryplan.plandiff import diff_plans
+from util import resultstore
+
+
+def load_plan(path: str, query: str, title: str = None) -> (str, str):
+    """The stored plan and the system of a query in a result csv or result store, of the given system title if the file has several"""
+    where = "query = ? and plan is not null"
+    parameters = [query]
+    if title is not None:
+        where += " and title = ?"
+        parameters.append(title)
+
+    with resultstore.connect(path) as connection:
+        rows = connection.execute(f"select title, plan, dbms from results_csv where {where}", parameters).fetchall()
+
+    if len(rows) == 0:
+        raise SystemExit(f"No plan for {query} in {path}")
+    if len({title for title, _, _ in rows}) > 1:
+        raise SystemExit(f"{path} has plans of several systems for {query}, select one with --title")
+    # the last plan if the query was executed several times
+    return rows[-1][1], rows[-1][2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the plans of a query in two result files")
+    parser.add_argument("before", help="result csv or result store with the old plan")
+    parser.add_argument("after", help="result csv or result store with the new plan")
+    parser.add_argument("query", help="query name, e.g. 1.sql")
+    parser.add_argument("--title", dest="title", type=str, default=None, help="system title in both files")
+    parser.add_argument("--title-before", dest="title_before", type=str, default=None)
+    parser.add_argument("--title-after", dest="title_after", type=str, default=None)
+    parser.add_argument("--html", dest="html", type=str, default=None, help="write an html report to this path")
+    parser.add_argument("--raw", dest="raw", action="store_true", help="compare the plans without normalizing them")
+    args = parser.parse_args()
+
+    before, before_dbms = load_plan(args.before, args.query, args.title_before or args.title)
+    after, after_dbms = load_plan(args.after, args.query, args.title_after or args.title)
+    diff = diff_plans(before, after, before_dbms, after_dbms, raw=args.raw)
+
+    if args.html is not None:
+        with open(args.html, "w") as file:
+            file.write(diff.render_html())
+    print(diff.render_text())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import argparse
+import csv
+import math
+import os
+import tempfile
+from typing import List, Optional, Tuple
+
+import duckdb
+
+from queryplan.clean.normalize import normalize
+from queryplan.compactplan import AttributeTable, CompactPlan
+from queryplan.queryoperator import OperatorType
+from queryplan.queryplan import decode_query_plan
+from util import resultstore
+
+# operators that join their inputs, counted by the join count of an operator
+JOIN_TYPES = {OperatorType.Join, OperatorType.GroupJoin}
+
+SCHEMA = [
+    "create table queries (benchmark varchar, title varchar, dbms varchar, version varchar, query varchar, runtime double, plan integer)",
+    "create table operators (plan integer, operator varchar, depth integer, joins integer, estimated double, exact double, qerror double)",
+]
+
+VIEWS = {
+    "by_operator": """
+        select dbms, version, operator,
+            count(*) as operators,
+            median(qerror) as median, quantile_cont(qerror, 0.9) as p90, max(qerror) as max,
+            exp(avg(ln(qerror))) as geomean
+        from queries q join operators o using (plan)
+        group by all
+        order by dbms, version, geomean desc
+    """,
+    "by_depth": """
+        select dbms, version, depth,
+            count(*) as operators,
+            median(qerror) as median, quantile_cont(qerror, 0.9) as p90, max(qerror) as max,
+            exp(avg(ln(qerror))) as geomean
+        from queries q join operators o using (plan)
+        group by all
+        order by dbms, version, depth
+    """,
+    "by_joins": """
+        select dbms, version, joins,
+            count(*) as operators,
+            median(qerror) as median, quantile_cont(qerror, 0.9) as p90, max(qerror) as max,
+            exp(avg(ln(qerror))) as geomean
+        from queries q join operators o using (plan)
+        group by all
+        order by dbms, version, joins
+    """,
+    # the largest q-error of every query and its runtime relative to the fastest system on the query (> 1: slower)
+    "query_errors": """
+        select *, runtime / min(runtime) over (partition by benchmark, query) as slowdown
+        from (
+            select q.benchmark, q.title, q.dbms, q.version, q.query, q.runtime,
+                max(o.qerror) as max_qerror,
+                max(o.qerror) filter (o.operator in ('Join', 'GroupJoin')) as max_join_qerror
+            from queries q join operators o using (plan)
+            where q.runtime > 0
+            group by all
+        )
+    """,
+    # how well the estimation error explains the slowdowns of a system, and its slow and misestimated queries
+    "runtime": """
+        select dbms, version,
+            count(*) as queries,
+            corr(ln(max_qerror), ln(slowdown)) as correlation,
+            count(*) filter (max_qerror >= 100 and slowdown >= 2) as misestimated_slow,
+            list(query order by slowdown desc) filter (max_qerror >= 100 and slowdown >= 2) as misestimated_slow_queries
+        from query_errors
+        group by all
+        order by dbms, version
+    """,
+}
+
+
+def q_error(estimated: Optional[float], exact: Optional[float]) -> Optional[float]:
+    """max(estimated / exact, exact / estimated), cardinalities below 1 count as 1"""
+    if estimated is None or exact is None:
+        return None
+    estimated, exact = max(float(estimated), 1.0), max(float(exact), 1.0)
+    return max(estimated / exact, exact / estimated)
+
+
+def operator_errors(plan: CompactPlan) -> List[Tuple[str, int, int, float, float, float]]:
+    """
+    (operator, depth, joins, estimated, exact, q-error) of every operator of a plan with both cardinalities,
+    `joins` is the number of joins in the subtree of the operator. The result operator added by the parsers is skipped.
+    """
+    depths = plan.depths()
+    joins = plan.subtree_counts(JOIN_TYPES)
+
+    errors = []
+    for index in plan:
+        if index == 0 and plan.operator_type(index) == OperatorType.Result:
+            continue
+        estimated, exact = plan.estimated[index], plan.exact[index]
+        if math.isnan(estimated) or math.isnan(exact):
+            continue
+        errors.append((plan.label(index), depths[index], joins[index], estimated, exact, q_error(estimated, exact)))
+    return errors
+
+
+def load(connection: duckdb.DuckDBPyConnection, paths: List[str], raw: bool = False):
+    """
+    Compute the q-errors of the successful queries in the result files, every distinct plan is parsed once.
+    Unless `raw`, the plans are normalized first, so that the operators of different systems are comparable.
+    """
+    plans = {}
+    queries = []
+    operators = []
+    attribute_table = AttributeTable()
+
+    for path in paths:
+        benchmark = os.path.splitext(os.path.basename(path))[0]
+        with resultstore.connect(path) as source:
+            rows = source.execute("""
+                select title, dbms, version, query, try_cast(client_total_median as double), plan::varchar
+                from results_csv
+                where state = 'success' and plan::varchar <> ''
+            """).fetchall()
+
+        for title, dbms, version, query, runtime, plan in rows:
+            if plan not in plans:
+                plans[plan] = len(plans)
+                if raw:
+                    compact = CompactPlan.from_json(plan, attribute_table)
+                else:
+                    compact = CompactPlan.from_plan_node(normalize(decode_query_plan(plan).plan, dbms), attribute_table)
+                operators.extend((plans[plan],) + error for error in operator_errors(compact))
+            queries.append((benchmark, title, dbms, version, query, runtime, plans[plan]))
+
+    # bulk load through csv files, inserting row by row is orders of magnitude slower
+    with tempfile.TemporaryDirectory() as directory:
+        for table, rows in [("queries", queries), ("operators", operators)]:
+            path = os.path.join(directory, table + ".csv")
+            with open(path, "w", newline="") as file:
+                csv.writer(file).writerows(rows)
+            connection.execute(f"copy {table} from '{path}' (header false)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute the q-errors of the cardinality estimates in the stored plans")
+    parser.add_argument("paths", nargs="+", help="result csvs or result stores")
+    parser.add_argument("--view", dest="views", action="append", choices=list(VIEWS.keys()), help="views to show (default: all)")
+    parser.add_argument("--raw", dest="raw", action="store_true", help="analyze the plans without normalizing them")
+    parser.add_argument("--output", dest="output", type=str, default=None, help="write every view as csv into this directory")
+    args = parser.parse_args()
+
+    with duckdb.connect() as connection:
+        for statement in SCHEMA:
+            connection.execute(statement)
+        for name, query in VIEWS.items():
+            connection.execute(f"create view {name} as {query}")
+
+        load(connection, args.paths, args.raw)
+
+        for name in args.views or VIEWS.keys():
+            print(name)
+            connection.sql(f"select * from {name}").show(max_rows=1000, max_width=1000)
+
+        if args.output is not None:
+            os.makedirs(args.output, exist_ok=True)
+            for name in VIEWS.keys():
+                connection.execute(f"copy (select * from {name}) to '{os.path.join(args.output, name + '.csv')}' (header, delimiter ',')")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import duckdb
+import pytest
+
+from analysis import qerror
+from dbms.dbms import Result
+from queryplan.compactplan import CompactPlan
+from queryplan.plannode import InnerNode, LeafNode
+from queryplan.queryoperator import CustomOperator, Join, Result as ResultOperator, TableScan
+from queryplan.queryplan import QueryPlan
+from util.resultcsv import ResultCSV
+
+
+def scan(operator_id: int, table: str, estimated: float, exact: float) -> LeafNode:
+    operator = TableScan(operator_id)
+    operator.table_name = table
+    return LeafNode(operator, estimated, exact, None)
+
+
+def plan() -> InnerNode:
+    join = Join(2)
+    join.type = "inner"
+    join.method = "hash"
+    # postgres builds the hash table in a separate operator on the second input
+    build = InnerNode(CustomOperator("Hash", None), 20, 40, [scan(4, "lineitem", 20, 40)], None)
+    return InnerNode(ResultOperator(1), 10, 10, [InnerNode(join, 1000, 10, [scan(3, "orders", 0.5, 0), build], None)], None)
+
+
+def test_q_error():
+    assert qerror.q_error(100, 10) == 10.0
+    assert qerror.q_error(10, 100) == 10.0
+    # cardinalities below 1 count as 1
+    assert qerror.q_error(0.5, 0) == 1.0
+    assert qerror.q_error(0, 20) == 20.0
+    assert qerror.q_error(None, 10) is None
+    assert qerror.q_error(10, None) is None
+
+
+def test_operator_errors():
+    errors = qerror.operator_errors(CompactPlan.from_plan_node(plan()))
+    # the result operator is skipped, the joins are counted in the subtree of every operator
+    assert errors == [
+        ("Join", 1, 1, 1000.0, 10.0, 100.0),
+        ("TableScan", 2, 0, 0.5, 0.0, 1.0),
+        ("Hash", 2, 0, 20.0, 40.0, 2.0),
+        ("TableScan", 3, 0, 20.0, 40.0, 2.0),
+    ]
+
+
+def test_operator_errors_missing_cardinality():
+    root = plan()
+    root.children[0].estimated_cardinality = None
+    assert [error[0] for error in qerror.operator_errors(CompactPlan.from_plan_node(root))] == ["TableScan", "Hash", "TableScan"]
+
+
+@pytest.fixture
+def connection():
+    with duckdb.connect() as connection:
+        for statement in qerror.SCHEMA:
+            connection.execute(statement)
+        for name, query in qerror.VIEWS.items():
+            connection.execute(f"create view {name} as {query}")
+        yield connection
+
+
+def write(filename: str):
+    with ResultCSV(filename) as results:
+        # the second system runs the same plans at half the speed
+        for title, factor in [("postgres", 1.0), ("slow", 2.0)]:
+            for query, client_total, state in [("1.sql", 2.0, Result.SUCCESS), ("2.sql", 4.0, Result.SUCCESS), ("3.sql", 1.0, Result.ERROR)]:
+                result = Result()
+                result.state = state
+                result.client_total = [client_total * factor]
+                result.plan = QueryPlan(text="select * from orders, lineitem", plan=plan())
+                results.start_olap(title, query)
+                results.olap(title, "postgres", "16", query, result)
+
+
+@pytest.mark.parametrize("raw", [True, False])
+def test_load(tmp_path, connection, raw):
+    filename = str(tmp_path / "tpchSf1.csv")
+    write(filename)
+    qerror.load(connection, [filename], raw)
+
+    # only successful queries are analyzed, equal plans are parsed once
+    assert connection.execute("select benchmark, title, query, runtime, plan from queries order by title, query").fetchall() == [
+        ("tpchSf1", "postgres", "1.sql", 2.0, 0),
+        ("tpchSf1", "postgres", "2.sql", 4.0, 0),
+        ("tpchSf1", "slow", "1.sql", 4.0, 0),
+        ("tpchSf1", "slow", "2.sql", 8.0, 0),
+    ]
+
+    # the normalized plans have no hash operators
+    operators = [operator for operator, in connection.execute("select operator from operators").fetchall()]
+    assert operators == (["Join", "TableScan", "Hash", "TableScan"] if raw else ["Join", "TableScan", "TableScan"])
+
+    assert connection.execute("select operator, max from by_operator where operator = 'Join'").fetchall() == [("Join", 100.0)]
+    # the slowdown is relative to the fastest system on the query
+    assert connection.execute("select title, query, max_qerror, max_join_qerror, slowdown from query_errors order by title, query").fetchall() == [
+        ("postgres", "1.sql", 100.0, 100.0, 1.0),
+        ("postgres", "2.sql", 100.0, 100.0, 1.0),
+        ("slow", "1.sql", 100.0, 100.0, 2.0),
+        ("slow", "2.sql", 100.0, 100.0, 2.0),
+    ]
@@ -7,23 +7,33 @@ import itertools
 import math
 import os
 import random
+import re
+import shutil
 import sys
+import time
 from dataclasses import dataclass, field
 from statistics import median, geometric_mean
 from typing import Dict, List
 
-import simplejson as json
 from dotenv import load_dotenv
 
 from benchmarks.benchmark import benchmark_arguments, benchmarks, Benchmark
-from dbms.dbms import Result, database_systems
-from util import logger, formatter, schemajson
+from dbms.dbms import DBMS, Result, database_systems, _parse_bytes
+from util import logger, formatter, schemajson, flamegraph, planstore
+from util.phasetimer import PhaseTimer
 from util.resultcsv import ResultCSV
+from util.resultstore import ResultStore
 from util.template import Template
 
 workdir = os.getcwd()
 csv.field_size_limit(sys.maxsize)
 
+# result_format -> (writer, file extension)
+RESULT_FORMATS = {
+    "csv": (ResultCSV, ".csv"),
+    "duckdb": (ResultStore, ".duckdb"),
+}
+
 
 @dataclass
 class System:
@@ -49,20 +59,23 @@ class Runtime:
     times: List[float] = field(default_factory=lambda: [])
 
 
-def run_benchmark(benchmark: Benchmark, systems: List[System], definition: dict, result_dir: str, db_dir: str, data_dir: str):
+def run_benchmark(benchmark: Benchmark, systems: List[System], definition: dict, result_dir: str, db_dir: str, data_dir: str) -> PhaseTimer:
     logger.log_driver(f"Preparing {benchmark.description}")
     dbms_descriptions = database_systems()
+    timer = PhaseTimer()
 
     timeout = definition.get("timeout", 0)
     global_timeout = definition.get("global_timeout", 0) * 1000
     fetch_result = definition.get("fetch_result", True)
     fetch_result_limit = definition.get("fetch_result_limit", 0)
     query_seed = definition.get("query_seed", None)
+    recover = definition.get("recover", True)
 
     benchmark.dbgen()
 
     result_name = os.path.join(result_dir, benchmark.result_name)
-    result_csv = result_name + ".csv"
+    result_class, extension = RESULT_FORMATS[definition.get("result_format", "csv")]
+    result_file = result_name + extension
     executed_queries = {}
     failed_query = (None, None)
     benchmark_type = definition.get("type", "queries")
@@ -75,49 +88,45 @@ def run_benchmark(benchmark: Benchmark, systems: List[System], definition: dict,
         runtimes[system.title] = Runtime(title=system.title)
         executed_queries[system.title] = []
 
-    if os.path.exists(result_csv) and benchmark_type == "queries":
-        logger.log_driver(f"Found results in {result_csv}, skipping already executed queries")
-        with open(result_csv, 'r') as csv_file:
-            reader = csv.DictReader(csv_file)
-
-            for row in reader:
-                title = row["title"]
-                query = row["query"]
-                state = row["state"]
-                times = [float(x) for x in json.loads(row["client_total"], allow_nan=True)]
-
-                if title not in runtimes:
-                    continue
-
-                executed_queries[title].append(query)
-
-                runtimes[title].queries += 1
-                if state not in [Result.FATAL, Result.GLOBAL_TIMEOUT]:
-                    assert len(times) > 0
-                    runtimes[title].global_time += median(times)
-                    runtimes[title].times.append(median(times))
-
-                match state:
-                    case Result.SUCCESS:
-                        runtimes[title].success += 1
-                    case Result.ERROR:
-                        runtimes[title].error += 1
-                    case Result.FATAL:
-                        runtimes[title].fatal += 1
-                    case Result.OOM:
-                        runtimes[title].oom += 1
-                    case Result.TIMEOUT:
-                        runtimes[title].timeout += 1
-                    case Result.GLOBAL_TIMEOUT:
-                        runtimes[title].global_timeout += 1
-
-    if os.path.exists(result_csv + "_current") and benchmark_type == "queries":
-        with open(result_csv + "_current", 'r') as file:
-            title, query = file.readline().split(",")
-            failed_query = (title, query)
-            logger.log_driver(f"Last execution of {query} failed in {title}")
-
-    with ResultCSV(result_csv, append=True) as result_csv_file:
+    if os.path.exists(result_file) and benchmark_type == "queries":
+        logger.log_driver(f"Found results in {result_file}, skipping already executed queries")
+        for title, query, state, med in result_class.executed(result_file):
+            if title not in runtimes:
+                continue
+
+            executed_queries[title].append(query)
+
+            runtimes[title].queries += 1
+            if state not in [Result.FATAL, Result.GLOBAL_TIMEOUT]:
+                assert not math.isnan(med)
+                runtimes[title].global_time += med
+                runtimes[title].times.append(med)
+
+            match state:
+                case Result.SUCCESS:
+                    runtimes[title].success += 1
+                case Result.ERROR:
+                    runtimes[title].error += 1
+                case Result.FATAL:
+                    runtimes[title].fatal += 1
+                case Result.OOM:
+                    runtimes[title].oom += 1
+                case Result.TIMEOUT:
+                    runtimes[title].timeout += 1
+                case Result.GLOBAL_TIMEOUT:
+                    runtimes[title].global_timeout += 1
+
+    in_flight = result_class.in_flight(result_file) if os.path.exists(result_file) and benchmark_type == "queries" else None
+    if in_flight is not None:
+        title, query = in_flight
+        failed_query = (title, query)
+        logger.log_driver(f"Last execution of {query} failed in {title}")
+
+    plan_store = None
+    if definition.get("query_plan", {}).get("deduplicate", False):
+        plan_store = planstore.PlanStore(planstore.plan_directory(result_file))
+
+    with result_class(result_file, append=True, plan_store=plan_store, durability=definition.get("durability", None)) as result_csv_file:
         for system in systems:
             logger.log_header(system.title)
             logger.log_driver(f"Running {system.title} on {benchmark.result_name} (dbms: {system.dbms}, params: {system.params}, settings: {system.settings})")
@@ -160,7 +169,7 @@ def run_benchmark(benchmark: Benchmark, systems: List[System], definition: dict,
                     if len(queries) == 0:
                         runtime = runtimes[system.title]
                         rsum = formatter.format_time(sum(runtime.times))
-                        rgeomean = formatter.format_time(math.nan if len(runtime.times) == 0 else geometric_mean(runtime.times))
+                        rgeomean = formatter.format_time(math.nan if len(runtime.times) == 0 or min(runtime.times) <= 0 else geometric_mean(runtime.times))
                         rmedian = formatter.format_time(math.nan if len(runtime.times) == 0 else median(runtime.times))
 
                         logger.log_driver(
@@ -168,7 +177,8 @@ def run_benchmark(benchmark: Benchmark, systems: List[System], definition: dict,
                         continue
 
             with dbms_descriptions[system.dbms].instantiate(benchmark, db_dir, data_dir, system.params, system.settings) as dbms:
-                dbms.load_database()
+                with timer.phase("load"):
+                    dbms.load_database()
 
                 if benchmark_type == "queries":
                     logger.log_driver("Benchmarking queries")
@@ -176,8 +186,10 @@ def run_benchmark(benchmark: Benchmark, systems: List[System], definition: dict,
                     repetitions = definition["repetitions"]
                     warmup = definition["warmup"]
 
+                    medians = {}
                     with logger.LogProgress("Running queries...", len(queries) * (repetitions + warmup), base=repetitions + warmup) as progress:
                         for (name, query) in queries:
+                            query_begin = time.perf_counter()
                             result = Result()
 
                             if system.title == failed_query[0] and name == failed_query[1]:
@@ -193,13 +205,26 @@ def run_benchmark(benchmark: Benchmark, systems: List[System], definition: dict,
 
                             progress.next(f'Running {name}...')
                             if result.state == Result.SUCCESS:
-                                for i in range(warmup):
-                                    dbms._execute(query, fetch_result, timeout=timeout, fetch_result_limit=fetch_result_limit)
-                                    progress.finish()
-
-                                for i in range(repetitions):
-                                    result.merge(dbms._execute(query, fetch_result, timeout=timeout, fetch_result_limit=fetch_result_limit))
-                                    progress.finish()
+                                try:
+                                    with timer.phase("execute"):
+                                        executions = dbms._execute_repetitions(query, fetch_result, warmup, repetitions, timeout=timeout, fetch_result_limit=fetch_result_limit, progress=progress)
+                                    for i, execution in enumerate(executions):
+                                        # Every execution is recorded, only the measured ones contribute to the timings
+                                        result.repetitions.append(execution.repetition(i, i < warmup))
+                                        if i >= warmup:
+                                            result.merge(execution)
+                                except Exception as e:
+                                    # Only a dead system is recovered, other errors are bugs of the driver or the adapter
+                                    if not recover or not dbms.crashed():
+                                        raise e
+
+                                    # The system crashed or was killed, restart it and continue with the next query
+                                    logger.log_error(f"{system.title} crashed while running {name}: {e}")
+                                    result = Result()
+                                    result.state = Result.FATAL
+                                    result.message = f"olapbench: system crash! ({e})"
+                                    with timer.phase("recover"):
+                                        dbms.recover()
 
                             med = median(result.client_total) if len(result.client_total) > 0 else math.nan
                             if not math.isnan(med):
@@ -214,10 +239,14 @@ def run_benchmark(benchmark: Benchmark, systems: List[System], definition: dict,
                             retrieve_query_plan = query_plan.get("retrieve", False)
                             if retrieve_query_plan and result.state == Result.SUCCESS:
                                 system_representation = query_plan.get("system_representation", False)
-                                result.plan = dbms.retrieve_query_plan(query, include_system_representation=system_representation)
+                                with timer.phase("plan"):
+                                    result.plan = dbms.retrieve_query_plan(query, include_system_representation=system_representation)
+                                    if result.plan is not None:
+                                        result.extra["plan_shape"] = planstore.plan_shape(result.plan)
 
                             result.round(3)
-                            result_csv_file.olap(system.title, system.dbms, dbms.version, name, result)
+                            with timer.phase("write"):
+                                result_csv_file.olap(system.title, system.dbms, dbms.version, name, result)
 
                             lname = name.ljust(10)
                             lmessage = ""
@@ -245,12 +274,23 @@ def run_benchmark(benchmark: Benchmark, systems: List[System], definition: dict,
                             if result.state not in [Result.ERROR, Result.FATAL, Result.GLOBAL_TIMEOUT]:
                                 assert not math.isnan(med)
                                 runtimes[system.title].times.append(med)
+                            if result.state == Result.SUCCESS:
+                                medians[name] = med
 
                             logger.log_verbose_dbms(f'{lname} {formatter.format_time(med)} {lmessage}', dbms)
+                            timer.add("query", time.perf_counter() - query_begin)
+
+                    memory_search = definition.get("memory_search", None)
+                    if memory_search is not None and len(medians) > 0:
+                        search_memory(dbms, system, dict(queries), medians, memory_search, result_name, fetch_result, fetch_result_limit, repetitions, timeout, recover)
+
+                    flamegraphs = definition.get("flamegraphs", 0)
+                    if flamegraphs > 0 and len(medians) > 0:
+                        record_flamegraphs(dbms, system, dict(queries), medians, flamegraphs, result_name, timeout)
 
                     runtime = runtimes[system.title]
                     rsum = formatter.format_time(sum(runtime.times))
-                    rgeomean = formatter.format_time(math.nan if len(runtime.times) == 0 else geometric_mean(runtime.times))
+                    rgeomean = formatter.format_time(math.nan if len(runtime.times) == 0 or min(runtime.times) <= 0 else geometric_mean(runtime.times))
                     rmedian = formatter.format_time(math.nan if len(runtime.times) == 0 else median(runtime.times))
 
                     logger.log_driver(
@@ -263,6 +303,136 @@ def run_benchmark(benchmark: Benchmark, systems: List[System], definition: dict,
                 else:
                     raise ValueError("benchmark type not supported")
 
+    if timer.count("query") > 0:
+        logger.log_header2("Driver phases")
+        timer.log()
+
+    return timer
+
+
+def record_flamegraphs(dbms: DBMS, system: System, queries: Dict[str, str], medians: Dict[str, float], count: int, result_name: str, timeout: int):
+    """
+    Re-executes the slowest queries of a system while sampling its call stacks.
+    The folded stacks are written to `<result_name>_flamegraphs`, the index csv in that directory links them to the result rows.
+
+    Args:
+        dbms (DBMS): The running database system.
+        system (System): The benchmarked system.
+        queries (Dict[str, str]): The executed queries by name.
+        medians (Dict[str, float]): The median runtime of the successful queries by name.
+        count (int): The number of slowest queries to profile.
+        result_name (str): The path of the result files without extension.
+        timeout (int): The timeout of a single execution in seconds.
+    """
+    flamegraph_dir = result_name + "_flamegraphs"
+    os.makedirs(flamegraph_dir, exist_ok=True)
+
+    slowest = sorted(medians.items(), key=lambda item: item[1], reverse=True)[:count]
+    logger.log_driver(f"Recording flame graphs of the {len(slowest)} slowest queries")
+
+    with logger.LogProgress("Recording flame graphs...", len(slowest)) as progress:
+        for name, med in slowest:
+            progress.next(f'Recording {name}...')
+
+            file_name = re.sub(r"[^\w.-]", "_", f"{system.title}_{name}") + ".folded"
+            if dbms.record_flamegraph(queries[name], os.path.join(flamegraph_dir, file_name), timeout=timeout):
+                flamegraph.append_index(os.path.join(flamegraph_dir, "index.csv"), {
+                    "title": system.title,
+                    "dbms": system.dbms,
+                    "version": dbms.version,
+                    "query": name,
+                    "median": med,
+                    "flamegraph": file_name,
+                })
+
+            progress.finish()
+
+
+def search_memory(dbms: DBMS, system: System, queries: Dict[str, str], medians: Dict[str, float], search: dict, result_name: str,
+                  fetch_result: bool, fetch_result_limit: int, repetitions: int, timeout: int, recover: bool = True):
+    """
+    Binary-searches the smallest memory budget per query, at which the query still succeeds within a tolerance of its unconstrained runtime.
+    Every probe is appended to `<result_name>_memory.csv`, which gives the memory-versus-runtime curve of each system.
+
+    Args:
+        dbms (DBMS): The running database system.
+        system (System): The benchmarked system.
+        queries (Dict[str, str]): The executed queries by name.
+        medians (Dict[str, float]): The unconstrained median runtime of the successful queries by name.
+        search (dict): The search settings (tolerance, min and steps).
+        result_name (str): The path of the result files without extension.
+        fetch_result (bool): Whether to fetch the query results.
+        fetch_result_limit (int): The maximum number of rows to fetch.
+        repetitions (int): The number of executions per probe.
+        timeout (int): The timeout of a single execution in seconds.
+        recover (bool): Whether to restart the system if a probe crashed it, the search is aborted otherwise.
+    """
+    tolerance = search.get("tolerance", 0.1)
+    min_memory = _parse_bytes(search.get("min", "16M"))
+    steps = search.get("steps", 8)
+
+    if not dbms._set_memory_limit(None):
+        logger.log_driver(f"{system.title} cannot change its memory budget at runtime, skipping the memory search")
+        return
+
+    logger.log_driver(f"Searching the minimum memory budget of {len(medians)} queries")
+    fieldnames = ["title", "dbms", "version", "query", "memory", "state", "median", "baseline"]
+    with open(result_name + "_memory.csv", "a", newline="") as memory_csv:
+        writer = csv.DictWriter(memory_csv, fieldnames=fieldnames)
+        if memory_csv.tell() == 0:
+            writer.writeheader()
+
+        with logger.LogProgress("Searching memory budgets...", len(medians)) as progress:
+            for name, baseline in medians.items():
+                progress.next(f'Searching {name}...')
+
+                # The query succeeds with the full buffer size, the budgets span orders of magnitude, so bisect geometrically
+                low, high = min_memory, dbms._buffer_size
+                for _ in range(steps):
+                    if high <= low:
+                        break
+
+                    memory = int(math.sqrt(low * high))
+                    dbms._set_memory_limit(memory)
+
+                    result = Result()
+                    try:
+                        for execution in dbms._execute_repetitions(queries[name], fetch_result, 0, repetitions, timeout=timeout, fetch_result_limit=fetch_result_limit):
+                            result.merge(execution)
+                    except Exception as e:
+                        # Too small budgets get the system killed, a failed probe counts as insufficient memory
+                        crashed = dbms.crashed()
+                        if crashed and not recover:
+                            raise e
+
+                        logger.log_error(f"{system.title} failed {name} with a budget of {memory} bytes: {e}")
+                        result = Result()
+                        result.state = Result.FATAL
+                        if crashed:
+                            dbms.recover()
+                    med = median(result.client_total) if len(result.client_total) > 0 else math.nan
+
+                    writer.writerow({
+                        "title": system.title,
+                        "dbms": system.dbms,
+                        "version": dbms.version,
+                        "query": name,
+                        "memory": memory,
+                        "state": result.state,
+                        "median": round(med, 3),
+                        "baseline": round(baseline, 3),
+                    })
+
+                    if result.state == Result.SUCCESS and med <= baseline * (1 + tolerance):
+                        high = memory
+                    else:
+                        low = memory
+
+                memory_csv.flush()
+                progress.finish()
+
+    dbms._set_memory_limit(None)
+
 
 def unfold(d: dict) -> List[dict]:
     """
@@ -300,10 +470,15 @@ def clear(benchmark: Benchmark, result_dir: str):
     result_name = os.path.join(result_dir, benchmark.result_name)
     logger.log_driver(f"Clearing results for {result_name}")
 
-    files_to_delete = [result_name + ext for ext in [".csv", ".csv_current"]]
+    # .csv_current is the marker of older runs, which may still be in the result directory
+    files_to_delete = [result_name + ext for ext in [".csv", ".csv.index", ".csv_current", ".duckdb", ".duckdb.wal"]]
     for file_path in files_to_delete:
         delete_file(file_path)
 
+    delete_file(result_name + "_memory.csv")
+    shutil.rmtree(result_name + "_flamegraphs", ignore_errors=True)
+    shutil.rmtree(result_name + "_plans", ignore_errors=True)
+
 
 def run_benchmarks(args):
     benchmark_descriptions = benchmarks()
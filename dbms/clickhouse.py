@@ -2,7 +2,10 @@ import os
 import tempfile
 import threading
 import time
+import uuid
+from typing import Optional
 
+import requests
 import simplejson as json
 
 from benchmarks.benchmark import Benchmark
@@ -15,6 +18,10 @@ class ClickHouse(DBMS):
     def __init__(self, benchmark: Benchmark, db_dir: str, data_dir: str, params: dict, settings: dict):
         super().__init__(benchmark, db_dir, data_dir, params, settings)
 
+        self._loading = False
+        self._profiling = params.get("profiling", "total")
+        self._max_memory_usage = self._memory_limit
+
     @property
     def name(self) -> str:
         return "clickhouse"
@@ -34,29 +41,54 @@ class ClickHouse(DBMS):
         # start Docker container
         self.container_name = "docker_clickhouse"
         clickhouse_environment = {
-            "CLICKHOUSE_DB": "clickhouse"
+            "CLICKHOUSE_DB": "clickhouse",
+            # keep the default user reachable through the HTTP interface
+            "CLICKHOUSE_SKIP_USER_SETUP": "1",
         }
         docker_params = {
             "name": self.container_name,
             "shm_size": "%d" % self._buffer_size,
             "stdin_open": True,
         }
-        self._start_container(clickhouse_environment, 9005, 54325, self.host_dir.name, "/var/lib/clickhouse/", docker_params=docker_params)
+        self._start_container(clickhouse_environment, 8123, 54325, self.host_dir.name, "/var/lib/clickhouse/", docker_params=docker_params)
 
         logger.log_verbose_dbms("Starting ClickHouse docker image ...", self)
 
-        start_time = time.time()
-        timeout = 120  # 2 minutes
-        while time.time() - start_time < timeout and self.container.exec_run('clickhouse-client -d clickhouse --query "select 1"').exit_code != 0:
-            time.sleep(1)  # 1 second
+        self._connect(54325)
 
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        self.session.close()
         self._close_container()
         self.temp_dir.cleanup()
         self.host_dir.cleanup()
 
+    def _connect(self, port: int):
+        self.connection = None
+        self.session = requests.Session()
+        url = f"http://localhost:{port}/"
+
+        start_time = time.time()
+        check_timeout = 120  # 2 minutes
+        while time.time() - start_time < check_timeout:
+            try:
+                response = self.session.post(url, params={"database": "clickhouse"}, data="select 1")
+                if response.status_code == 200:
+                    self.connection = url
+                    break
+
+            except requests.exceptions.RequestException:
+                pass
+
+            time.sleep(1)  # 1 second
+
+        if self.connection is None:
+            self._kill_container()
+            raise Exception(f"Unable to connect to {self.name}")
+
+        logger.log_verbose_dbms(f"Established connection to {self.name}", self)
+
     def _transform_schema(self, schema: dict) -> dict:
         schema = sql.transform_schema(schema, escape='"', lowercase=self._umbra_planner)
         for table in schema['tables']:
@@ -77,12 +109,6 @@ class ClickHouse(DBMS):
                              f"insert into {table['name']} from infile '/data/{table['file']}' format CSV;")
         return stmts
 
-    def _container_status(self) -> str:
-        try:
-            return self.client.containers.get(self.container.id).status
-        except Exception:
-            return "removed"
-
     def _execute_in_container(self, command: str, timeout: int = 0):
         timer = None
         if timeout > 0:
@@ -105,7 +131,139 @@ class ClickHouse(DBMS):
 
         return result
 
+    def load_database(self):
+        # `insert ... from infile` is only supported by clickhouse-client
+        self._loading = True
+        try:
+            super().load_database()
+        finally:
+            self._loading = False
+
     def _execute(self, query: str, fetch_result: bool, timeout: int = 0, fetch_result_limit: int = 0) -> Result:
+        if self._loading:
+            return self._execute_client(query, fetch_result, timeout=timeout, fetch_result_limit=fetch_result_limit)
+
+        result = Result()
+
+        query_id = str(uuid.uuid4())
+        params = {
+            "database": "clickhouse",
+            "query_id": query_id,
+            "allow_experimental_join_condition": 1,
+            "allow_experimental_analyzer": 1,
+            "default_format": "JSONCompactEachRowWithNamesAndTypes" if fetch_result else "Null",
+            # report errors through the status code and the final statistics in the summary header
+            "wait_end_of_query": 1,
+        }
+        if timeout > 0:
+            params["max_execution_time"] = timeout
+        if self._max_memory_usage is not None:
+            params["max_memory_usage"] = self._max_memory_usage
+
+        timer_kill = None
+        if timeout > 0:
+            timer_kill = threading.Timer(timeout * 10, self._kill_container)
+            timer_kill.start()
+
+        begin = time.time()
+        try:
+            response = self.session.post(self.connection, params=params, data=query.strip().rstrip(";").encode("utf-8"), stream=True)
+
+            if response.status_code != 200:
+                client_total = (time.time() - begin) * 1000
+                message = response.text.strip()
+                logger.log_error_verbose(message)
+                result.message = message
+                result.state = Result.TIMEOUT if "TIMEOUT_EXCEEDED" in message or "Timeout exceeded" in message else Result.ERROR
+                result.state = Result.OOM if "MEMORY_LIMIT_EXCEEDED" in message else result.state
+                result.client_total.append(timeout * 1000 if result.state == Result.TIMEOUT else client_total)
+                return result
+
+            if fetch_result:
+                rows = 0
+                types = None
+                for i, line in enumerate(response.iter_lines()):
+                    if i == 0 or not line:
+                        # skip the column names
+                        continue
+                    if i == 1:
+                        types = json.loads(line)
+                        continue
+
+                    rows += 1
+                    if 0 < fetch_result_limit < rows:
+                        continue
+
+                    row = []
+                    for j, value in enumerate(json.loads(line, use_decimal=True)):
+                        if (types[j] == 'UInt64' or types[j] == 'Int64') and isinstance(value, str):
+                            value = int(value)
+                        row.append(value)
+                    result.result.append(row)
+                result.rows = rows
+            else:
+                # drain the (empty) body to release the connection
+                response.content
+
+            client_total = (time.time() - begin) * 1000
+        finally:
+            if timer_kill is not None:
+                timer_kill.cancel()
+                timer_kill.join()
+
+        result.client_total.append(client_total)
+        try:
+            summary = json.loads(response.headers.get("X-ClickHouse-Summary", "{}"))
+            if "elapsed_ns" in summary:
+                result.total.append(int(summary["elapsed_ns"]) / 1000000)
+        except Exception:
+            pass
+
+        if self._profiling == "detailed":
+            result.extra = self._query_metrics(query_id)
+
+        return result
+
+    # metrics read from system.query_log, keyed by the name used in the result's extra
+    _query_log_metrics = {
+        "read_rows": "read_rows",
+        "read_bytes": "read_bytes",
+        "memory_usage": "memory_usage",
+        "selected_marks": "ProfileEvents['SelectedMarks']",
+        "selected_parts": "ProfileEvents['SelectedParts']",
+        "user_time": "ProfileEvents['UserTimeMicroseconds'] / 1000",
+        "system_time": "ProfileEvents['SystemTimeMicroseconds'] / 1000",
+        "cpu_time": "ProfileEvents['OSCPUVirtualTimeMicroseconds'] / 1000",
+        "os_read_bytes": "ProfileEvents['OSReadBytes']",
+        "os_write_bytes": "ProfileEvents['OSWriteBytes']",
+    }
+
+    def _query_metrics(self, query_id: str) -> dict:
+        """Read the server-side metrics of a finished query from system.query_log"""
+        columns = ", ".join(f"{expression} as {name}" for name, expression in self._query_log_metrics.items())
+        query = f"select {columns} from system.query_log where query_id = '{query_id}' and type = 'QueryFinish' limit 1"
+        params = {
+            "default_format": "JSONEachRow",
+            "output_format_json_quote_64bit_integers": 0,
+        }
+
+        try:
+            # the query log is written asynchronously
+            response = self.session.post(self.connection, data="system flush logs")
+            response.raise_for_status()
+            response = self.session.post(self.connection, params=params, data=query)
+            response.raise_for_status()
+            text = response.text.strip()
+            return json.loads(text) if text else {}
+        except Exception as e:
+            logger.log_error_verbose(f"Unable to read the query log: {e}")
+            return {}
+
+    def _set_memory_limit(self, limit: Optional[int]) -> bool:
+        self._max_memory_usage = limit if limit is not None else self._memory_limit
+        return True
+
+    def _execute_client(self, query: str, fetch_result: bool, timeout: int = 0, fetch_result_limit: int = 0) -> Result:
         result = Result()
 
         query_path = os.path.join(self.temp_dir.name, "query.sql")
@@ -1,17 +1,19 @@
 import argparse
 import os
 import re
+import shutil
+import time
 from abc import ABC, abstractmethod
 from enum import Enum
 from statistics import median
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 
 import docker
 import psutil
 
 from benchmarks.benchmark import Benchmark
 from queryplan.queryplan import QueryPlan
-from util import logger, formatter, sql
+from util import logger, formatter, sql, cgroup, perf
 
 
 class Result:
@@ -29,10 +31,29 @@ class Result:
         self.execution: List[float] = []
         self.compilation: List[float] = []
         self.rows: Optional[int] = None
-        self.extra: Dict[str, float] = {}
+        self.extra: Dict[str, any] = {}
         self.result: List[List[any]] = []
         self.message: str = ""
         self.plan: Optional[QueryPlan] = None
+        self.start: Optional[float] = None  # wall-clock start of a single execution (seconds since the epoch)
+        self.repetitions: List[Dict[str, any]] = []
+        self._measurements: Dict[str, List[float]] = {}  # numeric extra values of the merged executions
+
+    def repetition(self, index: int, warmup: bool) -> Dict[str, any]:
+        """
+        The metadata of a single execution, as recorded in `repetitions`.
+
+        Args:
+            index (int): The index of the execution, counting the warmup executions.
+            warmup (bool): Whether the execution is a warmup execution.
+        """
+        return {
+            "index": index,
+            "warmup": warmup,
+            "start": self.start,
+            "client_total": self.client_total[0] if self.client_total else None,
+            "state": self.state,
+        }
 
     def merge(self, other: 'Result'):
         """
@@ -54,8 +75,18 @@ class Result:
         # Update the number of rows
         self.rows = other.rows if other.rows is not None else self.rows
 
+        # Numeric metrics in extra are measured per execution, peaks are aggregated by their maximum, all others by their median
+        for key, value in other.extra.items():
+            if not _is_number(value):
+                continue
+            if key not in self._measurements:
+                self._measurements[key] = [self.extra[key]] if _is_number(self.extra.get(key)) else []
+            self._measurements[key].append(value)
+
         # Update the additional information
-        self.extra = other.extra if not self.extra else self.extra
+        self.extra = dict(other.extra) if not self.extra else self.extra
+        for key, values in self._measurements.items():
+            self.extra[key] = max(values) if "peak" in key else median(values)
         self.result = other.result if not self.result else self.result
         self.message = other.message or self.message
         self.plan = other.plan or self.plan
@@ -71,16 +102,23 @@ class Result:
         self.total = [round(x, decimals) for x in self.total]
         self.execution = [round(x, decimals) for x in self.execution]
         self.compilation = [round(x, decimals) for x in self.compilation]
-        self.extra = {k: round(v, decimals) for k, v in self.extra.items()}
+        for repetition in self.repetitions:
+            if repetition["client_total"] is not None:
+                repetition["client_total"] = round(repetition["client_total"], decimals)
+        self.extra = {k: round(v, decimals) if isinstance(v, float) else v for k, v in self.extra.items()}
 
 
-def _parse_bytes(input: str) -> int:
+def _is_number(value: any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _parse_bytes(input: str | int) -> int:
     """
     Convert a string representing a memory size with units into an integer number of bytes.
 
     Args:
-        input (str): A string representing the memory size, e.g., "10K", "512M", "1G".
-                     The string must consist of a number followed by a unit (B, K, M, G, T).
+        input (str | int): A string representing the memory size, e.g., "10K", "512M", "1.5G", "16GB", "16GiB" or "1024".
+                           The string must consist of a number optionally followed by a unit (B, K, M, G, T), integers are bytes.
 
     Returns:
         int: The memory size in bytes.
@@ -88,14 +126,21 @@ def _parse_bytes(input: str) -> int:
     Raises:
         ValueError: If the input string is not in the correct format.
     """
+    if isinstance(input, int):
+        return input
+
     units = {"B": 1, "K": 2 ** 10, "M": 2 ** 20, "G": 2 ** 30, "T": 2 ** 40}
-    match = re.fullmatch(r"(\d+)([BKMGT])", input)
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*(?:([BKMGT])(?:I?B)?)?", input.strip().upper())
     if match:
         value, unit = match.groups()
-        return int(value) * units[unit]
+        return int(float(value) * units[unit or "B"])
     raise ValueError(f"malformed memory specification: {input}")
 
 
+# The container may use more memory than the buffer size for the engine's other allocations
+CONTAINER_MEMORY_HEADROOM = 1.25
+
+
 class DBMS(ABC):
     class Index(Enum):
         NONE = "none"
@@ -125,18 +170,25 @@ class DBMS(ABC):
 
         self._cpuset_cpus = None
         self._cpuset_mems = None
-        self._buffer_size = psutil.virtual_memory().total
+        self._memory_limit = _parse_bytes(params["buffer_size"]) if params.get("buffer_size") is not None else None
+        self._buffer_size = self._memory_limit if self._memory_limit is not None else psutil.virtual_memory().total
         self._worker_threads =  params["worker_threads"] if "worker_threads" in params and params["worker_threads"] is not None else os.cpu_count()
 
 
         self._index = DBMS.Index.from_string(params.get("index", "primary"))
         self._version = params.get("version", "latest")
         self._umbra_planner = params.get("umbra_planner", False)
-        self._docker = docker.from_env()
+        self._fetch_batch_size = params.get("fetch_batch_size", 0)
+        self._prepared = params.get("prepared", False)
+        self._resources = params.get("resources", False)
+        self._perf = params.get("perf", False)
+        self._cgroup = None  # (container id, cgroup path)
+        self._docker_client = None
 
         self._settings = settings
 
         self.container = None
+        self._killed = False
 
     @property
     @abstractmethod
@@ -147,6 +199,13 @@ class DBMS(ABC):
     def version(self) -> str:
         return self._version
 
+    @property
+    def _docker(self) -> docker.DockerClient:
+        # Connect to docker lazily, systems without a container do not need a docker daemon
+        if self._docker_client is None:
+            self._docker_client = docker.from_env()
+        return self._docker_client
+
     @property
     def docker_image_name(self) -> str:
         pass
@@ -175,6 +234,7 @@ class DBMS(ABC):
                 environment=environment,
                 cpuset_cpus=self._cpuset_cpus,
                 cpuset_mems=self._cpuset_mems,
+                mem_limit=int(self._memory_limit * CONTAINER_MEMORY_HEADROOM) if self._memory_limit is not None else None,
                 ports={f"{source_port}/tcp": dest_port},
                 volumes={
                     source_db_dir: {"bind": dest_db_dir, "mode": "rw"},
@@ -192,22 +252,55 @@ class DBMS(ABC):
             return "not started"
 
         try:
-            return self.client.containers.get(self.container.id).status
+            return self._docker.containers.get(self.container.id).status
         except Exception:
             return "removed"
 
     def _kill_container(self):
         if self.container is not None:
             logger.log_dbms(f"Killing {self.name} docker container", self)
+            self._killed = True
             self.container.kill()
             self.container.wait(timeout=None, condition="removed")
             logger.log_dbms(f"Killed {self.name} docker container", self)
 
     def _close_container(self):
         if self.container is not None:
-            self.container.stop(timeout=300)
+            # A killed container is removed automatically
+            if self._container_status() == "removed":
+                logger.log_verbose_dbms(f"{self.name} docker container is already removed", self)
+                return
+
+            try:
+                self.container.stop(timeout=300)
+            except docker.errors.NotFound:
+                # The container died and was removed in the meantime
+                logger.log_verbose_dbms(f"{self.name} docker container is already removed", self)
+                return
             logger.log_dbms(f"Stopped {self.name} docker container", self)
 
+    def crashed(self) -> bool:
+        """Whether the system died, i.e. the kill timer fired or its container is no longer running"""
+        return self._killed or (self.container is not None and self._container_status() != "running")
+
+    def recover(self):
+        """
+        Restart the system after it crashed or was killed, so that the benchmark can continue.
+        The database is loaded again by `load_database`: systems that persist their database, i.e. Umbra with `umbra_db` and UmbraDev,
+        reuse it, all other systems keep their database in a temporary directory and reload it from scratch.
+        """
+        logger.log_dbms(f"Recovering {self.name}", self)
+        try:
+            self.__exit__(None, None, None)
+        except Exception as e:
+            logger.log_verbose_dbms(f"Error while shutting down {self.name}: {e}", self)
+
+        self.container = None
+        self._killed = False
+        self.__enter__()
+        self.load_database()
+        logger.log_dbms(f"Recovered {self.name}", self)
+
     def _transform_schema(self, schema: dict) -> dict:
         return sql.transform_schema(schema, escape='"', lowercase=False)
 
@@ -222,6 +315,201 @@ class DBMS(ABC):
     def _execute(self, query: str, fetch_result: bool, timeout: int = 0, fetch_result_limit: int = 0) -> Result:
         raise NotImplementedError()
 
+    def _prepared_statements(self, query: str) -> Optional[Tuple[str, str, str]]:
+        """
+        Build the statements to prepare, execute and deallocate the query, if the system supports prepared statements.
+
+        Args:
+            query (str): The query to prepare.
+
+        Returns:
+            Optional[Tuple[str, str, str]]: The prepare, execute and deallocate statements, or None if not supported.
+        """
+        return None
+
+    def _execute_repetitions(self, query: str, fetch_result: bool, warmup: int, repetitions: int, timeout: int = 0, fetch_result_limit: int = 0,
+                             progress: Optional[logger.LogProgress] = None) -> List[Result]:
+        """
+        Execute a query for the given number of warmup and measured repetitions.
+        With the `prepared` parameter, the query is prepared once and every repetition executes the prepared statement.
+
+        Args:
+            query (str): The query to execute.
+            fetch_result (bool): Whether to fetch the query result.
+            warmup (int): The number of warmup executions.
+            repetitions (int): The number of measured executions.
+            timeout (int): The timeout of a single execution in seconds.
+            fetch_result_limit (int): The maximum number of rows to fetch.
+            progress (LogProgress): Advanced once per execution, if given.
+
+        Returns:
+            List[Result]: One result per execution, the warmup executions first.
+        """
+        statements = self._prepared_statements(query) if self._prepared else None
+        if statements is None:
+            return self._run_repetitions(query, fetch_result, warmup, repetitions, timeout=timeout, fetch_result_limit=fetch_result_limit, progress=progress)
+
+        prepare, execute, deallocate = statements
+        prepared = self._execute(prepare, False, timeout=timeout)
+        if prepared.state != Result.SUCCESS:
+            logger.log_verbose_dbms(f"Unable to prepare the query, executing it as text: {prepared.message}", self)
+            return self._run_repetitions(query, fetch_result, warmup, repetitions, timeout=timeout, fetch_result_limit=fetch_result_limit, progress=progress)
+
+        try:
+            results = self._run_repetitions(execute, fetch_result, warmup, repetitions, timeout=timeout, fetch_result_limit=fetch_result_limit, progress=progress)
+        finally:
+            # Deallocating on a dead system would replace the error of the execution
+            if not self.crashed():
+                try:
+                    self._execute(deallocate, False)
+                except Exception as e:
+                    logger.log_verbose_dbms(f"Unable to deallocate the prepared statement: {e}", self)
+
+        # Report the preparation and the first execution separately from the steady-state executions
+        extra = {"prepare": prepared.client_total[0]}
+        if results and results[0].client_total:
+            extra["first_execution"] = results[0].client_total[0]
+        for result in results:
+            result.extra.update(extra)
+
+        return results
+
+    def _run_repetitions(self, query: str, fetch_result: bool, warmup: int, repetitions: int, timeout: int = 0, fetch_result_limit: int = 0,
+                         progress: Optional[logger.LogProgress] = None) -> List[Result]:
+        """
+        Execute a query (or prepared statement) for the given number of warmup and measured repetitions.
+        Systems that can run the repetitions more efficiently override this method.
+        """
+        samplers = self._samplers()
+
+        results = []
+        for i in range(warmup + repetitions):
+            for sampler in samplers:
+                sampler.start()
+
+            start = time.time()
+            result = self._execute(query, fetch_result, timeout=timeout, fetch_result_limit=fetch_result_limit)
+            result.start = result.start or start
+
+            for sampler in reversed(samplers):
+                result.extra.update(sampler.stop())
+            results.append(result)
+
+            if progress is not None:
+                progress.finish()
+
+        return results
+
+    def _container_cgroup(self) -> Optional[str]:
+        """The cgroup (v2) directory of the container, None if there is no container or the cgroup cannot be found"""
+        if self.container is None:
+            return None
+
+        # The container changes when it is restarted
+        if self._cgroup is None or self._cgroup[0] != self.container.id:
+            self._cgroup = (self.container.id, cgroup.find_container_cgroup(self.container))
+        return self._cgroup[1]
+
+    def _samplers(self) -> list:
+        """
+        Create the samplers, that measure each execution, according to the `resources` and `perf` parameters.
+        Each sampler provides `start()` and `stop() -> dict`, the returned metrics are stored in the result's extra.
+        """
+        samplers = []
+        if not (self._resources or self._perf):
+            return samplers
+
+        path = self._container_cgroup()
+        if path is None:
+            return samplers
+
+        if self._resources:
+            samplers.append(cgroup.CgroupSampler(path))
+        if self._perf:
+            if shutil.which("perf") is None:
+                logger.log_warn_verbose("perf is not installed, no performance counters are recorded")
+            else:
+                samplers.append(perf.PerfStat(os.path.relpath(path, cgroup.CGROUP_ROOT)))
+
+        return samplers
+
+    def _set_memory_limit(self, limit: Optional[int]) -> bool:
+        """
+        Change the memory budget of the running system through its engine settings.
+
+        Args:
+            limit (Optional[int]): The memory budget in bytes, None restores the configured buffer size.
+
+        Returns:
+            bool: Whether the system supports changing its memory budget at runtime.
+        """
+        return False
+
+    def _flamegraph_profiler(self, output: str):
+        """
+        Create a profiler that samples the call stacks of the system and writes them as folded stacks to `output`.
+        The profiler provides `start()` and `stop() -> bool`, returns None if flame graphs are not supported.
+        """
+        path = self._container_cgroup()
+        if path is None or shutil.which("perf") is None:
+            return None
+        return perf.PerfRecord(os.path.relpath(path, cgroup.CGROUP_ROOT), output)
+
+    def record_flamegraph(self, query: str, output: str, timeout: int = 0) -> bool:
+        """
+        Execute the query once while sampling the call stacks of the system.
+
+        Args:
+            query (str): The query to execute.
+            output (str): The path of the folded stacks.
+            timeout (int): The timeout of the execution in seconds.
+
+        Returns:
+            bool: Whether the flame graph was written.
+        """
+        profiler = self._flamegraph_profiler(output)
+        if profiler is None:
+            logger.log_warn_verbose(f"Flame graphs are not supported for {self.name} (requires perf and a container)")
+            return False
+
+        try:
+            profiler.start()
+        except Exception as e:
+            logger.log_warn_verbose(f"Unable to record a flame graph: {e}")
+            return False
+
+        self._execute(query, False, timeout=timeout)
+        return profiler.stop()
+
+    def _fetch_batches(self, cursor, fetch_result_limit: int = 0, keep: bool = True) -> (List[List[any]], int):
+        """
+        Fetch the result of a DB-API cursor in batches of `fetch_batch_size` rows, so that the client memory stays bounded.
+
+        Args:
+            cursor: The cursor of the executed query.
+            fetch_result_limit (int): The maximum number of rows to keep, all rows are fetched and counted regardless.
+            keep (bool): Whether to keep the rows, otherwise they are only counted.
+
+        Returns:
+            (List[List[any]], int): The kept rows and the total number of rows.
+        """
+        result = []
+        rows = 0
+        while True:
+            batch = cursor.fetchmany(self._fetch_batch_size)
+            if not batch:
+                break
+
+            rows += len(batch)
+            if not keep:
+                continue
+            if fetch_result_limit <= 0:
+                result.extend(batch)
+            elif len(result) < fetch_result_limit:
+                result.extend(batch[:fetch_result_limit - len(result)])
+
+        return result, rows
+
     def load_database(self):
         primary_key = self._index in [DBMS.Index.PRIMARY, DBMS.Index.FOREIGN]
         foreign_keys = self._index == DBMS.Index.FOREIGN
@@ -291,13 +579,9 @@ class DBMS(ABC):
                 result = Result()
 
                 progress.next(f'Running {name}...')
-                for i in range(warmup):
-                    self._execute(query, fetch_result, timeout=timeout)
-                    progress.finish()
-
-                for i in range(repetitions):
-                    result.merge(self._execute(query, fetch_result, timeout=timeout))
-                    progress.finish()
+                executions = self._execute_repetitions(query, fetch_result, warmup, repetitions, timeout=timeout, progress=progress)
+                for execution in executions[warmup:]:
+                    result.merge(execution)
 
                 results[name] = result
 
@@ -380,11 +664,11 @@ def database_systems() -> Dict[str, DBMSDescription]:
     Returns:
         Dict[str, DBMSDescription]: A dictionary mapping DBMS names to their description classes.
     """
-    from dbms import apollo, cedardb, clickhouse, duckdb, hyper, monetdb, postgres, singlestore, sqlserver, umbra, umbradev
+    from dbms import apollo, cedardb, clickhouse, duckdb, hyper, monetdb, noop, postgres, singlestore, sqlserver, umbra, umbradev
 
     dbms_list = [
         apollo.ApolloDescription, cedardb.CedarDBDescription, clickhouse.ClickHouseDescription,
-        duckdb.DuckDBDescription, hyper.HyperDescription, monetdb.MonetDBDescription,
+        duckdb.DuckDBDescription, hyper.HyperDescription, monetdb.MonetDBDescription, noop.NoOpDescription,
         postgres.PostgresDescription, singlestore.SingleStoreDescription, sqlserver.SQLServerDescription,
         umbra.UmbraDescription, umbradev.UmbraDevDescription
     ]
@@ -2,6 +2,7 @@ import os
 import tempfile
 import threading
 import time
+from typing import List, Optional, Tuple
 
 import requests
 import simplejson as json
@@ -10,7 +11,7 @@ from benchmarks.benchmark import Benchmark
 from dbms.dbms import DBMS, Result, DBMSDescription
 from queryplan.parsers.duckdbparser import DuckDBParser
 from queryplan.queryplan import QueryPlan
-from util import logger, sql
+from util import logger, sql, flamegraph
 
 duck = None
 
@@ -50,6 +51,9 @@ class DuckDB(DBMS):
         if self._version not in self.versions and self._version != "latest":
             raise Exception(f"DuckDB version {self._version} is not supported. Supported versions are: {', '.join(self.versions)}")
 
+        self._batch = params.get("batch", False)
+        self._profiling = params.get("profiling", "total")
+
     @property
     def name(self) -> str:
         return "duckdb"
@@ -59,13 +63,15 @@ class DuckDB(DBMS):
 
     def _connect(self, port: int):
         self.connection = None
+        self.session = requests.Session()
         url = f"http://localhost:{port}/query"
+        self.batch_connection = f"http://localhost:{port}/batch"
 
         start_time = time.time()
         check_timeout = 120  # 2 minutes
         while time.time() - start_time < check_timeout:
             try:
-                response = requests.post(url, json={"query": "SELECT 1"})
+                response = self.session.post(url, json={"query": "SELECT 1"})
                 if response.status_code == 200:
                     self.connection = url
                     break
@@ -87,12 +93,14 @@ class DuckDB(DBMS):
 
         # start Docker container
         docker_params = {}
-        self._start_container({}, 5432, 54323, self.host_dir.name, "/db", docker_params=docker_params)
+        environment = {"MEMORY_LIMIT": str(self._buffer_size)} if self._memory_limit is not None else {}
+        self._start_container(environment, 5432, 54323, self.host_dir.name, "/db", docker_params=docker_params)
         self._connect(54323)
 
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        self.session.close()
         self._close_container()
         if self.host_dir:
             self.host_dir.cleanup()
@@ -121,25 +129,9 @@ class DuckDB(DBMS):
             return sql.copy_statements_duckdb_csv_singlethreaded(schema, "/data")
         return sql.copy_statements_postgres(schema, "/data", supports_text=False)
 
-    def _execute(self, query: str, fetch_result: bool, timeout: int = 0, fetch_result_limit: int = 0) -> Result:
+    def _parse_response(self, payload: dict, timeout: int) -> Result:
         output = Result()
 
-        timer_kill = None
-        if timeout > 0:
-            timer_kill = threading.Timer(timeout * 10, self._kill_container)
-            timer_kill.start()
-
-        payload = {"query": query.strip(), "timeout": timeout, "fetch": fetch_result, "limit": fetch_result_limit}
-        response = requests.post(self.connection, json=payload)
-
-        if timer_kill is not None:
-            timer_kill.cancel()
-            timer_kill.join()
-
-        if response.status_code != 200:
-            raise Exception(f"Error {response.status_code}: {response.text}")
-
-        payload = response.json()
         if payload.get("error"):
             logger.log_error_verbose(payload.get("error"))
             output.message = payload.get("error")
@@ -147,6 +139,7 @@ class DuckDB(DBMS):
             output.state = Result.OOM if "Cannot allocate" in output.message else output.state
 
         output.rows = payload.get("rows")
+        output.start = payload.get("start")
         output.client_total.append(timeout * 1000 if output.state == Result.TIMEOUT else payload.get("client_total"))
         if output.state == Result.SUCCESS:
             if payload.get("total") is not None:
@@ -155,19 +148,94 @@ class DuckDB(DBMS):
                 output.execution.append(payload.get("execution"))
             if payload.get("compilation") is not None:
                 output.compilation.append(payload.get("compilation"))
+            if payload.get("extra"):
+                output.extra = payload.get("extra")
+
+        return output
+
+    def _read_result(self, output: Result):
+        try:
+            with open(os.path.join(self.host_dir.name, "results.json"), 'r') as result_file:
+                for row in json.loads(result_file.read(), use_decimal=True):
+                    output.result.append(row)
+        except Exception:
+            pass
+
+    def _post(self, url: str, payload: dict, kill_timeout: int) -> dict:
+        timer_kill = None
+        if kill_timeout > 0:
+            timer_kill = threading.Timer(kill_timeout, self._kill_container)
+            timer_kill.start()
+
+        response = self.session.post(url, json=payload)
+
+        if timer_kill is not None:
+            timer_kill.cancel()
+            timer_kill.join()
+
+        if response.status_code != 200:
+            raise Exception(f"Error {response.status_code}: {response.text}")
+
+        return response.json()
+
+    def _execute(self, query: str, fetch_result: bool, timeout: int = 0, fetch_result_limit: int = 0, profiling: Optional[str] = None) -> Result:
+        profiling = profiling if profiling is not None else self._profiling
+        payload = {"query": query.strip(), "timeout": timeout, "fetch": fetch_result, "limit": fetch_result_limit, "profiling": profiling}
+        output = self._parse_response(self._post(self.connection, payload, timeout * 10), timeout)
 
         if fetch_result:
-            try:
-                with open(os.path.join(self.host_dir.name, "results.json"), 'r') as result_file:
-                    for row in json.loads(result_file.read(), use_decimal=True):
-                        output.result.append(row)
-            except Exception:
-                pass
+            self._read_result(output)
 
         return output
 
+    def _set_memory_limit(self, limit: Optional[int]) -> bool:
+        if limit is None and self._memory_limit is None:
+            return self._execute("reset memory_limit", False).state == Result.SUCCESS
+        return self._execute(f"set memory_limit = '{limit or self._buffer_size}B'", False).state == Result.SUCCESS
+
+    def _flamegraph_profiler(self, output: str):
+        # Sample the Python server, including the native DuckDB frames
+        return flamegraph.PySpyRecord(self.container, self.host_dir.name, "/db", output)
+
+    def _prepared_statements(self, query: str) -> Optional[Tuple[str, str, str]]:
+        return f"prepare olapbench_stmt as {query.strip().rstrip(';')}", "execute olapbench_stmt", "deallocate olapbench_stmt"
+
+    def _run_repetitions(self, query: str, fetch_result: bool, warmup: int, repetitions: int, timeout: int = 0, fetch_result_limit: int = 0,
+                         progress: Optional[logger.LogProgress] = None) -> List[Result]:
+        if not self._batch:
+            return super()._run_repetitions(query, fetch_result, warmup, repetitions, timeout=timeout, fetch_result_limit=fetch_result_limit, progress=progress)
+
+        # The samplers cannot be stopped between the executions of a batch, they measure the batch as a whole
+        samplers = self._samplers()
+        for sampler in samplers:
+            sampler.start()
+
+        # Let the server run all repetitions to avoid one HTTP round trip per execution
+        payload = {"query": query.strip(), "timeout": timeout, "fetch": fetch_result, "limit": fetch_result_limit, "profiling": self._profiling, "warmup": warmup, "repetitions": repetitions}
+        try:
+            executions = self._post(self.batch_connection, payload, timeout * 10 * (warmup + repetitions))["executions"]
+        finally:
+            totals = {}
+            for sampler in reversed(samplers):
+                totals.update(sampler.stop())
+
+        results = [self._parse_response(execution, timeout) for execution in executions]
+        if samplers:
+            totals["sampled_executions"] = len(results)
+            for result in results:
+                result.extra.update(totals)
+        if fetch_result and results:
+            self._read_result(results[-1])
+
+        if progress is not None:
+            for i in range(warmup + repetitions):
+                progress.finish()
+
+        return results
+
     def retrieve_query_plan(self, query: str, include_system_representation: bool = False) -> QueryPlan:
-        result = self._execute(query="explain (format json, analyze) " + query.strip(), fetch_result=True).result
+        # The operator metrics of the plan are only collected with detailed profiling
+        result = self._execute(query="explain (format json, analyze) " + query.strip(), fetch_result=True, profiling="detailed").result
         if not result or not result[0]:
             return None
         json_plan = json.loads(result[0][1])
@@ -1,6 +1,7 @@
 import json
 import os
 import tempfile
+from typing import Optional
 
 from benchmarks.benchmark import Benchmark
 from dbms.dbms import DBMS, DBMSDescription
@@ -30,12 +31,14 @@ class Hyper(DuckDB):
 
         # start Docker container
         docker_params = {}
-        self._start_container({}, 5432, 54326, self.host_dir.name, "/db", docker_params=docker_params)
+        environment = {"MEMORY_LIMIT": str(self._buffer_size)} if self._memory_limit is not None else {}
+        self._start_container(environment, 5432, 54326, self.host_dir.name, "/db", docker_params=docker_params)
         self._connect(54326)
 
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        self.session.close()
         self._close_container()
         if self.host_dir:
             self.host_dir.cleanup()
@@ -63,6 +66,14 @@ class Hyper(DuckDB):
     def _copy_statements(self, schema: dict) -> list[str]:
         return sql.copy_statements_postgres(schema, "/data")
 
+    def _set_memory_limit(self, limit: Optional[int]) -> bool:
+        # The memory limit is a parameter of the hyperd process and cannot be changed at runtime
+        return False
+
+    def _flamegraph_profiler(self, output: str):
+        # The queries run in hyperd and not in the Python server, so sample the whole container with perf
+        return DBMS._flamegraph_profiler(self, output)
+
     def retrieve_query_plan(self, query: str, include_system_representation: bool = False) -> QueryPlan:
         result = self._execute(query="explain (format json, analyze) " + query.strip(), fetch_result=True).result
         json_plan = json.loads(result[0][0])["input"]
@@ -1,6 +1,7 @@
 import os
 import tempfile
 import time
+from typing import Optional
 
 import docker
 import docker.types
@@ -73,6 +74,9 @@ class MonetDB(DBMS):
             raise Exception("unable to connect to MonetDB")
 
         self.cursor = self.connection.cursor()
+        if self._fetch_batch_size > 0:
+            # number of rows transferred per round trip
+            self.cursor.arraysize = self._fetch_batch_size
 
         # configure the session
         self.cursor.execute("call sys.setmemorylimit(%d)" % (self._buffer_size // (1024 * 1024)))
@@ -81,8 +85,12 @@ class MonetDB(DBMS):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.connection.close()
-        self.container.stop()
+        try:
+            self.connection.close()
+        except Exception as e:
+            # The connection is broken, if the server was killed
+            logger.log_verbose_dbms(f"Error while closing the connection to {self.name}: {e}", self)
+        self._close_container()
         self.host_dir.cleanup()
 
     def _create_table_statements(self, schema: dict) -> list[str]:
@@ -100,6 +108,7 @@ class MonetDB(DBMS):
         try:
             self.cursor.execute(query)
         except Exception as e:
+            client_total = time.time() - begin
             logger.log_error_verbose(str(e))
             result.message = str(e)
             result.state = Result.TIMEOUT if "HYT00!Query aborted due to timeout" in result.message else Result.ERROR
@@ -108,7 +117,9 @@ class MonetDB(DBMS):
 
         result.rows = self.cursor.rowcount
         if fetch_result:
-            if fetch_result_limit > 0:
+            if self._fetch_batch_size > 0:
+                result.result, result.rows = self._fetch_batches(self.cursor, fetch_result_limit)
+            elif fetch_result_limit > 0:
                 result.result = self.cursor.fetchmany(fetch_result_limit)
             else:
                 result.result = self.cursor.fetchall()
@@ -117,6 +128,10 @@ class MonetDB(DBMS):
         result.client_total.append(client_total * 1000)
         return result
 
+    def _set_memory_limit(self, limit: Optional[int]) -> bool:
+        limit = limit if limit is not None else self._buffer_size
+        return self._execute("call sys.setmemorylimit(%d)" % (limit // (1024 * 1024)), False).state == Result.SUCCESS
+
     def load_database(self):
         super().load_database()
         self.cursor.execute("call sys.analyze()")
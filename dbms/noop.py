@@ -0,0 +1,52 @@
+import time
+
+from benchmarks.benchmark import Benchmark
+from dbms.dbms import DBMS, Result, DBMSDescription
+
+
+class NoOp(DBMS):
+    """A system that does not execute anything, used to measure the overhead of the driver"""
+
+    def __init__(self, benchmark: Benchmark, db_dir: str, data_dir: str, params: dict, settings: dict):
+        super().__init__(benchmark, db_dir, data_dir, params, settings)
+
+    @property
+    def name(self) -> str:
+        return "noop"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def _create_table_statements(self, schema: dict) -> list[str]:
+        return []
+
+    def _copy_statements(self, schema: dict) -> list[str]:
+        return []
+
+    def load_database(self):
+        pass
+
+    def _execute(self, query: str, fetch_result: bool, timeout: int = 0, fetch_result_limit: int = 0) -> Result:
+        result = Result()
+
+        begin = time.time()
+        result.rows = 0
+        result.client_total.append((time.time() - begin) * 1000)
+        return result
+
+
+class NoOpDescription(DBMSDescription):
+    @staticmethod
+    def get_name() -> str:
+        return 'noop'
+
+    @staticmethod
+    def get_description() -> str:
+        return 'No-op system (driver overhead)'
+
+    @staticmethod
+    def instantiate(benchmark: Benchmark, db_dir, data_dir, params: dict, settings: dict) -> DBMS:
+        return NoOp(benchmark, db_dir, data_dir, params, settings)
@@ -2,6 +2,7 @@ import os
 import tempfile
 import threading
 import time
+from typing import Optional, List, Tuple
 
 import psycopg2
 from benchmarks.benchmark import Benchmark
@@ -16,6 +17,8 @@ class Postgres(DBMS):
     def __init__(self, benchmark: Benchmark, db_dir: str, data_dir: str, params: dict, settings: dict):
         super().__init__(benchmark, db_dir, data_dir, params, settings)
 
+        self._profiling = params.get("profiling", "total")
+
     @property
     def name(self) -> str:
         return "postgres"
@@ -137,16 +140,34 @@ class Postgres(DBMS):
             timer = threading.Timer(timeout, self.connection.cancel)
             timer.start()
 
+        # Named (server-side) cursors stream the result in batches, but require a transaction.
+        # The client-side cursor transfers the whole result on execute, also if it is not fetched.
+        streaming = self._fetch_batch_size > 0 and sql.is_query(query)
+
         begin = time.time()
         try:
-            self.cursor.execute(query)
-
-            result.rows = self.cursor.rowcount
-            if fetch_result:
+            cursor = self.cursor
+            if streaming:
+                self.connection.autocommit = False
+                cursor = self.connection.cursor(name="olapbench_stream")
+                cursor.itersize = self._fetch_batch_size
+
+            cursor.execute(query)
+
+            result.rows = cursor.rowcount
+            if streaming:
+                # Without fetching the result, the rows are drained and only counted
+                result.result, result.rows = self._fetch_batches(cursor, fetch_result_limit, keep=fetch_result)
+            elif fetch_result:
                 if fetch_result_limit > 0:
-                    result.result = self.cursor.fetchmany(fetch_result_limit)
+                    result.result = cursor.fetchmany(fetch_result_limit)
                 else:
-                    result.result = self.cursor.fetchall()
+                    result.result = cursor.fetchall()
+
+            if streaming:
+                cursor.close()
+                self.connection.commit()
+                self.connection.autocommit = True
 
             client_total = time.time() - begin
             result.client_total.append(client_total * 1000)
@@ -163,6 +184,10 @@ class Postgres(DBMS):
             if self.connection.closed:
                 raise e
 
+            if streaming:
+                self.connection.rollback()
+                self.connection.autocommit = True
+
             logger.log_error_verbose(str(e))
             result.message = str(e)
             result.state = Result.ERROR
@@ -180,6 +205,67 @@ class Postgres(DBMS):
 
         return result
 
+    # buffer statistics of the plan's root node, keyed by the name used in the result's extra
+    _buffer_metrics = {
+        "shared_hit_blocks": "Shared Hit Blocks",
+        "shared_read_blocks": "Shared Read Blocks",
+        "shared_dirtied_blocks": "Shared Dirtied Blocks",
+        "shared_written_blocks": "Shared Written Blocks",
+        "local_hit_blocks": "Local Hit Blocks",
+        "local_read_blocks": "Local Read Blocks",
+        "temp_read_blocks": "Temp Read Blocks",
+        "temp_written_blocks": "Temp Written Blocks",
+    }
+
+    def _set_memory_limit(self, limit: Optional[int]) -> bool:
+        # Postgres does not fail without memory, but spills to disk once an operator exceeds work_mem
+        if limit is None:
+            return self._execute("reset work_mem", False).state == Result.SUCCESS
+        work_mem = min(limit // 1024, 2147483647)  # in kB, the maximum is 2 TB
+        return self._execute(f"set work_mem = '{work_mem}kB'", False).state == Result.SUCCESS
+
+    def _prepared_statements(self, query: str) -> Optional[Tuple[str, str, str]]:
+        # Streamed results need a cursor, which can only be declared for the query itself, not for the execute statement
+        if self._fetch_batch_size > 0 and sql.is_query(query):
+            logger.log_verbose_dbms("Streaming the result through a cursor, executing the query as text instead of preparing it", self)
+            return None
+        return f"prepare olapbench_stmt as {query.strip().rstrip(';')}", "execute olapbench_stmt", "deallocate olapbench_stmt"
+
+    def _execute_repetitions(self, query: str, fetch_result: bool, warmup: int, repetitions: int, timeout: int = 0, fetch_result_limit: int = 0,
+                             progress: Optional[logger.LogProgress] = None) -> List[Result]:
+        results = super()._execute_repetitions(query, fetch_result, warmup, repetitions, timeout=timeout, fetch_result_limit=fetch_result_limit, progress=progress)
+
+        # Measure the server-side timings in an additional, explained execution
+        if self._profiling == "detailed" and results and results[-1].state == Result.SUCCESS:
+            self._server_timings(query, results[-1], timeout=timeout)
+
+        return results
+
+    def _server_timings(self, query: str, result: Result, timeout: int = 0):
+        """Fill the planning and execution time and the buffer statistics of `explain (analyze, buffers)` into the result"""
+        explained = self._execute(query="explain (analyze, buffers, format json) " + query.strip(), fetch_result=True, timeout=timeout)
+        if explained.state != Result.SUCCESS:
+            logger.log_verbose_dbms(f"Unable to retrieve server-side timings: {explained.message}", self)
+            return
+
+        try:
+            json_plan = explained.result[0][0][0]
+            planning = json_plan["Planning Time"]
+            execution = json_plan["Execution Time"]
+        except (IndexError, KeyError, TypeError):
+            # Systems derived from Postgres use a different explain format
+            logger.log_verbose_dbms("Unable to retrieve server-side timings: unknown explain format", self)
+            return
+
+        result.compilation.append(planning)
+        result.execution.append(execution)
+        result.total.append(planning + execution)
+
+        root = json_plan.get("Plan", {})
+        for name, key in self._buffer_metrics.items():
+            if key in root:
+                result.extra[name] = root[key]
+
     def retrieve_query_plan(self, query: str, include_system_representation: bool = False) -> QueryPlan:
         result = self._execute(query="explain (format json, analyze) " + query.strip(), fetch_result=True).result
         json_plan = result[0][0][0]
@@ -2,6 +2,7 @@ import re
 import tempfile
 import threading
 import time
+from typing import Optional, Tuple
 
 import pyodbc
 
@@ -69,7 +70,7 @@ class SQLServer(DBMS):
         # configure SQL server
         self.cursor.execute("EXEC sp_configure 'show advanced options', '1'")
         self.cursor.execute("RECONFIGURE WITH OVERRIDE")
-        self.cursor.execute("EXEC sp_configure 'max server memory', %d" % (self._buffer_size // 1024))
+        self.cursor.execute("EXEC sp_configure 'max server memory', %d" % (self._buffer_size // (1024 * 1024)))
         self.cursor.execute("EXEC sp_configure 'max degree of parallelism', '%d'" % self._worker_threads)
         self.cursor.execute("EXEC sp_configure 'default trace enabled', 0")
         self.cursor.execute("RECONFIGURE WITH OVERRIDE")
@@ -110,6 +111,19 @@ class SQLServer(DBMS):
     def _copy_statements(self, schema: dict) -> list[str]:
         return sql.copy_statements_sqlserver(schema)
 
+    def _prepared_statements(self, query: str) -> Optional[Tuple[str, str, str]]:
+        # The handle returned by sp_prepare is kept in the session context, so that later batches can use it
+        text = query.strip().rstrip(';').replace("'", "''")
+        prepare = f"declare @handle int; exec sp_prepare @handle output, NULL, N'{text}'; exec sp_set_session_context N'olapbench_stmt', @handle;"
+        execute = "declare @handle int = cast(session_context(N'olapbench_stmt') as int); exec sp_execute @handle;"
+        deallocate = "declare @handle int = cast(session_context(N'olapbench_stmt') as int); exec sp_unprepare @handle;"
+        return prepare, execute, deallocate
+
+    def _set_memory_limit(self, limit: Optional[int]) -> bool:
+        limit = limit if limit is not None else self._buffer_size
+        result = self._execute("EXEC sp_configure 'max server memory', %d; RECONFIGURE WITH OVERRIDE;" % (limit // (1024 * 1024)), False)
+        return result.state == Result.SUCCESS
+
     def _execute(self, query: str, fetch_result: bool, timeout: int = 0, fetch_result_limit: int = 0) -> Result:
         result = Result()
 
@@ -127,7 +141,9 @@ class SQLServer(DBMS):
 
             result.rows = self.cursor.rowcount
             if fetch_result:
-                if fetch_result_limit > 0:
+                if self._fetch_batch_size > 0:
+                    result.result, result.rows = self._fetch_batches(self.cursor, fetch_result_limit)
+                elif fetch_result_limit > 0:
                     result.result = self.cursor.fetchmany(fetch_result_limit)
                 else:
                     result.result = self.cursor.fetchall()
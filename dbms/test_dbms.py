@@ -0,0 +1,208 @@
+from types import SimpleNamespace
+
+import docker
+import pytest
+
+from dbms.dbms import DBMS, Result
+from util.perf import parse_perf_csv
+
+
+class Cursor:
+    """A DB-API cursor over the given rows, which records the size of every fetch"""
+
+    def __init__(self, rows: list):
+        self.rows = rows
+        self.fetches = []
+
+    def fetchmany(self, size: int) -> list:
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        self.fetches.append(size)
+        return batch
+
+
+def fetch_batches(rows: list, batch_size: int, **kwargs):
+    cursor = Cursor(rows)
+    return DBMS._fetch_batches(SimpleNamespace(_fetch_batch_size=batch_size), cursor, **kwargs), cursor
+
+
+def test_fetch_batches():
+    rows = [[i] for i in range(10)]
+    (result, count), cursor = fetch_batches(rows, 4)
+    assert result == rows and count == 10
+    assert cursor.fetches == [4, 4, 4, 4]
+
+
+def test_fetch_batches_limit():
+    (result, count), _ = fetch_batches([[i] for i in range(10)], 4, fetch_result_limit=6)
+    assert result == [[i] for i in range(6)] and count == 10
+
+
+def test_fetch_batches_drain():
+    (result, count), cursor = fetch_batches([[i] for i in range(10)], 3, keep=False)
+    assert result == [] and count == 10
+    assert cursor.fetches == [3, 3, 3, 3, 3]
+
+
+def execution(client_total: float, **extra) -> Result:
+    result = Result()
+    result.client_total = [client_total]
+    result.extra = extra
+    return result
+
+
+def merged(executions: list) -> Result:
+    result = Result()
+    for execution in executions:
+        result.merge(execution)
+    return result
+
+
+def test_merge_resources():
+    result = merged([
+        execution(1.0, cpu_seconds=1.0, peak_memory=300, read_bytes=10, plan_shape="a"),
+        execution(2.0, cpu_seconds=3.0, peak_memory=500, read_bytes=30),
+        execution(3.0, cpu_seconds=2.0, peak_memory=400, read_bytes=20, plan_shape="b"),
+    ])
+    assert result.client_total == [1.0, 2.0, 3.0]
+    # every repetition contributes, peaks by their maximum and the other metrics by their median
+    assert result.extra == {"cpu_seconds": 2.0, "peak_memory": 500, "read_bytes": 20, "plan_shape": "a"}
+
+
+def test_merge_keeps_executions():
+    first = execution(1.0, peak_memory=100)
+    result = merged([first, execution(2.0, peak_memory=200)])
+    assert result.extra["peak_memory"] == 200
+    assert first.extra == {"peak_memory": 100}
+
+
+def test_merge_perf_counters():
+    outputs = [
+        "1000,,cycles,100,100.00,,\n2000,,instructions,100,100.00,,\n",
+        "3000,,cycles,100,100.00,,\n3000,,instructions,100,100.00,,\n",
+        "2000,,cycles,100,100.00,,\n5000,,instructions,100,100.00,,\n",
+    ]
+    result = merged([execution(float(i), **parse_perf_csv(output, 1.0)) for i, output in enumerate(outputs)])
+    # the counters describe all measured repetitions, not only the first one
+    assert result.extra == {"cycles": 2000.0, "instructions": 3000.0, "ipc": 2.0}
+
+
+class DeadContainer:
+    """A container that is removed while it is stopped, as after the kill timer fired"""
+
+    def __init__(self):
+        self.stops = 0
+
+    def stop(self, timeout: int = 10):
+        self.stops += 1
+        raise docker.errors.NotFound("No such container")
+
+
+def test_close_dead_container():
+    container = DeadContainer()
+    DBMS._close_container(SimpleNamespace(name="system", container=container, _container_status=lambda: "exited"))
+    assert container.stops == 1
+
+    # removed containers are not stopped at all
+    DBMS._close_container(SimpleNamespace(name="system", container=container, _container_status=lambda: "removed"))
+    assert container.stops == 1
+
+
+class PreparedDBMS:
+    """A system whose connection breaks during the prepared execution"""
+
+    name = "system"
+    _prepared = True
+
+    def __init__(self, crashed: bool):
+        self._crashed = crashed
+        self.statements = []
+
+    def crashed(self):
+        return self._crashed
+
+    def _prepared_statements(self, query):
+        return "prepare", "execute", "deallocate"
+
+    def _execute(self, query, fetch_result, timeout=0, fetch_result_limit=0):
+        self.statements.append(query)
+        if query == "deallocate":
+            raise RuntimeError("connection already closed")
+        result = Result()
+        result.client_total = [1.0]
+        return result
+
+    def _run_repetitions(self, query, *args, **kwargs):
+        raise ConnectionError("server closed the connection unexpectedly")
+
+
+@pytest.mark.parametrize("crashed", [True, False])
+def test_prepared_execution_error(crashed):
+    dbms = PreparedDBMS(crashed)
+    # the error of the execution is raised, not the one of the deallocation
+    with pytest.raises(ConnectionError):
+        DBMS._execute_repetitions(dbms, "select 1", False, 0, 1)
+    assert dbms.statements == (["prepare"] if crashed else ["prepare", "deallocate"])
+
+
+class RepetitionDBMS:
+    """A system whose executions take the given client times and report no start time of their own"""
+
+    def __init__(self, client_totals: list):
+        self.client_totals = iter(client_totals)
+
+    def _samplers(self):
+        return []
+
+    def _execute(self, query, fetch_result, timeout=0, fetch_result_limit=0):
+        result = Result()
+        result.client_total = [next(self.client_totals)]
+        result.state = Result.SUCCESS if result.client_total[0] < 10.0 else Result.TIMEOUT
+        return result
+
+
+def test_run_repetitions():
+    executions = DBMS._run_repetitions(RepetitionDBMS([5.0, 1.0, 2.0]), "select 1", False, 1, 2)
+    assert [execution.client_total for execution in executions] == [[5.0], [1.0], [2.0]]
+
+    # every execution gets its own start time
+    starts = [execution.start for execution in executions]
+    assert all(start is not None for start in starts)
+    assert starts == sorted(starts)
+
+
+def test_repetitions():
+    warmup = 1
+    executions = DBMS._run_repetitions(RepetitionDBMS([5.0, 1.0, 12.0]), "select 1", False, warmup, 2)
+
+    result = Result()
+    for i, execution in enumerate(executions):
+        result.repetitions.append(execution.repetition(i, i < warmup))
+        if i >= warmup:
+            result.merge(execution)
+
+    # the warmup is recorded, but does not contribute to the timings
+    assert [(repetition["index"], repetition["warmup"], repetition["client_total"], repetition["state"]) for repetition in result.repetitions] == [
+        (0, True, 5.0, Result.SUCCESS),
+        (1, False, 1.0, Result.SUCCESS),
+        (2, False, 12.0, Result.TIMEOUT),
+    ]
+    assert [repetition["start"] for repetition in result.repetitions] == [execution.start for execution in executions]
+    assert result.client_total == [1.0, 12.0]
+    assert result.state == Result.TIMEOUT
+
+
+def test_repetition_without_timing():
+    # an execution that failed before it was timed has no client time
+    result = Result()
+    result.state = Result.ERROR
+    assert result.repetition(0, False) == {"index": 0, "warmup": False, "start": None, "client_total": None, "state": Result.ERROR}
+
+
+def test_round():
+    result = execution(1.23456, cpu_seconds=0.98765, rows_read=10, plan_shape="a")
+    result.repetitions = [result.repetition(0, True), Result().repetition(1, False)]
+    result.round(2)
+
+    assert result.client_total == [1.23]
+    assert result.extra == {"cpu_seconds": 0.99, "rows_read": 10, "plan_shape": "a"}
+    assert [repetition["client_total"] for repetition in result.repetitions] == [1.23, None]
@@ -33,11 +33,15 @@ class UmbraDev(Umbra):
         self._database_name = UmbraDevDescription.get_database_name(benchmark, params)
 
         self.process = None
+        self._head_version = None
 
     @property
     def version(self) -> str:
         if self._version == "HEAD":
-            return Process(f'git rev-parse {self._version}', cwd=self._umbra_src).run().split('\n')[0]
+            # Resolve the commit only once, the version is queried for every result row
+            if self._head_version is None:
+                self._head_version = Process(f'git rev-parse {self._version}', cwd=self._umbra_src).run().split('\n')[0]
+            return self._head_version
         return self._version
 
     def __enter__(self):
@@ -106,6 +110,10 @@ class UmbraDev(Umbra):
             self.process.stop()
         self.result_dir.cleanup()
 
+    def crashed(self) -> bool:
+        # Umbra runs as a local process instead of a container
+        return self.process is not None and self.process.process.poll() is not None
+
     def _copy_statements(self, schema: dict) -> list[str]:
         return sql.copy_statements_postgres(schema, self._data_dir_client)
 
@@ -133,8 +141,9 @@ class UmbraDev(Umbra):
         output: str = None
         client_total = math.nan
         while output is None:
-            output = self.process.readline_stderr()
-            client_total = (time.time() - begin) * 1000
+            # Use the arrival time of the line, not the time it was processed
+            timestamp, output = self.process.readline_stderr_timestamped()
+            client_total = (timestamp - begin) * 1000
 
             if "execution:" in output and "compilation:" in output:
                 break
@@ -1,6 +1,5 @@
 import datetime
 import os
-import re
 import tempfile
 import threading
 import time
@@ -32,27 +31,86 @@ result_dir = tempfile.TemporaryDirectory(dir=db_dir)
 conn = duckdb.connect(database=":memory:", read_only=False)
 
 conn.execute("SET preserve_insertion_order=false")
+if "MEMORY_LIMIT" in os.environ:
+    conn.execute(f"SET memory_limit='{int(os.environ['MEMORY_LIMIT'])}B'")
 conn.execute(f"SET temp_directory ='{result_dir.name}'")
 
 conn.execute('create schema public;')
 conn.execute('use memory.public;')
 
+profile_output = os.path.join(result_dir.name, "profile.json")
+profiling_mode = None
 
-@app.post("/query")
-async def execute_query(payload: dict):
-    query = payload.get("query")
-    timeout = int(payload.get("timeout", 0))
-    fetch = bool(payload.get("fetch", False))
-    fetch_limit = int(payload.get("limit", 0))
 
-    if not query:
-        return {"rows": -1, "error": "no query provided", "client_total": float('nan'), "total": float('nan')}
+def set_profiling(mode: str):
+    """Switch the profiling mode (off, total or detailed), only issuing pragmas if the mode changes"""
+    global profiling_mode
+    if mode == profiling_mode:
+        return
 
-    with db_lock:  # Ensure thread safety
-        profile_output = os.path.join(result_dir.name, "profile.json")
+    if mode == "off":
+        conn.execute("PRAGMA disable_profiling;")
+    else:
+        try:
+            # Only collect the latency, if no operator metrics are needed (supported since DuckDB 1.1)
+            if mode == "total":
+                conn.execute("""PRAGMA custom_profiling_settings='{"LATENCY": "true"}';""")
+            else:
+                # The default metrics include the operator metrics of the plans, but not the peak memory in all versions
+                conn.execute("RESET custom_profiling_settings;")
+                settings = json.loads(conn.execute("SELECT current_setting('custom_profiling_settings');").fetchone()[0])
+                settings["SYSTEM_PEAK_BUFFER_MEMORY"] = "true"
+                conn.execute(f"PRAGMA custom_profiling_settings='{json.dumps(settings)}';")
+        except Exception:
+            # Older versions always collect all metrics
+            pass
         conn.execute("PRAGMA enable_profiling='json';")
         conn.execute("PRAGMA profile_output='" + profile_output + "';")
 
+    profiling_mode = mode
+
+
+def parse_operators(node: dict, operators: list, depth: int = 0):
+    for child in node.get("children", []):
+        timing = child.get("operator_timing", child.get("timing"))
+        operators.append({
+            "name": child.get("operator_type", child.get("operator_name", child.get("name"))),
+            "timing": timing * 1000 if timing is not None else None,
+            "cardinality": child.get("operator_cardinality", child.get("cardinality")),
+            "depth": depth,
+        })
+        parse_operators(child, operators, depth + 1)
+
+
+def parse_profile(mode: str) -> (float, dict):
+    """Parse the json profile of the last query, returns the total time and the additional metrics"""
+    with open(profile_output, 'r') as profile_file:
+        profile = json.load(profile_file)
+
+    # Newer versions report the latency, older versions the result time
+    total = profile.get("latency", profile.get("result", profile.get("timing")))
+    total = total * 1000 if total is not None else None
+
+    extra = {}
+    if mode == "detailed":
+        if profile.get("cpu_time") is not None:
+            extra["cpu_time"] = profile["cpu_time"] * 1000
+        if profile.get("system_peak_buffer_memory") is not None:
+            extra["peak_memory"] = profile["system_peak_buffer_memory"]
+        if profile.get("cumulative_cardinality") is not None:
+            extra["cumulative_cardinality"] = profile["cumulative_cardinality"]
+
+        operators = []
+        parse_operators(profile, operators)
+        extra["operators"] = operators
+
+    return total, extra
+
+
+def execute(query: str, timeout: int, fetch: bool, fetch_limit: int, profiling: str = "total") -> (dict, list):
+    with db_lock:  # Ensure thread safety
+        set_profiling(profiling)
+
         timer = None
         if timeout > 0:
             def interrupt():
@@ -88,18 +146,68 @@ async def execute_query(payload: dict):
         timer.join()
 
     total = None
-    try:
-        with open(profile_output, 'r') as profile:
-            total = float(re.findall(r'result...([0-9.]*)', profile.read())[-1]) * 1000
-    except Exception:
-        pass
+    extra = {}
+    if profiling != "off" and error_message is None:
+        try:
+            total, extra = parse_profile(profiling)
+        except Exception:
+            pass
+
+    return {"rows": rows, "error": error_message, "start": begin, "client_total": client_total, "total": total, "extra": extra}, result
+
+
+def write_result(result: list):
+    with open(results_path, "w") as f:
+        f.write(json.dumps(result, use_decimal=True, default=sql_encoder))
+
+
+@app.post("/query")
+async def execute_query(payload: dict):
+    query = payload.get("query")
+    timeout = int(payload.get("timeout", 0))
+    fetch = bool(payload.get("fetch", False))
+    fetch_limit = int(payload.get("limit", 0))
+    profiling = payload.get("profiling", "total")
+
+    if not query:
+        return {"rows": -1, "error": "no query provided", "client_total": float('nan'), "total": float('nan')}
+
+    response, result = execute(query, timeout, fetch, fetch_limit, profiling)
 
     # Log results
     if fetch:
-        with open(results_path, "w") as f:
-            f.write(json.dumps(result, use_decimal=True, default=sql_encoder))
+        write_result(result)
+
+    return response
+
+
+@app.post("/batch")
+async def execute_batch(payload: dict):
+    query = payload.get("query")
+    timeout = int(payload.get("timeout", 0))
+    fetch = bool(payload.get("fetch", False))
+    fetch_limit = int(payload.get("limit", 0))
+    warmup = int(payload.get("warmup", 0))
+    repetitions = int(payload.get("repetitions", 1))
+    profiling = payload.get("profiling", "total")
+
+    if not query:
+        return {"executions": [{"rows": -1, "error": "no query provided", "client_total": float('nan'), "total": float('nan')}]}
+
+    # Run the repetitions inside the server to avoid one HTTP round trip per execution
+    executions = []
+    result = None
+    for i in range(warmup + repetitions):
+        response, result = execute(query, timeout, fetch, fetch_limit, profiling)
+        executions.append(response)
+        if response["error"] is not None and i >= warmup:
+            break
+
+    # Log the results of the last execution
+    if fetch:
+        write_result(result)
 
-    return {"rows": rows, "error": error_message, "client_total": client_total, "total": total}
+    return {"executions": executions}
 
 
 if __name__ == "__main__":
@@ -10,7 +10,10 @@ import tableauhyperapi
 import uvicorn
 from fastapi import FastAPI
 
-mem = int(os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') * 0.8)
+if "MEMORY_LIMIT" in os.environ:
+    mem = int(os.environ["MEMORY_LIMIT"])
+else:
+    mem = int(os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') * 0.8)
 print(f"Hyper server starting (version: {tableauhyperapi.__version__})...")
 print(f"Hyper uses {mem / 1024**3:.2f}GB of memory")
 
@@ -47,16 +50,72 @@ hyper = tableauhyperapi.HyperProcess(telemetry=tableauhyperapi.Telemetry.DO_NOT_
 conn = tableauhyperapi.Connection(endpoint=hyper.endpoint, database=os.path.join(result_dir.name, "db.hyper"), create_mode=tableauhyperapi.CreateMode.CREATE_AND_REPLACE)
 
 
-@app.post("/query")
-async def execute_query(payload: dict):
-    query = payload.get("query")
-    timeout = int(payload.get("timeout", 0))
-    fetch = bool(payload.get("fetch", False))
-    fetch_limit = int(payload.get("limit", 0))
+class LogTailer:
+    """Reads the json entries appended to a log file since the last call"""
 
-    if not query:
-        return {"rows": -1, "error": "no query provided", "client_total": math.nan, "total": None, "execution": None, "compilation": None}
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+        self.partial = b""
+
+    def read(self) -> list:
+        try:
+            with open(self.path, 'rb') as log:
+                # Start from the beginning if the log was rotated
+                if os.fstat(log.fileno()).st_size < self.offset:
+                    self.offset = 0
+                    self.partial = b""
+
+                log.seek(self.offset)
+                data = self.partial + log.read()
+                self.offset = log.tell()
+        except FileNotFoundError:
+            return []
+
+        # Keep an incomplete last line for the next call
+        lines = data.split(b"\n")
+        self.partial = lines.pop()
+
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except Exception:
+                pass
+        return entries
+
+
+log_tailer = LogTailer(os.path.join(result_dir.name, "hyperd.log"))
+
+# Additional metrics taken from the query-end log entry: name -> (path, scale)
+query_end_metrics = {
+    "parsing": (["pre-execution", "parsing-time"], 1000),
+    "compilation": (["pre-execution", "compilation-time"], 1000),
+    "pre_execution": (["pre-execution", "elapsed"], 1000),
+    "execution": (["execution-time"], 1000),
+    "lock_acquisition": (["lock-acquisition-time"], 1000),
+    "time_to_schedule": (["time-to-schedule"], 1000),
+    "cpu_time": (["exec-threads", "cpu-time"], 1000),
+    "wait_time": (["exec-threads", "wait-time"], 1000),
+    "peak_transaction_memory_mb": (["peak-transaction-memory-mb"], 1),
+    "peak_result_buffer_memory_mb": (["peak-result-buffer-memory-mb"], 1),
+    "result_size_mb": (["result-size-mb"], 1),
+    "spooling": (["spooling"], 1),
+}
+
+
+def parse_query_end(value: dict) -> dict:
+    extra = {}
+    for name, (path, scale) in query_end_metrics.items():
+        metric = value
+        for key in path:
+            metric = metric.get(key) if isinstance(metric, dict) else None
+        if isinstance(metric, (int, float)):
+            extra[name] = float(metric) * scale
+    return extra
 
+
+def execute(query: str, timeout: int, fetch: bool, fetch_limit: int) -> (dict, list):
     with db_lock:  # Ensure thread safety
         timer = None
         if timeout > 0:
@@ -93,26 +152,75 @@ async def execute_query(payload: dict):
     total = None
     execution = None
     compilation = None
+    extra = {}
     try:
-        with open(os.path.join(result_dir.name, "hyperd.log"), 'r') as log:
-            for line in reversed(log.readlines()):
-                entry = json.loads(line)
-
-                if entry["k"] == "query-end":
-                    value = entry["v"]
-                    compilation = value['pre-execution']["parsing-time"] * 1000 + value['pre-execution']["compilation-time"] * 1000
-                    execution = value["execution-time"] * 1000
-                    total = value["elapsed"] * 1000
-                    break
+        entries = log_tailer.read()
+        for entry in reversed(entries):
+            if entry["k"] == "query-end":
+                value = entry["v"]
+                compilation = value['pre-execution']["parsing-time"] * 1000 + value['pre-execution']["compilation-time"] * 1000
+                execution = value["execution-time"] * 1000
+                total = value["elapsed"] * 1000
+                extra = parse_query_end(value)
+                break
+
+        extra["log_warnings"] = sum(1 for entry in entries if entry.get("sev") in ["warning", "error", "fatal"])
     except Exception:
         pass
 
+    return {"rows": rows, "error": error_message, "start": begin, "client_total": client_total, "total": total, "execution": execution, "compilation": compilation, "extra": extra}, result
+
+
+def write_result(result: list):
+    with open(results_path, "w") as f:
+        f.write(json.dumps(result, use_decimal=True, default=sql_encoder, allow_nan=True))
+
+
+@app.post("/query")
+async def execute_query(payload: dict):
+    query = payload.get("query")
+    timeout = int(payload.get("timeout", 0))
+    fetch = bool(payload.get("fetch", False))
+    fetch_limit = int(payload.get("limit", 0))
+
+    if not query:
+        return {"rows": -1, "error": "no query provided", "client_total": math.nan, "total": None, "execution": None, "compilation": None}
+
+    response, result = execute(query, timeout, fetch, fetch_limit)
+
     # Log results
     if fetch:
-        with open(results_path, "w") as f:
-            f.write(json.dumps(result, use_decimal=True, default=sql_encoder, allow_nan=True))
+        write_result(result)
+
+    return response
+
+
+@app.post("/batch")
+async def execute_batch(payload: dict):
+    query = payload.get("query")
+    timeout = int(payload.get("timeout", 0))
+    fetch = bool(payload.get("fetch", False))
+    fetch_limit = int(payload.get("limit", 0))
+    warmup = int(payload.get("warmup", 0))
+    repetitions = int(payload.get("repetitions", 1))
+
+    if not query:
+        return {"executions": [{"rows": -1, "error": "no query provided", "client_total": math.nan, "total": None, "execution": None, "compilation": None}]}
+
+    # Run the repetitions inside the server to avoid one HTTP round trip per execution
+    executions = []
+    result = None
+    for i in range(warmup + repetitions):
+        response, result = execute(query, timeout, fetch, fetch_limit)
+        executions.append(response)
+        if response["error"] is not None and i >= warmup:
+            break
+
+    # Log the results of the last execution
+    if fetch:
+        write_result(result)
 
-    return {"rows": rows, "error": error_message, "client_total": client_total, "total": total, "execution": execution, "compilation": compilation}
+    return {"executions": executions}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+import argparse
+import sys
+import tempfile
+
+from benchmark import System, run_benchmark
+from benchmarks.benchmark import Benchmark
+from util import logger
+
+TARGET_OVERHEAD = 100  # µs per query
+
+
+class MicroBenchmark(Benchmark):
+    """A synthetic benchmark with trivial queries, that is not backed by any data"""
+
+    def __init__(self, query_count: int):
+        super().__init__("", {})
+        self._query_count = query_count
+
+    @property
+    def path(self) -> str:
+        return ""
+
+    @property
+    def name(self) -> str:
+        return "microbench"
+
+    @property
+    def description(self) -> str:
+        return f"Driver microbenchmark ({self._query_count} queries)"
+
+    @property
+    def unique_name(self) -> str:
+        return f"microbench_{self._query_count}"
+
+    @property
+    def data_dir(self) -> str:
+        return ""
+
+    def dbgen(self):
+        pass
+
+    def post_process_queries(self, queries: list[tuple[str, str]]) -> list[tuple[str, str]]:
+        return queries
+
+    def queries(self, dbms_name: str) -> list[tuple[str, str]]:
+        return [(f"{i}.sql", "select 1") for i in range(self._query_count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the per-query overhead of the driver with the no-op system")
+    parser.add_argument("-q", "--queries", dest="queries", type=int, default=1000, help="number of queries (default: 1000)")
+    parser.add_argument("-r", "--repetitions", dest="repetitions", type=int, default=1, help="repetitions per query (default: 1)")
+    parser.add_argument("--query-plan", dest="query_plan", default=False, action="store_true", help="also retrieve (empty) query plans")
+    parser.add_argument("--target", dest="target", type=float, default=TARGET_OVERHEAD, help=f"maximum overhead per query in µs (default: {TARGET_OVERHEAD})")
+    args = parser.parse_args()
+
+    definition = {
+        "title": "Driver microbenchmark",
+        "repetitions": args.repetitions,
+        "warmup": 0,
+        "query_plan": {"retrieve": args.query_plan},
+        "type": "queries",
+    }
+    systems = [System("No-op", "noop", {}, {})]
+
+    with tempfile.TemporaryDirectory() as result_dir:
+        timer = run_benchmark(MicroBenchmark(args.queries), systems, definition, result_dir, result_dir, result_dir)
+
+    overhead = timer.overhead() * 1000000
+    if overhead > args.target:
+        logger.log_error(f"driver overhead of {overhead:.1f} µs per query exceeds the target of {args.target:.1f} µs")
+        sys.exit(1)
+    logger.log_driver(f"driver overhead of {overhead:.1f} µs per query is within the target of {args.target:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 
-from queryplan.plannode import PlanNode
+from queryplan.plannode import InnerNode, PlanNode
+from queryplan.queryoperator import OperatorType
 
 
 class Cleaner(ABC):
@@ -16,3 +17,27 @@ class Cleaner(ABC):
         new.exact_cardinality = old.exact_cardinality
         new.estimated_cardinality = old.estimated_cardinality
         return new
+
+    def fold(self, plan_node: InnerNode) -> PlanNode:
+        """Replace an operator with its only child"""
+        assert len(plan_node.children) == 1
+        return self.replace_node(plan_node, plan_node.children[0])
+
+
+def operator_name(plan_node: PlanNode) -> str:
+    """The operator type, or the name of a custom operator"""
+    operator = plan_node.operator
+    if operator.operator_type == OperatorType.CustomOperator:
+        return operator.name
+    return operator.operator_type.name
+
+
+def mirror_join_type(join_type: str | None) -> str | None:
+    """The join type with its inputs switched, e.g. leftsemi becomes rightsemi"""
+    if join_type is None:
+        return None
+    if join_type.startswith("left"):
+        return "right" + join_type[len("left"):]
+    if join_type.startswith("right"):
+        return "left" + join_type[len("right"):]
+    return join_type
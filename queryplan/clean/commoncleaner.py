@@ -0,0 +1,45 @@
+import logging
+
+from queryplan.clean.cleaner import Cleaner, operator_name
+from queryplan.plannode import InnerNode, PlanNode
+from queryplan.queryoperator import OperatorType, Sort
+
+
+class CommonCleaner(Cleaner):
+    """
+    Cleans the operators that all systems have in some form, after the system-specific cleaner:
+    Maps and projections are folded into their input, selections into the join or table scan below them,
+    and limits and top-n operators become sorts, with the limit if it is known.
+    """
+
+    def clean(self, plan_node: PlanNode) -> PlanNode:
+
+        if isinstance(plan_node, InnerNode):
+
+            # Clean children recursively first
+            plan_node.children = list(map(lambda child: self.clean(child), plan_node.children))
+
+            match operator_name(plan_node):
+                case "Map" | "Projection" if len(plan_node.children) == 1:
+                    logging.debug(f"Fold {operator_name(plan_node)} into {operator_name(plan_node.children[0])}")
+                    return self.fold(plan_node)
+                case "Select" if len(plan_node.children) == 1:
+                    only_child = plan_node.children[0]
+                    match only_child.operator.operator_type:
+                        case OperatorType.Join | OperatorType.TableScan:
+                            logging.debug(f"Fold Select into {only_child.operator.operator_type.name}")
+                            return self.fold(plan_node)
+                case "Limit" | "TopN" if len(plan_node.children) == 1:
+                    limit = getattr(plan_node.operator, "limit", None)
+                    only_child = plan_node.children[0]
+                    if only_child.operator.operator_type == OperatorType.Sort and operator_name(plan_node) == "Limit":
+                        logging.debug("Fold Limit into Sort")
+                        if limit is not None:
+                            only_child.operator.limit = limit
+                        return self.fold(plan_node)
+
+                    logging.debug(f"Rename {operator_name(plan_node)} to Sort")
+                    plan_node.operator = Sort(plan_node.operator.operator_id)
+                    plan_node.operator.limit = limit
+
+        return plan_node
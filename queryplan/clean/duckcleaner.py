@@ -1,53 +1,63 @@
 import logging
 
-from queryplan.clean.cleaner import Cleaner
+from queryplan.clean.cleaner import Cleaner, operator_name
 from queryplan.plannode import InnerNode, PlanNode
-from queryplan.queryoperator import OperatorType, Sort
+from queryplan.queryoperator import DBMSType, OperatorType
 
 
 class DuckCleaner(Cleaner):
 
     def clean(self, plan_node: PlanNode) -> PlanNode:
 
+        self.refill(plan_node)
+
         if isinstance(plan_node, InnerNode):
 
             # Clean children recursively first
             plan_node.children = list(map(lambda child: self.clean(child), plan_node.children))
 
-            match plan_node.operator.operator_type:
-                case OperatorType.Join if len(plan_node.children) == 2:
+            match operator_name(plan_node):
+                case "Join" if len(plan_node.children) == 2:
                     logging.debug("Switch build and probe")
-                    # switch probe and build for duckdb
+                    # switch probe and build for duckdb, the join types are already switched when the plan is parsed
                     plan_node.children.reverse()
-                    return plan_node
-                # Remove projections
-                case OperatorType.Projection:
-                    assert len(plan_node.children) == 1
-                    # update cardinalities
-                    only_child = plan_node.children[0]
-                    logging.debug(f"Fold projection into {only_child.operator.operator_type.name}")
-                    return self.replace_node(plan_node, only_child)
-                case OperatorType.Select:
-                    assert len(plan_node.children) == 1
-
-                    only_child = plan_node.children[0]
-                    match only_child.operator.operator_type:
-                        case OperatorType.Join | OperatorType.TableScan:
-                            logging.debug(f"Fold Select into {only_child.operator.operator_type.name}")
-                            # update cardinalities
-                            return self.replace_node(plan_node, only_child)
-                case OperatorType.Limit | OperatorType.TopN:
-                    # Just rename
-                    logging.debug(f"Rename {plan_node.operator.operator_type.name} to Sort")
-                    sort_operator = Sort(OperatorType.Sort, plan_node.operator.operator_id)
-
-                    match plan_node.operator.operator_type:
-                        case OperatorType.TopN:
-                            limit = int(plan_node.system_representation[0]["extra_info"].split("\n")[0].split(" ")[1])
-                            sort_operator.limit = limit
-                        case OperatorType.Limit:
-                            # can't extract anything from here yet
-                            pass
-                    plan_node.operator = sort_operator
+                case "TopN" | "Limit":
+                    # the limit is only known from the system representation, the common cleaner renames the operator to Sort
+                    plan_node.operator.limit = self.limit(plan_node)
 
         return plan_node
+
+    @staticmethod
+    def refill(plan_node: PlanNode):
+        """Fill in the table names and join methods of plans that were stored before the parser extracted them"""
+        operator = plan_node.operator
+        missing = (operator.operator_type == OperatorType.TableScan and operator.table_name is None) or \
+                  (operator.operator_type == OperatorType.Join and operator.method is None)
+        if not missing:
+            return
+        for representation in plan_node.system_representation:
+            if isinstance(representation, dict) and "operator_type" in representation and "extra_info" in representation:
+                try:
+                    operator.fill(representation, DBMSType.DuckDB)
+                except Exception:
+                    logging.debug(f"Cannot refill {operator.operator_type.name} from {representation['operator_type']}")
+                return
+
+    @staticmethod
+    def limit(plan_node: PlanNode) -> int | None:
+        for representation in plan_node.system_representation:
+            if not isinstance(representation, dict) or "extra_info" not in representation:
+                continue
+            extra_info = representation["extra_info"]
+            try:
+                # older versions of duckdb render the extra info as text, e.g. "Top 100\n..."
+                if isinstance(extra_info, str):
+                    if operator_name(plan_node) == "TopN":
+                        return int(extra_info.split("\n")[0].split(" ")[1])
+                elif "Top" in extra_info:
+                    return int(extra_info["Top"])
+                elif "Limit" in extra_info:
+                    return int(extra_info["Limit"])
+            except (IndexError, ValueError):
+                logging.debug(f"Unknown limit: {extra_info}")
+        return None
@@ -1,9 +1,7 @@
 import logging
 
-from queryoperators.operatortype import OperatorType
-from queryplan.clean.cleaner import Cleaner
-from queryplan.innernode import InnerNode
-from queryplan.plannode import PlanNode
+from queryplan.clean.cleaner import Cleaner, operator_name
+from queryplan.plannode import InnerNode, PlanNode
 
 
 class HyperUmbraCleaner(Cleaner):
@@ -16,29 +14,16 @@ class HyperUmbraCleaner(Cleaner):
             # Clean children recursively first
             plan_node.children = list(map(lambda child: self.clean(child), plan_node.children))
 
-            match plan_node.operator.operator_type:
-                case OperatorType.Map | OperatorType.EarlyExecution | OperatorType.AssertSingle:
-                    assert len(plan_node.children) == 1
-
+            match operator_name(plan_node):
+                case "EarlyExecution" | "AssertSingle" if len(plan_node.children) == 1:
                     # copy cardinalities
-                    only_child = plan_node.children[0]
-                    logging.debug(
-                        f"Fold {plan_node.operator.operator_type.name} into {only_child.operator.operator_type.name}")
-                    return self.replace_node(plan_node, only_child)
-                case OperatorType.Select:
-                    assert len(plan_node.children) == 1
-
-                    only_child = plan_node.children[0]
-                    match only_child.operator.operator_type:
-                        case OperatorType.Join | OperatorType.TableScan:
-                            logging.debug(
-                                f"Fold Select into {only_child.operator.operator_type.name}")
-                            return self.replace_node(plan_node, only_child)
-                case OperatorType.PipelineBreakerScan if len(plan_node.children) > 0:
+                    logging.debug(f"Fold {operator_name(plan_node)} into {operator_name(plan_node.children[0])}")
+                    return self.fold(plan_node)
+                case "PipelineBreakerScan" if len(plan_node.children) > 0:
                     assert len(plan_node.children) == 1
 
                     only_child = plan_node.children[0]
-                    if only_child.exact_cardinality > 0 or only_child.estimated_cardinality > 0:
+                    if (only_child.exact_cardinality or 0) > 0 or (only_child.estimated_cardinality or 0) > 0:
                         logging.debug("Reduce PipelineBreakerScan child cardinality to zero")
                         only_child.exact_cardinality, only_child.estimated_cardinality = (0, 0)
         return plan_node
@@ -0,0 +1,48 @@
+from typing import List, Optional
+
+from queryplan.clean.cleaner import Cleaner
+from queryplan.clean.commoncleaner import CommonCleaner
+from queryplan.clean.duckcleaner import DuckCleaner
+from queryplan.clean.hyperumbracleaner import HyperUmbraCleaner
+from queryplan.clean.postgrescleaner import PostgresCleaner
+from queryplan.compactplan import CompactPlan
+from queryplan.plannode import PlanNode
+from queryplan.queryoperator import DBMSType
+from queryplan.queryplan import QueryPlan
+
+# the plan parser of every system that retrieves query plans, see `retrieve_query_plan`
+DBMS_TYPES = {
+    "duckdb": DBMSType.DuckDB,
+    "hyper": DBMSType.Hyper,
+    "umbra": DBMSType.Umbra,
+    "umbradev": DBMSType.Umbra,
+    "postgres": DBMSType.Postgres,
+    "cedardb": DBMSType.Postgres,
+}
+
+
+def cleaners(dbms: Optional[str]) -> List[Cleaner]:
+    """The cleaners of a system, the system-specific cleaner first. Plans of unknown systems are only cleaned by the common cleaner."""
+    match DBMS_TYPES.get(dbms):
+        case DBMSType.DuckDB:
+            specific = [DuckCleaner()]
+        case DBMSType.Hyper | DBMSType.Umbra:
+            specific = [HyperUmbraCleaner()]
+        case DBMSType.Postgres:
+            specific = [PostgresCleaner()]
+        case _:
+            specific = []
+    return specific + [CommonCleaner()]
+
+
+def normalize(plan: PlanNode | QueryPlan, dbms: Optional[str]) -> PlanNode | QueryPlan:
+    """
+    Normalize the plan of a system, so that the plans of different systems are comparable:
+    pass-through operators are folded into their inputs, the build side of joins is the first input, and limits are sorts.
+    The cleaners change the plan nodes they are given, so a copy of the plan is cleaned.
+    """
+    root = plan.plan if isinstance(plan, QueryPlan) else plan
+    root = CompactPlan.from_plan_node(root, system_representation=True).to_plan_node()
+    for cleaner in cleaners(dbms):
+        root = cleaner.clean(root)
+    return QueryPlan(text=plan.text, plan=root) if isinstance(plan, QueryPlan) else root
@@ -0,0 +1,42 @@
+import logging
+
+from queryplan.clean.cleaner import Cleaner, mirror_join_type, operator_name
+from queryplan.plannode import InnerNode, PlanNode
+
+# postgres join types as named by the other systems, relative to the outer (first) input
+JOIN_TYPES = {
+    "Inner": "inner",
+    "Left": "leftouter",
+    "Right": "rightouter",
+    "Full": "fullouter",
+    "Semi": "leftsemi",
+    "Anti": "leftanti",
+    "Right Semi": "rightsemi",
+    "Right Anti": "rightanti",
+}
+
+
+class PostgresCleaner(Cleaner):
+
+    def clean(self, plan_node: PlanNode) -> PlanNode:
+
+        if isinstance(plan_node, InnerNode):
+
+            # Clean children recursively first
+            plan_node.children = list(map(lambda child: self.clean(child), plan_node.children))
+
+            match operator_name(plan_node):
+                # operators that only pass on their input
+                case "Hash" | "Materialize" | "Memoize" | "Gather" if len(plan_node.children) == 1:
+                    logging.debug(f"Fold {operator_name(plan_node)} into {operator_name(plan_node.children[0])}")
+                    return self.fold(plan_node)
+                case "Join":
+                    operator = plan_node.operator
+                    operator.type = JOIN_TYPES.get(operator.type, operator.type)
+                    # the build side of a hash join is the inner (second) input, other systems build on the first input
+                    if operator.method == "hash" and len(plan_node.children) == 2:
+                        logging.debug("Switch build and probe")
+                        plan_node.children.reverse()
+                        operator.type = mirror_join_type(operator.type)
+
+        return plan_node
@@ -0,0 +1,109 @@
+import pytest
+
+from queryplan.clean.commoncleaner import CommonCleaner
+from queryplan.clean.duckcleaner import DuckCleaner
+from queryplan.clean.hyperumbracleaner import HyperUmbraCleaner
+from queryplan.clean.normalize import cleaners, normalize
+from queryplan.clean.postgrescleaner import PostgresCleaner
+from queryplan.compactplan import CompactPlan
+from queryplan.plannode import InnerNode, LeafNode, PlanNode
+from queryplan.queryoperator import CustomOperator, Join, OperatorType, Result, Select, Sort, TableScan
+from queryplan.queryplan import QueryPlan
+
+
+def scan(operator_id: int, table: str, cardinality: int) -> LeafNode:
+    operator = TableScan(operator_id)
+    operator.table_name = table
+    return LeafNode(operator, cardinality, cardinality, None)
+
+
+def node(operator, cardinality: int, children: list, system_representation: dict = None) -> InnerNode:
+    return InnerNode(operator, cardinality, cardinality, children, system_representation)
+
+
+def join(operator_id: int, method: str, join_type: str, children: list) -> InnerNode:
+    operator = Join(operator_id)
+    operator.method = method
+    operator.type = join_type
+    return node(operator, 10, children)
+
+
+def labels(root: PlanNode) -> list:
+    compact = CompactPlan.from_plan_node(root)
+    return [compact.label(index) for index in compact]
+
+
+@pytest.mark.parametrize("dbms, specific", [
+    ("duckdb", [DuckCleaner]),
+    ("hyper", [HyperUmbraCleaner]),
+    ("umbra", [HyperUmbraCleaner]),
+    ("umbradev", [HyperUmbraCleaner]),
+    ("postgres", [PostgresCleaner]),
+    ("cedardb", [PostgresCleaner]),
+    ("unknown", []),
+    (None, []),
+])
+def test_cleaners(dbms, specific):
+    # the system-specific cleaner runs first, the common cleaner always runs
+    assert [type(cleaner) for cleaner in cleaners(dbms)] == specific + [CommonCleaner]
+
+
+def test_postgres():
+    build = node(CustomOperator("Hash", None), 100, [scan(4, "lineitem", 100)])
+    root = node(Result(1), 10, [join(2, "hash", "Semi", [scan(3, "orders", 50), build])])
+
+    normalized = normalize(root, "postgres")
+    # the hash operator is folded, the build side becomes the first input with the mirrored join type
+    assert labels(normalized) == ["Result", "Join", "TableScan", "TableScan"]
+    assert [child.operator.table_name for child in normalized.children[0].children] == ["lineitem", "orders"]
+    assert normalized.children[0].operator.type == "rightsemi"
+
+    # the plan that was given is not changed
+    assert labels(root) == ["Result", "Join", "TableScan", "Hash", "TableScan"]
+    assert root.children[0].operator.type == "Semi"
+
+
+def test_postgres_nested_loop():
+    root = node(Result(1), 10, [join(2, "nested loop", "Left", [scan(3, "orders", 50), node(CustomOperator("Materialize", None), 5, [scan(4, "nation", 5)])])])
+    normalized = normalize(root, "postgres")
+    # only hash joins build on their second input
+    assert [child.operator.table_name for child in normalized.children[0].children] == ["orders", "nation"]
+    assert normalized.children[0].operator.type == "leftouter"
+
+
+def test_duckdb():
+    top = node(CustomOperator("TopN", None), 10, [join(2, "hash", "inner", [scan(3, "orders", 50), scan(4, "lineitem", 100)])], {"extra_info": {"Top": "10"}})
+    normalized = normalize(node(Result(1), 10, [top]), "duckdb")
+
+    # duckdb builds on the second input, top-n operators become sorts with their limit
+    sort = normalized.children[0]
+    assert sort.operator.operator_type == OperatorType.Sort and sort.operator.limit == 10
+    assert [child.operator.table_name for child in sort.children[0].children] == ["lineitem", "orders"]
+
+
+def test_hyper_umbra():
+    early = node(CustomOperator("EarlyExecution", None), 20, [scan(3, "orders", 20)])
+    for dbms in ["hyper", "umbra", "umbradev"]:
+        assert labels(normalize(node(Result(1), 20, [early]), dbms)) == ["Result", "TableScan"]
+
+
+def test_common():
+    limit = node(CustomOperator("Limit", None), 5, [node(Sort(4), 50, [node(Select(5), 50, [scan(6, "orders", 100)])])])
+    limit.operator.limit = 5
+    projection = node(CustomOperator("Projection", None), 5, [limit])
+    root = node(Result(1), 5, [projection])
+
+    normalized = normalize(root, None)
+    # projections are folded, selections are folded into the scan, and a limit over a sort is folded into the sort
+    assert labels(normalized) == ["Result", "Sort", "TableScan"]
+    sort = normalized.children[0]
+    assert sort.operator.limit == 5
+    # folded operators pass on their cardinalities
+    assert sort.exact_cardinality == 5 and sort.children[0].exact_cardinality == 50
+
+
+def test_query_plan():
+    query_plan = QueryPlan(text="select * from orders", plan=node(Result(1), 20, [node(CustomOperator("Map", None), 20, [scan(2, "orders", 20)])]))
+    normalized = normalize(query_plan, "duckdb")
+    assert isinstance(normalized, QueryPlan) and normalized.text == query_plan.text
+    assert labels(normalized.plan) == ["Result", "TableScan"]
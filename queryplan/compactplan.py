@@ -0,0 +1,226 @@
+import json
+import math
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from queryplan.encoder.jsondecoder import NODE_ATTRS, OPERATORS
+from queryplan.encoder.serdeskeys import *
+from queryplan.plannode import InnerNode, LeafNode, PlanNode
+from queryplan.queryoperator import CustomOperator, OperatorType
+
+OPERATOR_TYPES = list(OperatorType)
+_type_codes = {operator_type: code for code, operator_type in enumerate(OPERATOR_TYPES)}
+_label_codes = {operator_type.name: code for code, operator_type in enumerate(OPERATOR_TYPES)}
+
+# operator id of operators without one
+NO_ID = -(1 << 63)
+
+
+class AttributeTable:
+    """
+    Interned operator attributes, every distinct set of attributes, e.g. (("method", "hash"), ("type", "inner")), is stored once.
+    A table can be shared by many plans, so that the attributes of a whole corpus are stored once.
+    """
+
+    def __init__(self):
+        self.attributes: List[Tuple[Tuple[str, any], ...]] = [()]
+        self._codes: Dict[Tuple[Tuple[str, any], ...], int] = {(): 0}
+
+    def intern(self, attributes: Tuple[Tuple[str, any], ...]) -> int:
+        code = self._codes.get(attributes)
+        if code is None:
+            code = self._codes[attributes] = len(self.attributes)
+            self.attributes.append(attributes)
+        return code
+
+    def __getitem__(self, code: int) -> Tuple[Tuple[str, any], ...]:
+        return self.attributes[code]
+
+    def __len__(self):
+        return len(self.attributes)
+
+
+def _cardinality(value: float) -> Optional[int | float]:
+    if math.isnan(value):
+        return None
+    return int(value) if value.is_integer() else value
+
+
+class CompactPlan:
+    """
+    A query plan as flat arrays instead of plan node and operator objects, with the operators in pre-order:
+    operator type, operator id, parent index and both cardinalities per operator, and an index into an attribute table.
+    The children of an operator follow it in their original order, the root is operator 0 with parent -1.
+    Missing ids and cardinalities are stored as NO_ID and NaN, integral cardinalities are restored as ints.
+    System representations are only kept on request, they are usually most of the plan's size.
+    All builders and encoders are iterative, so plans of any depth are supported.
+    """
+
+    __slots__ = ("text", "types", "ids", "parents", "estimated", "exact", "attrs", "attribute_table", "system_representations")
+
+    def __init__(self, attribute_table: Optional[AttributeTable] = None, text: Optional[str] = None):
+        self.text = text
+        self.types = array("B")
+        self.ids = array("q")
+        self.parents = array("i")
+        self.estimated = array("d")
+        self.exact = array("d")
+        self.attrs = array("i")
+        self.attribute_table = attribute_table or AttributeTable()
+        self.system_representations: Optional[List[list]] = None
+
+    def __len__(self):
+        return len(self.types)
+
+    def _append(self, operator_type: int, operator_id: Optional[int], parent: int, estimated, exact, attributes: Tuple[Tuple[str, any], ...]) -> int:
+        self.types.append(operator_type)
+        self.ids.append(NO_ID if operator_id is None else operator_id)
+        self.parents.append(parent)
+        self.estimated.append(math.nan if estimated is None else estimated)
+        self.exact.append(math.nan if exact is None else exact)
+        self.attrs.append(self.attribute_table.intern(attributes))
+        return len(self.types) - 1
+
+    @staticmethod
+    def from_plan_node(root: PlanNode, attribute_table: Optional[AttributeTable] = None, text: Optional[str] = None,
+                       system_representation: bool = False) -> "CompactPlan":
+        plan = CompactPlan(attribute_table, text)
+        if system_representation:
+            plan.system_representations = []
+
+        stack = [(root, -1)]
+        while stack:
+            plan_node, parent = stack.pop()
+            operator = plan_node.operator
+            # the attributes as written by the json encoder
+            attributes = tuple(
+                (attr, json.dumps(val) if isinstance(val, (list, dict)) else val)
+                for attr, val in operator.__dict__.items() if attr not in EXCLUDE_ATTRS and val is not None
+            )
+            index = plan._append(_type_codes[operator.operator_type], operator.operator_id, parent,
+                                 plan_node.estimated_cardinality, plan_node.exact_cardinality, attributes)
+            if system_representation:
+                plan.system_representations.append(plan_node.system_representation)
+
+            if isinstance(plan_node, InnerNode):
+                stack.extend((child, index) for child in reversed(plan_node.children))
+        return plan
+
+    @staticmethod
+    def from_json(encoded_plan: str | dict, attribute_table: Optional[AttributeTable] = None, system_representation: bool = False) -> "CompactPlan":
+        """Build the plan from the json encoding of a query plan or plan node, without creating plan nodes"""
+        if isinstance(encoded_plan, str):
+            encoded_plan = json.loads(encoded_plan)
+
+        text = None
+        if QUERY_PLAN_KEY in encoded_plan:
+            text = encoded_plan.get(QUERY_TEXT_KEY)
+            encoded_plan = encoded_plan[QUERY_PLAN_KEY]
+
+        plan = CompactPlan(attribute_table, text)
+        if system_representation:
+            plan.system_representations = []
+
+        stack = [(encoded_plan, -1)]
+        while stack:
+            node, parent = stack.pop()
+            attrs = node[JX_ATTRS_KEY]
+            attributes = tuple((attr, val) for attr, val in attrs.items() if attr != OPERATOR_ID_KEY and attr not in NODE_ATTRS)
+            index = plan._append(_label_codes[node[JX_LABEL_KEY]], attrs.get(OPERATOR_ID_KEY), parent,
+                                 attrs.get(ESTIMATED_CARDINALITY_KEY), attrs.get(EXACT_CARDINALITY_KEY), attributes)
+            if system_representation:
+                representation = attrs.get("system_representation")
+                plan.system_representations.append([] if representation is None else json.loads(representation))
+
+            stack.extend((child, index) for child in reversed(node[JX_CHILDREN_KEY]))
+        return plan
+
+    def operator_type(self, index: int) -> OperatorType:
+        return OPERATOR_TYPES[self.types[index]]
+
+    def operator_id(self, index: int) -> Optional[int]:
+        return None if self.ids[index] == NO_ID else self.ids[index]
+
+    def attributes(self, index: int) -> dict:
+        return dict(self.attribute_table[self.attrs[index]])
+
+    def label(self, index: int) -> str:
+        """The operator type, or the name of a custom operator"""
+        operator_type = self.operator_type(index)
+        if operator_type == OperatorType.CustomOperator:
+            return self.attributes(index).get(OPERATOR_NAME_KEY, operator_type.name)
+        return operator_type.name
+
+    def children(self) -> List[List[int]]:
+        """The children of every operator"""
+        children = [[] for _ in self.types]
+        for index, parent in enumerate(self.parents):
+            if parent >= 0:
+                children[parent].append(index)
+        return children
+
+    def depths(self) -> array:
+        """The depth of every operator, the root has depth 0"""
+        depths = array("i", bytes(4 * len(self.types)))
+        for index in range(1, len(self.types)):
+            depths[index] = depths[self.parents[index]] + 1
+        return depths
+
+    def subtree_counts(self, operator_types: set) -> array:
+        """The number of operators of the given types in the subtree of every operator, including the operator"""
+        codes = {_type_codes[operator_type] for operator_type in operator_types}
+        counts = array("i", (1 if code in codes else 0 for code in self.types))
+        # children come after their parents
+        for index in range(len(self.types) - 1, 0, -1):
+            counts[self.parents[index]] += counts[index]
+        return counts
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self.types)))
+
+    def to_json(self) -> dict:
+        """The plan in the json encoding of `QueryPlanJsonEncoder`"""
+        nodes = []
+        for index in self:
+            attrs = {}
+            operator_id = self.operator_id(index)
+            if operator_id:
+                attrs[OPERATOR_ID_KEY] = operator_id
+            attrs.update(self.attribute_table[self.attrs[index]])
+            for key, values in [(ESTIMATED_CARDINALITY_KEY, self.estimated), (EXACT_CARDINALITY_KEY, self.exact)]:
+                value = _cardinality(values[index])
+                if value is not None:
+                    attrs[key] = value
+            if self.system_representations is not None:
+                attrs["system_representation"] = json.dumps(self.system_representations[index])
+
+            node = {JX_LABEL_KEY: self.operator_type(index).name, JX_ATTRS_KEY: attrs, JX_CHILDREN_KEY: []}
+            nodes.append(node)
+            if self.parents[index] >= 0:
+                nodes[self.parents[index]][JX_CHILDREN_KEY].append(node)
+        return nodes[0]
+
+    def to_plan_node(self) -> PlanNode:
+        """The plan as plan nodes and operators, the system representations are empty unless they were kept"""
+        children = self.children()
+        plan_nodes: List[Optional[PlanNode]] = [None] * len(self.types)
+
+        # children are created before their parents
+        for index in range(len(self.types) - 1, -1, -1):
+            operator_type = self.operator_type(index)
+            attributes = self.attributes(index)
+            if operator_type == OperatorType.CustomOperator:
+                operator = CustomOperator(attributes.pop(OPERATOR_NAME_KEY, None), self.operator_id(index))
+            else:
+                operator = OPERATORS[operator_type](self.operator_id(index))
+            for attr, val in attributes.items():
+                setattr(operator, attr, val)
+
+            estimated, exact = _cardinality(self.estimated[index]), _cardinality(self.exact[index])
+            if len(children[index]) > 0:
+                plan_node = InnerNode(operator, estimated, exact, [plan_nodes[child] for child in children[index]], None)
+            else:
+                plan_node = LeafNode(operator, estimated, exact, None)
+            plan_node.system_representation = [] if self.system_representations is None else self.system_representations[index]
+            plan_nodes[index] = plan_node
+        return plan_nodes[0]
@@ -0,0 +1,61 @@
+import json
+
+from queryplan.encoder.serdeskeys import *
+from queryplan.plannode import InnerNode, LeafNode, PlanNode
+from queryplan.queryoperator import *
+
+OPERATORS = {
+    OperatorType.Result: Result,
+    OperatorType.TableScan: TableScan,
+    OperatorType.InlineTable: InlineTable,
+    OperatorType.Temp: Temp,
+    OperatorType.PipelineBreakerScan: PipelineBreakerScan,
+    OperatorType.Select: Select,
+    OperatorType.Map: Map,
+    OperatorType.Sort: Sort,
+    OperatorType.GroupBy: GroupBy,
+    OperatorType.Join: Join,
+    OperatorType.GroupJoin: GroupJoin,
+    OperatorType.EarlyProbe: EarlyProbe,
+    OperatorType.SetOperation: SetOperation,
+    OperatorType.Window: Window,
+    OperatorType.Iteration: Iteration,
+    OperatorType.IterationScan: IterationScan,
+    OperatorType.ArrayUnnest: ArrayUnnest,
+    OperatorType.RegexSplit: RegexSplit,
+    OperatorType.Subquery: Subquery,
+}
+
+# plan node attributes, all other attributes belong to the operator
+NODE_ATTRS = {ESTIMATED_CARDINALITY_KEY, EXACT_CARDINALITY_KEY, "system_representation"}
+
+
+class QueryPlanJsonDecoder:
+    """Inverse of `QueryPlanJsonEncoder`, restores the plan nodes and operators of a stored plan"""
+
+    def decode_plan_node(self, json_dict: dict) -> PlanNode:
+        operator_type = OperatorType[json_dict[JX_LABEL_KEY]]
+        attrs = dict(json_dict[JX_ATTRS_KEY])
+        operator_id = attrs.pop(OPERATOR_ID_KEY, None)
+
+        if operator_type == OperatorType.CustomOperator:
+            operator = CustomOperator(attrs.pop(OPERATOR_NAME_KEY, None), operator_id)
+        else:
+            operator = OPERATORS[operator_type](operator_id)
+
+        for attr, val in attrs.items():
+            if attr not in NODE_ATTRS:
+                setattr(operator, attr, val)
+
+        estimated_cardinality = attrs.get(ESTIMATED_CARDINALITY_KEY)
+        exact_cardinality = attrs.get(EXACT_CARDINALITY_KEY)
+        children = [self.decode_plan_node(child) for child in json_dict[JX_CHILDREN_KEY]]
+        if len(children) > 0:
+            plan_node = InnerNode(operator, estimated_cardinality, exact_cardinality, children, None)
+        else:
+            plan_node = LeafNode(operator, estimated_cardinality, exact_cardinality, None)
+
+        # the system representation is encoded as a json list
+        system_representation = attrs.get("system_representation")
+        plan_node.system_representation = [] if system_representation is None else json.loads(system_representation)
+        return plan_node
@@ -0,0 +1,57 @@
+import json
+
+from queryplan.encoder.jsondecoder import QueryPlanJsonDecoder
+from queryplan.encoder.jsonencoder import QueryPlanJsonEncoder
+from queryplan.plannode import InnerNode, LeafNode
+from queryplan.queryoperator import CustomOperator, GroupBy, Join, OperatorType, Result, TableScan
+from queryplan.queryplan import QueryPlan, decode_query_plan, encode_query_plan
+
+
+def scan(operator_id: int, table: str, cardinality: int) -> LeafNode:
+    operator = TableScan(operator_id)
+    operator.table_name = table
+    return LeafNode(operator, cardinality, cardinality, {"name": table})
+
+
+def plan() -> InnerNode:
+    join = Join(3)
+    join.type = "inner"
+    join.method = "hash"
+    group_by = GroupBy(2)
+    group_by.method = "hash"
+    custom = CustomOperator("PROJECTION", 6)
+    return InnerNode(Result(1), 10, 10, [
+        InnerNode(group_by, 10, 12, [
+            InnerNode(join, 100, 0, [
+                scan(4, "orders", 1000),
+                InnerNode(custom, None, 5, [scan(5, "lineitem", 6000)], "projection"),
+            ], None),
+        ], None),
+    ], None)
+
+
+def test_round_trip():
+    encoded = QueryPlanJsonEncoder().encode_plan_node(plan())
+    decoded = QueryPlanJsonDecoder().decode_plan_node(json.loads(json.dumps(encoded)))
+    assert QueryPlanJsonEncoder().encode_plan_node(decoded) == encoded
+
+
+def test_decode_operators():
+    root = QueryPlanJsonDecoder().decode_plan_node(QueryPlanJsonEncoder().encode_plan_node(plan()))
+    group_by = root.children[0]
+    join = group_by.children[0]
+    custom = join.children[1]
+
+    assert isinstance(root.operator, Result) and root.operator.operator_id == 1
+    assert group_by.operator.method == "hash" and group_by.exact_cardinality == 12
+    assert (join.operator.type, join.operator.method, join.exact_cardinality) == ("inner", "hash", 0)
+    assert custom.operator.operator_type == OperatorType.CustomOperator and custom.operator.name == "PROJECTION"
+    assert custom.estimated_cardinality is None
+    assert isinstance(join.children[0], LeafNode) and join.children[0].operator.table_name == "orders"
+
+
+def test_query_plan():
+    encoded = encode_query_plan(QueryPlan(text="select *\n  from orders", plan=plan()))
+    decoded = decode_query_plan(encoded)
+    assert decoded.text == "select * from orders"
+    assert encode_query_plan(decoded) == encoded
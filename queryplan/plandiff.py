@@ -0,0 +1,338 @@
+import html
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from queryplan.clean.normalize import normalize
+from queryplan.encoder.serdeskeys import EXCLUDE_ATTRS
+from queryplan.plannode import InnerNode, PlanNode
+from queryplan.queryoperator import OperatorType
+from queryplan.queryplan import QueryPlan, decode_query_plan
+
+# operator attributes that are compared for every aligned operator, with a readable name
+REPORTED_ATTRS = {
+    OperatorType.Join: {"method": "join method", "type": "join type"},
+    OperatorType.GroupBy: {"method": "group-by method"},
+    OperatorType.Sort: {"limit": "sort limit"},
+    OperatorType.TableScan: {"table_name": "table", "type": "scan type"},
+}
+
+# edit costs, renaming an operator costs less if the operator type stays the same
+INSERT_COST = 1.0
+DELETE_COST = 1.0
+RELABEL_COST = 1.0
+CHANGE_COST = 0.5
+
+
+def children(plan_node: PlanNode) -> List[PlanNode]:
+    return plan_node.children if isinstance(plan_node, InnerNode) else []
+
+
+def label(plan_node: PlanNode) -> str:
+    operator = plan_node.operator
+    if operator.operator_type == OperatorType.CustomOperator:
+        return operator.name
+    return operator.operator_type.name
+
+
+def details(plan_node: PlanNode) -> dict:
+    """The attributes of the operator, without its id"""
+    return {attr: val for attr, val in plan_node.operator.__dict__.items() if attr not in EXCLUDE_ATTRS}
+
+
+def describe(plan_node: PlanNode) -> str:
+    attrs = ", ".join(f"{attr}={val}" for attr, val in details(plan_node).items() if val is not None and attr != "name")
+    return f"{label(plan_node)}({attrs})" if attrs else label(plan_node)
+
+
+def join_order(plan_node: PlanNode) -> Optional[str]:
+    """The join tree over the scanned tables, e.g. ((lineitem ⋈ orders) ⋈ customer), operators in between are skipped"""
+    operator = plan_node.operator
+    inputs = [order for order in (join_order(child) for child in children(plan_node)) if order is not None]
+
+    if operator.operator_type in [OperatorType.Join, OperatorType.GroupJoin] and len(inputs) == 2:
+        return f"({inputs[0]} ⋈ {inputs[1]})"
+    if operator.operator_type == OperatorType.TableScan:
+        return getattr(operator, "table_name", None) or "?"
+    if len(inputs) == 1:
+        return inputs[0]
+    if len(inputs) > 1:
+        return "[" + ", ".join(inputs) + "]"
+    return None
+
+
+@dataclass
+class AlignedOperator:
+    before: PlanNode
+    after: PlanNode
+    depth: int
+    # (name, before, after) of the reported attributes that differ
+    changes: List[Tuple[str, any, any]] = field(default_factory=list)
+
+    @staticmethod
+    def ratio(before: Optional[float], after: Optional[float]) -> Optional[float]:
+        if before is None or after is None or before == 0:
+            return None
+        return after / before
+
+    @property
+    def exact_ratio(self) -> Optional[float]:
+        return self.ratio(self.before.exact_cardinality, self.after.exact_cardinality)
+
+    @property
+    def estimated_ratio(self) -> Optional[float]:
+        return self.ratio(self.before.estimated_cardinality, self.after.estimated_cardinality)
+
+
+@dataclass
+class PlanDiff:
+    """
+    The difference between two plans of the same query: the tree edit distance, the alignment of their operators,
+    the operators only in one of the plans, and the changed join orders and operator attributes.
+    """
+
+    distance: float
+    # operators of the new plan in pre-order, either aligned with an operator of the old plan or inserted (None)
+    operators: List[Tuple[int, PlanNode, Optional[AlignedOperator]]]
+    deleted: List[PlanNode]
+    join_order_before: Optional[str]
+    join_order_after: Optional[str]
+
+    @property
+    def aligned(self) -> List[AlignedOperator]:
+        return [aligned for _, _, aligned in self.operators if aligned is not None]
+
+    @property
+    def inserted(self) -> List[PlanNode]:
+        return [plan_node for _, plan_node, aligned in self.operators if aligned is None]
+
+    @property
+    def changes(self) -> List[str]:
+        changes = []
+        if self.join_order_before != self.join_order_after:
+            changes.append(f"join order: {self.join_order_before} -> {self.join_order_after}")
+        for aligned in self.aligned:
+            for name, before, after in aligned.changes:
+                changes.append(f"{name} of {label(aligned.after)}: {before} -> {after}")
+            if label(aligned.before) != label(aligned.after):
+                changes.append(f"operator: {describe(aligned.before)} -> {describe(aligned.after)}")
+        changes.extend(f"inserted: {describe(plan_node)}" for plan_node in self.inserted)
+        changes.extend(f"deleted: {describe(plan_node)}" for plan_node in self.deleted)
+        return changes
+
+    @property
+    def identical(self) -> bool:
+        return self.distance == 0
+
+    def _rows(self) -> List[Tuple[str, str, str, str]]:
+        """(marker, operator, exact cardinality, estimated cardinality) per operator of the new plan, then the deleted operators"""
+
+        def value(cardinality) -> str:
+            # a cardinality of 0 is shown, only missing cardinalities are blank
+            return "" if cardinality is None else str(cardinality)
+
+        def cardinality(before, after, ratio) -> str:
+            if before == after:
+                return value(after)
+            # the ratio is None unless both cardinalities are known
+            changed = f"{value(before)} -> {value(after)}"
+            return changed if ratio is None else f"{changed} (x{ratio:.2f})"
+
+        rows = []
+        for depth, plan_node, aligned in self.operators:
+            indent = "  " * depth
+            if aligned is None:
+                rows.append(("+", indent + describe(plan_node), value(plan_node.exact_cardinality), value(plan_node.estimated_cardinality)))
+                continue
+            marker = "~" if aligned.changes or label(aligned.before) != label(aligned.after) else " "
+            rows.append((
+                marker, indent + describe(plan_node),
+                cardinality(aligned.before.exact_cardinality, aligned.after.exact_cardinality, aligned.exact_ratio),
+                cardinality(aligned.before.estimated_cardinality, aligned.after.estimated_cardinality, aligned.estimated_ratio),
+            ))
+        for plan_node in self.deleted:
+            rows.append(("-", describe(plan_node), value(plan_node.exact_cardinality), value(plan_node.estimated_cardinality)))
+        return rows
+
+    def render_text(self) -> str:
+        lines = [f"edit distance {self.distance:g}: {len(self.aligned)} aligned, {len(self.inserted)} inserted, {len(self.deleted)} deleted operators"]
+        lines.extend(self.changes)
+
+        rows = [("", "operator", "exact", "estimated")] + self._rows()
+        widths = [max(len(row[i]) for row in rows) for i in range(1, 4)]
+        for marker, operator, exact, estimated in rows:
+            lines.append(f"{marker:1} {operator:<{widths[0]}}  {exact:>{widths[1]}}  {estimated:>{widths[2]}}".rstrip())
+        return "\n".join(lines)
+
+    def render_html(self) -> str:
+        classes = {"+": "inserted", "-": "deleted", "~": "changed", " ": "aligned"}
+        lines = [
+            "<div class=\"plandiff\">",
+            f"<p>edit distance {self.distance:g}: {len(self.aligned)} aligned, {len(self.inserted)} inserted, {len(self.deleted)} deleted operators</p>",
+            "<ul>",
+        ]
+        lines.extend(f"<li>{html.escape(change)}</li>" for change in self.changes)
+        lines.append("</ul>")
+        lines.append("<table><tr><th></th><th>operator</th><th>exact</th><th>estimated</th></tr>")
+        for marker, operator, exact, estimated in self._rows():
+            indent = len(operator) - len(operator.lstrip(" "))
+            lines.append(
+                f"<tr class=\"{classes[marker]}\"><td>{html.escape(marker)}</td>"
+                f"<td style=\"padding-left: {indent // 2}em\">{html.escape(operator.strip())}</td>"
+                f"<td>{html.escape(exact)}</td><td>{html.escape(estimated)}</td></tr>"
+            )
+        lines.append("</table>")
+        lines.append("</div>")
+        return "\n".join(lines)
+
+
+class _Tree:
+    """The nodes of a plan in post-order with the leftmost leaf of every node and the keyroots, as used by Zhang-Shasha"""
+
+    def __init__(self, root: PlanNode):
+        self.nodes = []
+        self.leftmost = []
+        self.depths = []
+        self.children = []
+        self._visit(root, 0)
+
+        leftmost_seen = {}
+        for i, leftmost in enumerate(self.leftmost):
+            leftmost_seen[leftmost] = i
+        self.keyroots = sorted(leftmost_seen.values())
+
+    def _visit(self, plan_node: PlanNode, depth: int) -> int:
+        leftmost = None
+        indices = []
+        for child in children(plan_node):
+            indices.append(self._visit(child, depth + 1))
+            if leftmost is None:
+                leftmost = self.leftmost[indices[-1]]
+
+        self.nodes.append(plan_node)
+        self.children.append(indices)
+        self.leftmost.append(len(self.nodes) - 1 if leftmost is None else leftmost)
+        self.depths.append(depth)
+        return len(self.nodes) - 1
+
+
+def _relabel_cost(before: PlanNode, after: PlanNode) -> float:
+    if label(before) != label(after):
+        return RELABEL_COST
+    if details(before) != details(after):
+        return CHANGE_COST
+    return 0.0
+
+
+def _tree_distances(before: _Tree, after: _Tree) -> List[List[float]]:
+    tree_distance = [[0.0] * len(after.nodes) for _ in before.nodes]
+    for i in before.keyroots:
+        for j in after.keyroots:
+            _forest_distance(before, after, i, j, tree_distance)
+    return tree_distance
+
+
+def _forest_distance(before: _Tree, after: _Tree, i: int, j: int, tree_distance: List[List[float]]) -> List[List[float]]:
+    """The forest distances between the subtrees of i and j, which also fills in the tree distances of their subtrees"""
+    li, lj = before.leftmost[i], after.leftmost[j]
+    rows, cols = i - li + 2, j - lj + 2
+    forest = [[0.0] * cols for _ in range(rows)]
+    for x in range(1, rows):
+        forest[x][0] = forest[x - 1][0] + DELETE_COST
+    for y in range(1, cols):
+        forest[0][y] = forest[0][y - 1] + INSERT_COST
+
+    for x in range(1, rows):
+        a = li + x - 1
+        for y in range(1, cols):
+            b = lj + y - 1
+            if before.leftmost[a] == li and after.leftmost[b] == lj:
+                forest[x][y] = min(
+                    forest[x - 1][y] + DELETE_COST,
+                    forest[x][y - 1] + INSERT_COST,
+                    forest[x - 1][y - 1] + _relabel_cost(before.nodes[a], after.nodes[b]),
+                )
+                tree_distance[a][b] = forest[x][y]
+            else:
+                forest[x][y] = min(
+                    forest[x - 1][y] + DELETE_COST,
+                    forest[x][y - 1] + INSERT_COST,
+                    forest[before.leftmost[a] - li][after.leftmost[b] - lj] + tree_distance[a][b],
+                )
+    return forest
+
+
+def _align(before: _Tree, after: _Tree, tree_distance: List[List[float]]) -> List[Tuple[int, int]]:
+    """Backtrack the edit script of the tree distance to the aligned (before, after) node pairs"""
+    pairs = []
+    stack = [(len(before.nodes) - 1, len(after.nodes) - 1)]
+    while stack:
+        i, j = stack.pop()
+        li, lj = before.leftmost[i], after.leftmost[j]
+        forest = _forest_distance(before, after, i, j, tree_distance)
+        x, y = i - li + 1, j - lj + 1
+        while x > 0 or y > 0:
+            a, b = li + x - 1, lj + y - 1
+            if x > 0 and y > 0 and before.leftmost[a] == li and after.leftmost[b] == lj:
+                if forest[x][y] == forest[x - 1][y - 1] + _relabel_cost(before.nodes[a], after.nodes[b]):
+                    pairs.append((a, b))
+                    x, y = x - 1, y - 1
+                    continue
+            elif x > 0 and y > 0:
+                fx, fy = before.leftmost[a] - li, after.leftmost[b] - lj
+                if forest[x][y] == forest[fx][fy] + tree_distance[a][b]:
+                    stack.append((a, b))
+                    x, y = fx, fy
+                    continue
+            if x > 0 and forest[x][y] == forest[x - 1][y] + DELETE_COST:
+                x -= 1
+            else:
+                y -= 1
+    return pairs
+
+
+def diff_plans(before: PlanNode | QueryPlan | str, after: PlanNode | QueryPlan | str,
+               before_dbms: Optional[str] = None, after_dbms: Optional[str] = None, raw: bool = False) -> PlanDiff:
+    """
+    Align the operators of two plans by their tree edit distance (Zhang-Shasha) and report the differences.
+    The plans can be given as plan nodes, query plans, or json encoded query plans as stored in the result files.
+    Unless `raw`, both plans are normalized first (see `normalize`), with the cleaners of their systems if given.
+    """
+
+    def root(plan, dbms: Optional[str]) -> PlanNode:
+        if isinstance(plan, str):
+            plan = decode_query_plan(plan)
+        plan = plan.plan if isinstance(plan, QueryPlan) else plan
+        return plan if raw else normalize(plan, dbms)
+
+    before_tree, after_tree = _Tree(root(before, before_dbms)), _Tree(root(after, after_dbms))
+    tree_distance = _tree_distances(before_tree, after_tree)
+    pairs = {b: a for a, b in _align(before_tree, after_tree, tree_distance)}
+
+    aligned = {}
+    for b, a in pairs.items():
+        old, new = before_tree.nodes[a], after_tree.nodes[b]
+        changes = []
+        if old.operator.operator_type == new.operator.operator_type:
+            for attr, name in REPORTED_ATTRS.get(new.operator.operator_type, {}).items():
+                if getattr(old.operator, attr, None) != getattr(new.operator, attr, None):
+                    changes.append((name, getattr(old.operator, attr, None), getattr(new.operator, attr, None)))
+        aligned[b] = AlignedOperator(old, new, after_tree.depths[b], changes)
+
+    # pre-order of the new plan, i.e., parents before their children
+    operators = []
+    stack = [len(after_tree.nodes) - 1]
+    while stack:
+        index = stack.pop()
+        operators.append((after_tree.depths[index], after_tree.nodes[index], aligned.get(index)))
+        stack.extend(reversed(after_tree.children[index]))
+
+    matched = set(pairs.values())
+    deleted = [plan_node for index, plan_node in enumerate(before_tree.nodes) if index not in matched]
+
+    return PlanDiff(
+        distance=tree_distance[-1][-1],
+        operators=operators,
+        deleted=deleted,
+        join_order_before=join_order(before_tree.nodes[-1]),
+        join_order_after=join_order(after_tree.nodes[-1]),
+    )
@@ -83,8 +83,9 @@ class TableScan(QueryOperator):
                 case _:
                     log_warn(f"Unknown table scan type: {plan['Node Type']}")
         elif dbms_type == DBMSType.DuckDB:
-            table_name = plan["extra_info"]["Text"] if "Text" in plan["extra_info"] else None
-            self.table_name = table_name
+            # newer versions of duckdb name the table in "Table"
+            extra_info = plan["extra_info"]
+            self.table_name = extra_info.get("Table", extra_info.get("Text")) if isinstance(extra_info, dict) else None
 
 
 class InlineTable(QueryOperator):
@@ -204,8 +205,10 @@ class Join(QueryOperator):
                     self.type = "right" + type
                 case _:
                     raise Exception("Unknown join type for DuckDB: " + type)
-            name = plan["operator_type"].replace("_JOIN", "").lower
-            if name == "piecewise_merge":
+            name = plan["operator_type"].replace("_JOIN", "").lower()
+            if name == "hash":
+                self.method = "hash"
+            elif name == "piecewise_merge":
                 self.method = "merge"
             elif name == "nested_loop":
                 self.method = "nl"
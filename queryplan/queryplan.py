@@ -2,6 +2,7 @@ import decimal
 import json
 from dataclasses import dataclass
 
+from queryplan.encoder.jsondecoder import QueryPlanJsonDecoder
 from queryplan.encoder.jsonencoder import QueryPlanJsonEncoder
 from queryplan.encoder.serdeskeys import *
 from queryplan.encoder.xmlencoder import QueryPlanXmlEncoder
@@ -39,6 +40,12 @@ def encode_query_plan(query_plan: QueryPlan, format: str = "json") -> str:
     return json.dumps(json_dict, cls=DecimalEncoder)
 
 
+def decode_query_plan(encoded_plan: str) -> QueryPlan:
+    """Decode a query plan stored with the json encoding, e.g., the plan column of a result file"""
+    json_dict = json.loads(encoded_plan)
+    return QueryPlan(text=json_dict[QUERY_TEXT_KEY], plan=QueryPlanJsonDecoder().decode_plan_node(json_dict[QUERY_PLAN_KEY]))
+
+
 class DecimalEncoder(json.JSONEncoder):
     def default(self, o):
         if isinstance(o, decimal.Decimal) or isinstance(o, datetime.date) or math.isnan(o):
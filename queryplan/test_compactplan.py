@@ -0,0 +1,85 @@
+import json
+
+from queryplan.compactplan import AttributeTable, CompactPlan
+from queryplan.encoder.jsonencoder import QueryPlanJsonEncoder
+from queryplan.plannode import InnerNode, LeafNode
+from queryplan.queryoperator import CustomOperator, Join, OperatorType, Result, Select, TableScan
+
+
+def scan(operator_id: int, table: str, cardinality: int) -> LeafNode:
+    operator = TableScan(operator_id)
+    operator.table_name = table
+    return LeafNode(operator, cardinality, cardinality, None)
+
+
+def plan() -> InnerNode:
+    join = Join(3)
+    join.type = "inner"
+    join.method = "hash"
+    projection = InnerNode(CustomOperator("PROJECTION", None), None, 5, [scan(5, "lineitem", 6000)], None)
+    return InnerNode(Result(1), 10, 10, [InnerNode(join, 100.5, 0, [scan(4, "orders", 1000), projection], None)], None)
+
+
+def encoded() -> dict:
+    return json.loads(json.dumps(QueryPlanJsonEncoder().encode_plan_node(plan())))
+
+
+def test_from_plan_node():
+    compact = CompactPlan.from_plan_node(plan())
+    assert [compact.label(index) for index in compact] == ["Result", "Join", "TableScan", "PROJECTION", "TableScan"]
+    assert list(compact.parents) == [-1, 0, 1, 1, 3]
+    assert compact.operator_type(3) == OperatorType.CustomOperator
+    assert [compact.operator_id(index) for index in compact] == [1, 3, 4, None, 5]
+    assert compact.attributes(1) == {"type": "inner", "method": "hash"}
+
+
+def test_from_json():
+    # building from the json encoding gives the same plan as building from the plan nodes
+    assert CompactPlan.from_json(encoded()).to_json() == CompactPlan.from_plan_node(plan()).to_json()
+
+
+def test_to_json():
+    assert CompactPlan.from_json(encoded(), system_representation=True).to_json() == encoded()
+
+
+def test_to_plan_node():
+    root = CompactPlan.from_json(encoded(), system_representation=True).to_plan_node()
+    assert QueryPlanJsonEncoder().encode_plan_node(root) == encoded()
+
+
+def test_cardinalities():
+    compact = CompactPlan.from_plan_node(plan())
+    # integral cardinalities are restored as ints, missing ones are kept missing
+    root = compact.to_plan_node()
+    join = root.children[0]
+    assert join.estimated_cardinality == 100.5 and join.exact_cardinality == 0 and isinstance(join.exact_cardinality, int)
+    assert join.children[1].estimated_cardinality is None
+
+
+def test_traversals():
+    compact = CompactPlan.from_plan_node(plan())
+    assert list(compact.depths()) == [0, 1, 2, 2, 3]
+    assert list(compact.subtree_counts({OperatorType.TableScan})) == [2, 2, 1, 1, 1]
+    assert compact.children() == [[1], [2, 3], [], [4], []]
+
+
+def test_shared_attribute_table():
+    table = AttributeTable()
+    first, second = CompactPlan.from_plan_node(plan(), table), CompactPlan.from_json(encoded(), table)
+    assert list(first.attrs) == list(second.attrs)
+    # (), the join's attributes, the two table names and the custom operator name
+    assert len(table) == 5
+
+
+def test_deep_plan():
+    # plans deeper than the recursion limit are supported
+    root = scan(5000, "t", 1)
+    for operator_id in range(1, 5000):
+        root = InnerNode(Select(operator_id), 1, 1, [root], None)
+
+    compact = CompactPlan.from_plan_node(root)
+    assert len(compact) == 5000
+    assert compact.depths()[-1] == 4999
+    # the encoded plan is too deep to compare as a whole
+    for copy in [CompactPlan.from_json(compact.to_json()), CompactPlan.from_plan_node(compact.to_plan_node())]:
+        assert (copy.types, copy.ids, copy.parents, copy.exact) == (compact.types, compact.ids, compact.parents, compact.exact)
@@ -0,0 +1,42 @@
+from queryplan.plandiff import diff_plans
+from queryplan.plannode import InnerNode, LeafNode
+from queryplan.queryoperator import Result, TableScan
+
+
+def plan(table: str, exact, estimated) -> InnerNode:
+    scan = TableScan(2)
+    scan.table_name = table
+    return InnerNode(Result(1), estimated, exact, [LeafNode(scan, estimated, exact, None)], None)
+
+
+def cardinalities(diff) -> list:
+    return [(marker, exact, estimated) for marker, _, exact, estimated in diff._rows()]
+
+
+def test_identical():
+    diff = diff_plans(plan("lineitem", 10, 8), plan("lineitem", 10, 8), raw=True)
+    assert diff.identical
+    assert cardinalities(diff) == [(" ", "10", "8"), (" ", "10", "8")]
+
+
+def test_missing_cardinality():
+    diff = diff_plans(plan("lineitem", None, 8), plan("lineitem", 5, 16), raw=True)
+    # a missing cardinality is blank and has no ratio
+    assert cardinalities(diff) == [(" ", " -> 5", "8 -> 16 (x2.00)"), (" ", " -> 5", "8 -> 16 (x2.00)")]
+
+
+def test_zero_cardinality():
+    diff = diff_plans(plan("lineitem", 0, 0), plan("lineitem", 4, 0), raw=True)
+    assert cardinalities(diff) == [(" ", "0 -> 4", "0"), (" ", "0 -> 4", "0")]
+
+
+def test_inserted_and_deleted_operators():
+    before = plan("lineitem", 3, 1)
+    after = plan("lineitem", 3, 1)
+    orders = TableScan(3)
+    orders.table_name = "orders"
+    after.children.append(LeafNode(orders, 0, 0, None))
+
+    # the cardinalities of 0 of an operator only in one of the plans are shown
+    assert cardinalities(diff_plans(before, after, raw=True))[-1] == ("+", "0", "0")
+    assert cardinalities(diff_plans(after, before, raw=True))[-1] == ("-", "0", "0")
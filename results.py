@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import os
+import re
+
+import duckdb
+from natsort import natsorted
+
+from benchmarks.tpch.utils import TPC_ID_TYPES
+from util import logger, resultstore
+
+METRICS = ["client_total", "total", "execution", "compilation"]
+
+# <benchmark>IdType_<id type><query dir>, e.g. tpchSf1IdType_uuid_v4
+_id_type_pattern = re.compile(r"IdType_(" + "|".join(sorted(TPC_ID_TYPES, key=len, reverse=True)) + ")")
+
+SCHEMA = [
+    "create table if not exists files (path varchar primary key, run varchar, benchmark varchar, id_type varchar, mtime double, hash varchar)",
+    f"""create table if not exists results (
+        path varchar, run varchar, benchmark varchar, id_type varchar,
+        title varchar, dbms varchar, version varchar, query varchar, state varchar,
+        client_total double[], {", ".join(f"{metric}_median double" for metric in METRICS)},
+        rows bigint, message varchar, extra json, repetitions json
+    )""",
+    "create table if not exists versions (dbms varchar, version varchar, rank integer)",
+]
+
+VIEWS = {
+    # the results of the most recently modified file for every system and query
+    "latest_results": """
+        select r.* from results r join files f using (path)
+        qualify row_number() over (partition by r.benchmark, r.id_type, r.title, r.query order by f.mtime desc) = 1
+    """,
+    "geomean": """
+        select benchmark, id_type, title, dbms, version,
+            count(*) filter (state = 'success') as queries,
+            exp(avg(ln(case when state = 'success' and client_total_median > 0 then client_total_median end))) as geomean,
+            sum(client_total_median) filter (state = 'success') as sum
+        from latest_results
+        group by all
+        order by benchmark, id_type, geomean
+    """,
+    "success_rates": """
+        select benchmark, id_type, title,
+            count(*) as queries,
+            count(*) filter (state = 'success') as success,
+            count(*) filter (state = 'error') as error,
+            count(*) filter (state = 'timeout') as timeout,
+            count(*) filter (state = 'global_timeout') as global_timeout,
+            count(*) filter (state = 'oom') as oom,
+            count(*) filter (state = 'fatal') as fatal,
+            count(*) filter (state = 'success') / count(*) as success_rate
+        from latest_results
+        group by all
+        order by benchmark, id_type, success_rate desc
+    """,
+    # speedup of the contender over the baseline on the queries both systems ran successfully (> 1: contender is faster)
+    "speedup": """
+        select a.benchmark, a.id_type, a.title as baseline, b.title as contender,
+            count(*) as queries,
+            exp(avg(ln(a.client_total_median / b.client_total_median))) as speedup
+        from latest_results a join latest_results b
+            on a.benchmark = b.benchmark and a.id_type is not distinct from b.id_type and a.query = b.query and a.title <> b.title
+        where a.state = 'success' and b.state = 'success' and a.client_total_median > 0 and b.client_total_median > 0
+        group by all
+        order by a.benchmark, a.id_type, baseline, contender
+    """,
+    # geomean per version of a system, and its change relative to the previous version
+    "version_trends": """
+        select g.dbms, g.benchmark, g.id_type, g.version, g.queries, g.geomean,
+            g.geomean / lag(g.geomean) over (partition by g.dbms, g.benchmark, g.id_type order by v.rank) as change
+        from (
+            select dbms, benchmark, id_type, version,
+                count(*) as queries,
+                exp(avg(ln(client_total_median))) as geomean
+            from latest_results
+            where state = 'success' and client_total_median > 0
+            group by all
+        ) g join versions v using (dbms, version)
+        order by g.dbms, g.benchmark, g.id_type, v.rank
+    """,
+    # slowdown of every id type relative to int64_sorted on the same system and queries (> 1: slower)
+    "id_type_comparison": """
+        select c.benchmark, c.title, c.id_type,
+            count(*) as queries,
+            exp(avg(ln(c.client_total_median / b.client_total_median))) as slowdown
+        from latest_results b join latest_results c
+            on b.benchmark = c.benchmark and b.title = c.title and b.query = c.query
+        where b.id_type = 'int64_sorted' and c.id_type <> 'int64_sorted'
+            and b.state = 'success' and c.state = 'success' and b.client_total_median > 0 and c.client_total_median > 0
+        group by all
+        order by c.benchmark, c.title, c.id_type
+    """,
+}
+
+
+def split_result_name(path: str) -> (str, str):
+    """Split the result name of a result file into the benchmark and the id type, if any"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    match = _id_type_pattern.search(name)
+    if match is None:
+        return name, None
+    return name[:match.start()] + name[match.end():], match.group(1)
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_result_file(path: str) -> bool:
+    """Whether the file is a result csv or result store written by the benchmark driver"""
+    if path.endswith(".csv"):
+        with open(path, "r") as file:
+            return file.readline().startswith("title,dbms,version,query,state,")
+    if path.endswith(".duckdb"):
+        try:
+            with duckdb.connect(path, read_only=True) as connection:
+                return connection.execute("select count(*) from information_schema.tables where table_name = 'results'").fetchone()[0] > 0
+        except duckdb.Error:
+            return False
+    return False
+
+
+def load(connection: duckdb.DuckDBPyConnection, root: str):
+    """Load all result files under `root`, skipping files that did not change since they were loaded"""
+    warehouse = os.path.realpath(connection.execute("select path from duckdb_databases() where database_name = current_database()").fetchone()[0] or "")
+    loaded = {path: (mtime, digest) for path, mtime, digest in connection.execute("select path, mtime, hash from files").fetchall()}
+
+    paths = []
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.realpath(os.path.join(directory, filename))
+            if path != warehouse and is_result_file(path):
+                paths.append(path)
+
+    skipped = 0
+    for path in natsorted(paths):
+        mtime = os.path.getmtime(path)
+        if path in loaded and loaded[path][0] == mtime:
+            skipped += 1
+            continue
+
+        digest = file_hash(path)
+        if path in loaded and loaded[path][1] == digest:
+            connection.execute("update files set mtime = ? where path = ?", [mtime, path])
+            skipped += 1
+            continue
+
+        run = os.path.relpath(os.path.dirname(path), root)
+        benchmark, id_type = split_result_name(path)
+        logger.log_driver(f"Loading {path}")
+
+        connection.begin()
+        connection.execute("delete from results where path = ?", [path])
+        connection.execute("delete from files where path = ?", [path])
+        connection.execute("insert into files values (?, ?, ?, ?, ?, ?)", [path, run, benchmark, id_type, mtime, digest])
+
+        # the plans and result sets are not loaded
+        with resultstore.connect(path) as source:
+            # results written by older versions have no repetitions
+            columns = [column[0] for column in source.execute("describe results_csv").fetchall()]
+            repetitions = "repetitions" if "repetitions" in columns else "null"
+            relation = source.execute(f"""
+                select title, dbms, version, query, state,
+                    try_cast(client_total as double[]), {", ".join(f"try_cast({metric}_median as double)" for metric in METRICS)},
+                    try_cast(rows as bigint), message, extra, {repetitions}
+                from results_csv
+            """)
+            placeholders = ", ".join("?" * (4 + len(relation.description)))
+            rows = relation.fetchall()
+        connection.executemany(f"insert into results values ({placeholders})", [[path, run, benchmark, id_type] + list(row) for row in rows])
+        connection.commit()
+
+    logger.log_driver(f"Loaded {len(paths) - skipped} result files ({skipped} unchanged)")
+
+    # versions are ordered naturally, e.g. 1.10 after 1.9
+    connection.execute("delete from versions")
+    for dbms, versions in connection.execute("select dbms, list(distinct version) from results group by dbms").fetchall():
+        connection.executemany("insert into versions values (?, ?, ?)", [[dbms, version, rank] for rank, version in enumerate(natsorted(versions))])
+
+
+def literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def create_views(connection: duckdb.DuckDBPyConnection):
+    for name, query in VIEWS.items():
+        connection.execute(f"create or replace view {name} as {query}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load benchmark results into a DuckDB warehouse and analyze them")
+    parser.add_argument("--db", dest="db", type=str, default="results.duckdb", help="path of the warehouse (default: ./results.duckdb)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load_parser = commands.add_parser("load", help="load the result files under the given directories, only changed files are reloaded")
+    load_parser.add_argument("roots", nargs="+", help="output directories of the benchmarks")
+
+    show_parser = commands.add_parser("show", help="show a view")
+    show_parser.add_argument("view", choices=list(VIEWS.keys()))
+    show_parser.add_argument("--where", dest="where", type=str, default=None, help="filter, e.g. \"benchmark = 'tpchSf1'\"")
+
+    matrix_parser = commands.add_parser("matrix", help="show the pairwise speedups of a benchmark as a matrix (rows: baseline, columns: contender)")
+    matrix_parser.add_argument("benchmark")
+    matrix_parser.add_argument("--id-type", dest="id_type", type=str, default=None)
+
+    sql_parser = commands.add_parser("sql", help="run a query against the warehouse")
+    sql_parser.add_argument("query")
+
+    args = parser.parse_args()
+
+    with duckdb.connect(args.db) as connection:
+        for statement in SCHEMA:
+            connection.execute(statement)
+        create_views(connection)
+
+        match args.command:
+            case "load":
+                for root in args.roots:
+                    load(connection, root)
+            case "show":
+                where = "" if args.where is None else f"where {args.where}"
+                connection.sql(f"select * from {args.view} {where}").show(max_rows=1000, max_width=1000)
+            case "matrix":
+                id_type = "is null" if args.id_type is None else f"= {literal(args.id_type)}"
+                connection.sql(f"""
+                    pivot (select baseline, contender, round(speedup, 2) as speedup from speedup where benchmark = {literal(args.benchmark)} and id_type {id_type})
+                    on contender using first(speedup) group by baseline order by baseline
+                """).show(max_rows=1000, max_width=1000)
+            case "sql":
+                # statements without a result, e.g. create or update, return None
+                relation = connection.sql(args.query)
+                if relation is not None:
+                    relation.show(max_rows=1000, max_width=1000)
+
+
+if __name__ == "__main__":
+    main()
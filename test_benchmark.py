@@ -0,0 +1,52 @@
+import csv
+from types import SimpleNamespace
+
+from benchmark import search_memory
+from dbms.dbms import Result
+
+
+class MemoryDBMS:
+    """A system that is killed by queries with less than `needed` bytes of memory"""
+
+    def __init__(self, needed: int):
+        self.needed = needed
+        self.limit = None
+        self.dead = False
+        self.recoveries = 0
+        self.version = "1.0"
+        self._buffer_size = 2 ** 30
+
+    def _set_memory_limit(self, limit):
+        self.limit = limit
+        return True
+
+    def _execute_repetitions(self, query, fetch_result, warmup, repetitions, timeout=0, fetch_result_limit=0):
+        assert not self.dead, "probe on a dead system"
+        if self.limit is not None and self.limit < self.needed:
+            self.dead = True
+            raise ConnectionError("server closed the connection unexpectedly")
+        result = Result()
+        result.client_total = [1.0]
+        return [result] * repetitions
+
+    def crashed(self):
+        return self.dead
+
+    def recover(self):
+        self.dead = False
+        self.recoveries += 1
+
+
+def test_search_memory_survives_crashes(tmp_path):
+    dbms = MemoryDBMS(needed=2 ** 26)
+    system = SimpleNamespace(title="system", dbms="dbms")
+    search_memory(dbms, system, {"1.sql": "select 1"}, {"1.sql": 1.0}, {"min": "1M", "steps": 12}, str(tmp_path / "results"), False, 0, 1, 0)
+
+    with open(tmp_path / "results_memory.csv", newline="") as file:
+        probes = list(csv.DictReader(file))
+    assert len(probes) == 12
+    # the failed probes count as insufficient memory, the bisection converges on the needed memory
+    assert all((int(probe["memory"]) >= dbms.needed) == (probe["state"] == Result.SUCCESS) for probe in probes)
+    assert dbms.recoveries == sum(probe["state"] == Result.FATAL for probe in probes) > 0
+    smallest = min(int(probe["memory"]) for probe in probes if probe["state"] == Result.SUCCESS)
+    assert dbms.needed <= smallest < dbms.needed * 1.1
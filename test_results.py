@@ -0,0 +1,114 @@
+import os
+
+import duckdb
+import pytest
+
+import results
+from dbms.dbms import Result
+from util.resultcsv import ResultCSV
+from util.resultstore import ResultStore
+
+
+def result(client_total: float, state: str = Result.SUCCESS) -> Result:
+    result = Result()
+    result.state = state
+    result.client_total = [client_total]
+    return result
+
+
+def write(result_class, filename: str, title: str, version: str, timings: dict):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with result_class(filename) as writer:
+        for query, client_total in timings.items():
+            writer.start_olap(title, query)
+            writer.olap(title, title, version, query, result(client_total) if client_total is not None else result(0.0, Result.ERROR))
+
+
+@pytest.fixture
+def warehouse(tmp_path):
+    connection = duckdb.connect(str(tmp_path / "results.duckdb"))
+    for statement in results.SCHEMA:
+        connection.execute(statement)
+    results.create_views(connection)
+    yield connection
+    connection.close()
+
+
+def test_split_result_name():
+    assert results.split_result_name(os.path.join("output", "tpchSf1.csv")) == ("tpchSf1", None)
+    assert results.split_result_name("tpchSf1IdType_uuid_v4.duckdb") == ("tpchSf1", "uuid_v4")
+    assert results.split_result_name("tpchSf1IdType_int64_sortedQueries.csv") == ("tpchSf1Queries", "int64_sorted")
+
+
+def test_is_result_file(tmp_path):
+    write(ResultCSV, str(tmp_path / "results.csv"), "a", "1.0", {"1.sql": 1.0})
+    write(ResultStore, str(tmp_path / "results.duckdb"), "a", "1.0", {"1.sql": 1.0})
+    with open(tmp_path / "other.csv", "w") as file:
+        file.write("a,b\n1,2\n")
+    duckdb.connect(str(tmp_path / "other.duckdb")).close()
+
+    assert results.is_result_file(str(tmp_path / "results.csv"))
+    assert results.is_result_file(str(tmp_path / "results.duckdb"))
+    assert not results.is_result_file(str(tmp_path / "other.csv"))
+    assert not results.is_result_file(str(tmp_path / "other.duckdb"))
+    assert not results.is_result_file(str(tmp_path / "results.csv.index"))
+
+
+def test_load(tmp_path, warehouse):
+    root = tmp_path / "output"
+    write(ResultCSV, str(root / "run1" / "tpchSf1.csv"), "a", "1.9", {"1.sql": 1.0, "2.sql": 4.0, "3.sql": None})
+    write(ResultStore, str(root / "run2" / "tpchSf1.duckdb"), "b", "1.10", {"1.sql": 2.0, "2.sql": 8.0, "3.sql": 1.0})
+    results.load(warehouse, str(root))
+
+    assert warehouse.execute("select run, benchmark, id_type from files order by run").fetchall() == [("run1", "tpchSf1", None), ("run2", "tpchSf1", None)]
+    assert warehouse.execute("select title, query, state, client_total, client_total_median from results order by title, query").fetchall() == [
+        ("a", "1.sql", Result.SUCCESS, [1.0], 1.0),
+        ("a", "2.sql", Result.SUCCESS, [4.0], 4.0),
+        ("a", "3.sql", Result.ERROR, [0.0], 0.0),
+        ("b", "1.sql", Result.SUCCESS, [2.0], 2.0),
+        ("b", "2.sql", Result.SUCCESS, [8.0], 8.0),
+        ("b", "3.sql", Result.SUCCESS, [1.0], 1.0),
+    ]
+
+    # the geomean covers only successful queries, the speedup only the queries both systems ran successfully
+    assert warehouse.execute("select title, queries, geomean from geomean order by title").fetchall() == [("a", 2, pytest.approx(2.0)), ("b", 3, pytest.approx(16.0 ** (1 / 3)))]
+    assert warehouse.execute("select queries, speedup from speedup where baseline = 'a'").fetchall() == [(2, pytest.approx(0.5))]
+    assert warehouse.execute("select success_rate from success_rates order by title").fetchall() == [(pytest.approx(2 / 3),), (1.0,)]
+
+
+def test_versions(tmp_path, warehouse):
+    root = tmp_path / "output"
+    for version in ["1.9", "1.10", "1.2"]:
+        write(ResultCSV, str(root / version / "tpchSf1.csv"), "a", version, {"1.sql": 1.0})
+    results.load(warehouse, str(root))
+
+    # versions are ordered naturally
+    assert warehouse.execute("select version from versions order by rank").fetchall() == [("1.2",), ("1.9",), ("1.10",)]
+
+
+def test_reload(tmp_path, warehouse):
+    root = tmp_path / "output"
+    filename = str(root / "run1" / "tpchSf1IdType_uuid_v4.csv")
+    write(ResultCSV, filename, "a", "1.0", {"1.sql": 1.0})
+    results.load(warehouse, str(root))
+    assert warehouse.execute("select id_type, client_total_median from results").fetchall() == [("uuid_v4", 1.0)]
+
+    # a touched but unchanged file is not reloaded, only its modification time is updated
+    os.utime(filename, (0, 1000))
+    warehouse.execute("delete from results")
+    results.load(warehouse, str(root))
+    assert warehouse.execute("select count(*) from results").fetchone() == (0,)
+    assert warehouse.execute("select mtime from files").fetchone() == (1000,)
+
+    # a changed file replaces its previous results
+    write(ResultCSV, filename, "a", "1.0", {"1.sql": 3.0, "2.sql": 5.0})
+    results.load(warehouse, str(root))
+    assert warehouse.execute("select query, client_total_median from results order by query").fetchall() == [("1.sql", 3.0), ("2.sql", 5.0)]
+    assert warehouse.execute("select count(*) from files").fetchone() == (1,)
+
+
+def test_skip_warehouse(tmp_path, warehouse):
+    # the warehouse itself contains a results table, but is not loaded into itself
+    write(ResultCSV, str(tmp_path / "run1" / "tpchSf1.csv"), "a", "1.0", {"1.sql": 1.0})
+    results.load(warehouse, str(tmp_path))
+    assert warehouse.execute("select path from files").fetchall() == [(os.path.realpath(tmp_path / "run1" / "tpchSf1.csv"),)]
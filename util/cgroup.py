@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from typing import Optional
+
+from util import logger
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+
+def find_container_cgroup(container) -> Optional[str]:
+    """Find the cgroup (v2) directory of a docker container, returns None if it cannot be found"""
+    container.reload()
+    candidates = []
+
+    # The cgroup of the container's init process is the most reliable source
+    pid = container.attrs.get("State", {}).get("Pid", 0)
+    if pid:
+        try:
+            with open(f"/proc/{pid}/cgroup", "r") as file:
+                for line in file:
+                    if line.startswith("0::"):
+                        candidates.append(os.path.join(CGROUP_ROOT, line[3:].strip().lstrip("/")))
+        except OSError:
+            pass
+
+    # systemd and cgroupfs cgroup drivers
+    candidates.append(os.path.join(CGROUP_ROOT, "system.slice", f"docker-{container.id}.scope"))
+    candidates.append(os.path.join(CGROUP_ROOT, "docker", container.id))
+
+    for candidate in candidates:
+        if os.path.isfile(os.path.join(candidate, "cpu.stat")):
+            return candidate
+
+    logger.log_warn_verbose(f"Unable to find the cgroup of container {container.id}")
+    return None
+
+
+def read_cpu_usage(path: str) -> float:
+    """The CPU time consumed by the cgroup in seconds"""
+    with open(os.path.join(path, "cpu.stat"), "r") as file:
+        for line in file:
+            key, value = line.split()
+            if key == "usage_usec":
+                return int(value) / 1000000
+    return 0.0
+
+
+def read_io_bytes(path: str) -> (int, int):
+    """The bytes read and written by the cgroup, summed over all devices"""
+    read_bytes = 0
+    write_bytes = 0
+    try:
+        with open(os.path.join(path, "io.stat"), "r") as file:
+            for line in file:
+                for entry in line.split()[1:]:
+                    key, value = entry.split("=")
+                    if key == "rbytes":
+                        read_bytes += int(value)
+                    elif key == "wbytes":
+                        write_bytes += int(value)
+    except OSError:
+        # the io controller is not enabled for this cgroup
+        pass
+    return read_bytes, write_bytes
+
+
+def read_memory(path: str) -> int:
+    """The current memory usage of the cgroup in bytes"""
+    with open(os.path.join(path, "memory.current"), "r") as file:
+        return int(file.read().strip())
+
+
+class CgroupSampler:
+    """
+    Measures the resource usage of a cgroup between `start` and `stop`.
+    CPU time and I/O are taken as deltas of the cumulative counters,
+    the peak memory is sampled in a background thread, since `memory.peak` cannot be reset on most kernels.
+    """
+
+    def __init__(self, path: str, interval: float = 0.01):
+        self._path = path
+        self._interval = interval
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        self._peak_memory = read_memory(self._path)
+        self._cpu = read_cpu_usage(self._path)
+        self._io = read_io_bytes(self._path)
+        self._begin = time.time()
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def _sample(self):
+        while not self._stopped.wait(self._interval):
+            try:
+                self._peak_memory = max(self._peak_memory, read_memory(self._path))
+            except OSError:
+                # the container is gone
+                return
+
+    def stop(self) -> dict:
+        """Stop sampling and return the resource usage since `start`"""
+        elapsed = time.time() - self._begin
+        self._stopped.set()
+        self._thread.join()
+
+        try:
+            self._peak_memory = max(self._peak_memory, read_memory(self._path))
+            cpu_seconds = read_cpu_usage(self._path) - self._cpu
+            read_bytes, write_bytes = read_io_bytes(self._path)
+        except OSError:
+            return {}
+
+        return {
+            "cpu_seconds": cpu_seconds,
+            "avg_parallelism": cpu_seconds / elapsed if elapsed > 0 else 0.0,
+            "peak_memory": self._peak_memory,
+            "read_bytes": read_bytes - self._io[0],
+            "write_bytes": write_bytes - self._io[1],
+        }
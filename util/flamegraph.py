@@ -0,0 +1,94 @@
+import csv
+import os
+import re
+import shutil
+import time
+from typing import Dict
+
+from util import logger
+
+INDEX_FIELDS = ["title", "dbms", "version", "query", "median", "flamegraph"]
+
+# header line of a sample in `perf script`, e.g. "DuckDB worker 1234/1240 [003] 12.345678: 1001001 cpu-clock:"
+_sample_header = re.compile(r"^(\S.*?)\s+\d+(/\d+)?\s+(\[\d+\]\s+)?[\d.]+:")
+
+
+def fold_perf_script(script: str) -> Dict[str, int]:
+    """Fold the call stacks of `perf script` into `comm;root;...;leaf -> samples`"""
+    stacks = {}
+    comm = None
+    frames = []
+
+    for line in script.splitlines() + [""]:
+        if not line.strip():
+            # a blank line ends a sample
+            if comm is not None:
+                stack = ";".join([comm] + list(reversed(frames)))
+                stacks[stack] = stacks.get(stack, 0) + 1
+            comm = None
+            frames = []
+        elif comm is None:
+            match = _sample_header.match(line)
+            comm = (match.group(1) if match else line.split()[0]).replace(" ", "_")
+        else:
+            # "  7f1b2c3d4e5f symbol+0x1f (/usr/lib/libc.so.6)"
+            frame = line.strip().split(" ", 1)[-1]
+            frame = frame.rsplit(" (", 1)[0]
+            frames.append(re.sub(r"\+0x[0-9a-f]+$", "", frame).replace(";", ":"))
+
+    return stacks
+
+
+def write_folded(stacks: Dict[str, int], path: str):
+    """Write folded stacks, one `stack count` line each, as read by flamegraph.pl, inferno or speedscope"""
+    with open(path, "w") as file:
+        for stack, count in sorted(stacks.items()):
+            file.write(f"{stack} {count}\n")
+
+
+def append_index(path: str, row: dict):
+    """Append a recorded flame graph to the index csv, which links the flame graphs to the result rows"""
+    exists = os.path.exists(path)
+    with open(path, "a", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=INDEX_FIELDS)
+        if not exists:
+            writer.writeheader()
+        writer.writerow(row)
+
+
+class PySpyRecord:
+    """
+    Samples the (native) call stacks of the Python server running as pid 1 inside a container with py-spy.
+    The folded stacks are written into a directory mounted into the container and moved to `output` afterward.
+    """
+
+    def __init__(self, container, host_dir: str, container_dir: str, output: str, rate: int = 999):
+        self._container = container
+        self._host_path = os.path.join(host_dir, "flamegraph.folded")
+        self._container_path = os.path.join(container_dir, "flamegraph.folded")
+        self._output = output
+        self._rate = rate
+
+    def start(self):
+        if os.path.exists(self._host_path):
+            os.remove(self._host_path)
+
+        self._container.exec_run(f"py-spy record --pid 1 --native --nonblocking --rate {self._rate} --format raw -o {self._container_path}", detach=True)
+        # py-spy does not report when it is attached
+        time.sleep(1)
+
+    def stop(self) -> bool:
+        """Stop sampling and move the folded stacks to the output, returns whether the flame graph was written"""
+        self._container.exec_run('sh -c "kill -INT $(pidof py-spy)"')
+
+        # py-spy writes the output on exit
+        start_time = time.time()
+        while time.time() - start_time < 30 and self._container.exec_run("pidof py-spy").exit_code == 0:
+            time.sleep(0.1)
+
+        if not os.path.exists(self._host_path):
+            logger.log_warn_verbose("Unable to record a flame graph: py-spy did not write any samples")
+            return False
+
+        shutil.move(self._host_path, self._output)
+        return True
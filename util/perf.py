@@ -0,0 +1,188 @@
+import os
+import select
+import signal
+import subprocess
+import tempfile
+import time
+from typing import Optional
+
+from util import logger, flamegraph
+
+# perf event name -> key in the result's extra, following the names of Umbra's perf counters
+HARDWARE_EVENTS = {
+    "cycles": "cycles",
+    "instructions": "instructions",
+    "cache-misses": "LLC-misses",
+    "branch-misses": "branch-misses",
+}
+SOFTWARE_EVENTS = {
+    "task-clock": "task-clock",
+    "context-switches": "context-switches",
+    "cpu-migrations": "cpu-migrations",
+    "page-faults": "page-faults",
+}
+
+ACK_TIMEOUT = 10  # seconds
+
+
+class _ControlledPerf:
+    """
+    Runs perf system-wide, restricted to a cgroup, and started disabled.
+    Counting is enabled and disabled through perf's control fifo, so that the startup of perf is not measured.
+    """
+
+    def __init__(self, cgroup: str):
+        self._cgroup = cgroup
+        self._process: Optional[subprocess.Popen] = None
+
+    def _arguments(self) -> list[str]:
+        """The perf command and its options, the output is written to `self._output`"""
+        raise NotImplementedError()
+
+    def _spawn(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._output = os.path.join(self._dir.name, "perf.out")
+        ctl_path = os.path.join(self._dir.name, "ctl")
+        ack_path = os.path.join(self._dir.name, "ack")
+        os.mkfifo(ctl_path)
+        os.mkfifo(ack_path)
+
+        # Open the fifos read-write, so that opening does not block if perf fails to start
+        self._ctl = os.open(ctl_path, os.O_RDWR)
+        self._ack = os.open(ack_path, os.O_RDWR)
+
+        command = ["perf"] + self._arguments() + ["-a", "-D", "-1", "--control", f"fifo:{ctl_path},{ack_path}", "-G", self._cgroup]
+        self._process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    def _control(self, command: str):
+        os.write(self._ctl, f"{command}\n".encode())
+        ready, _, _ = select.select([self._ack], [], [], ACK_TIMEOUT)
+        if not ready or self._process.poll() is not None:
+            raise ChildProcessError(f"perf did not acknowledge `{command}`: {self._stderr()}")
+        os.read(self._ack, 64)
+
+    def _finish(self):
+        """Disable perf and let it write its output"""
+        self._control("disable")
+        self._process.send_signal(signal.SIGINT)
+        self._process.wait(timeout=ACK_TIMEOUT)
+
+    def _stderr(self) -> str:
+        if self._process.poll() is None:
+            return ""
+        return self._process.stderr.read().decode().strip()
+
+    def _cleanup(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        os.close(self._ctl)
+        os.close(self._ack)
+        self._process.stderr.close()
+        self._dir.cleanup()
+
+
+class PerfStat(_ControlledPerf):
+    """
+    Counts hardware and software events of a cgroup with `perf stat` between `start` and `stop`.
+    Falls back to software events, if hardware counters are not available (e.g. in virtual machines).
+    """
+
+    hardware = True  # cleared once hardware counters turned out to be unavailable
+
+    def _arguments(self) -> list[str]:
+        return ["stat", "-x,", "-o", self._output, "-e", ",".join(self._events)]
+
+    def start(self):
+        self._events = list(SOFTWARE_EVENTS)
+        if PerfStat.hardware:
+            self._events = list(HARDWARE_EVENTS) + self._events
+
+        self._spawn()
+        try:
+            self._control("enable")
+        except ChildProcessError as e:
+            self._cleanup()
+            if not PerfStat.hardware:
+                raise e
+
+            logger.log_warn_verbose(f"Hardware performance counters are not available, using software events: {e}")
+            PerfStat.hardware = False
+            self._events = list(SOFTWARE_EVENTS)
+            self._spawn()
+            self._control("enable")
+
+        self._begin = time.time()
+
+    def stop(self) -> dict:
+        """Stop counting and return the counters since `start`"""
+        try:
+            elapsed = time.time() - self._begin
+            self._finish()
+
+            with open(self._output, "r") as file:
+                counters = parse_perf_csv(file.read(), elapsed)
+        except Exception as e:
+            logger.log_warn_verbose(f"Unable to read perf counters: {e}")
+            counters = {}
+        finally:
+            self._cleanup()
+
+        return counters
+
+
+class PerfRecord(_ControlledPerf):
+    """Samples the call stacks of a cgroup with `perf record` between `start` and `stop` and writes them as folded stacks"""
+
+    def __init__(self, cgroup: str, output: str, frequency: int = 999):
+        super().__init__(cgroup)
+        self._output_path = output
+        self._frequency = frequency
+
+    def _arguments(self) -> list[str]:
+        # cpu-clock is a software event, so that sampling also works without hardware counters
+        return ["record", "-g", "-F", str(self._frequency), "-o", self._output, "-e", "cpu-clock"]
+
+    def start(self):
+        self._spawn()
+        try:
+            self._control("enable")
+        except ChildProcessError as e:
+            self._cleanup()
+            raise e
+
+    def stop(self) -> bool:
+        """Stop sampling and write the folded stacks, returns whether the flame graph was written"""
+        try:
+            self._finish()
+            script = subprocess.run(["perf", "script", "-i", self._output], capture_output=True, text=True, check=True).stdout
+            flamegraph.write_folded(flamegraph.fold_perf_script(script), self._output_path)
+            return True
+        except Exception as e:
+            logger.log_warn_verbose(f"Unable to record a flame graph: {e}")
+            return False
+        finally:
+            self._cleanup()
+
+
+def parse_perf_csv(output: str, elapsed: float) -> dict:
+    """Parse the csv output (-x,) of `perf stat` over `elapsed` seconds into the extra keys, skipping unsupported events"""
+    names = HARDWARE_EVENTS | SOFTWARE_EVENTS
+    counters = {}
+    for line in output.splitlines():
+        fields = line.split(",")
+        if line.startswith("#") or len(fields) < 3:
+            continue
+
+        value, event = fields[0], fields[2]
+        if event not in names or value.startswith("<"):
+            # <not supported> or <not counted>
+            continue
+        counters[names[event]] = float(value)
+
+    if counters.get("cycles") and "instructions" in counters:
+        counters["ipc"] = counters["instructions"] / counters["cycles"]
+    if "task-clock" in counters and elapsed > 0:
+        # task-clock is reported in msec
+        counters["cpus"] = counters["task-clock"] / (elapsed * 1000)
+    return counters
@@ -0,0 +1,45 @@
+import time
+from contextlib import contextmanager
+
+from util import logger, formatter
+
+
+class PhaseTimer:
+    """Accumulates the wall time the driver spends in each of its phases"""
+
+    def __init__(self):
+        self._phases = {}  # name -> [seconds, count]
+
+    def add(self, name: str, seconds: float):
+        entry = self._phases.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+    @contextmanager
+    def phase(self, name: str):
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - begin)
+
+    def total(self, name: str) -> float:
+        """The total time spent in the phase in seconds"""
+        return self._phases.get(name, [0.0, 0])[0]
+
+    def count(self, name: str) -> int:
+        """The number of times the phase was entered"""
+        return self._phases.get(name, [0.0, 0])[1]
+
+    def overhead(self) -> float:
+        """The average time per query in seconds that the driver spends outside the system (executing and planning)"""
+        queries = self.count("query")
+        if queries == 0:
+            return 0.0
+        return (self.total("query") - self.total("execute") - self.total("plan")) / queries
+
+    def log(self):
+        for name, (seconds, count) in self._phases.items():
+            logger.log_driver(f"{name.ljust(12)} {formatter.format_time(seconds * 1000)} in {count} calls ({seconds * 1000000 / count:.1f} µs per call)")
+        if self.count("query") > 0:
+            logger.log_driver(f"driver overhead {self.overhead() * 1000000:.1f} µs per query")
@@ -0,0 +1,149 @@
+import gzip
+import hashlib
+import os
+from typing import Optional, Tuple
+
+import simplejson as json
+from queryplan.encoder.serdeskeys import JX_LABEL_KEY, JX_ATTRS_KEY, JX_CHILDREN_KEY, OPERATOR_ID_KEY, EXACT_CARDINALITY_KEY, ESTIMATED_CARDINALITY_KEY, QUERY_PLAN_KEY, QUERY_TEXT_KEY
+from queryplan.queryplan import QueryPlan, encode_query_plan
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# attributes that change between executions of the same plan, ignored by the plan shape
+RUNTIME_ATTRS = {"system_representation", OPERATOR_ID_KEY, EXACT_CARDINALITY_KEY, ESTIMATED_CARDINALITY_KEY}
+
+# key of the runtime attributes of the operators in the runtime part of a plan
+OPERATORS_KEY = "operators"
+
+
+def plan_hash(document: str) -> str:
+    """The content address of a json document"""
+    return hashlib.sha256(document.encode()).hexdigest()
+
+
+def _canonical(document: dict) -> str:
+    return json.dumps(document, sort_keys=True, default=str)
+
+
+def split_plan(encoded_plan: str) -> Tuple[str, str]:
+    """
+    Split an encoded query plan into its shape and its runtime part, both as canonical json, so that equal parts have equal hashes.
+    The shape is the operator tree without the runtime attributes, i.e., without timings and cardinalities.
+    The runtime part holds the query text and the runtime attributes of every operator in pre-order.
+    """
+    encoded_plan = json.loads(encoded_plan)
+    operators = []
+
+    def strip(node: dict) -> dict:
+        attrs = node[JX_ATTRS_KEY]
+        operators.append({key: value for key, value in attrs.items() if key in RUNTIME_ATTRS})
+        return {
+            JX_LABEL_KEY: node[JX_LABEL_KEY],
+            JX_ATTRS_KEY: {key: value for key, value in attrs.items() if key not in RUNTIME_ATTRS},
+            JX_CHILDREN_KEY: [strip(child) for child in node[JX_CHILDREN_KEY]],
+        }
+
+    shape = strip(encoded_plan[QUERY_PLAN_KEY])
+    return _canonical(shape), _canonical({QUERY_TEXT_KEY: encoded_plan[QUERY_TEXT_KEY], OPERATORS_KEY: operators})
+
+
+def merge_plan(shape: str, runtime: str) -> str:
+    """The encoded query plan of a shape and a runtime part, the inverse of `split_plan`"""
+    runtime = json.loads(runtime)
+    operators = iter(runtime[OPERATORS_KEY])
+
+    def merge(node: dict) -> dict:
+        node[JX_ATTRS_KEY].update(next(operators))
+        for child in node[JX_CHILDREN_KEY]:
+            merge(child)
+        return node
+
+    return json.dumps({QUERY_TEXT_KEY: runtime[QUERY_TEXT_KEY], QUERY_PLAN_KEY: merge(json.loads(shape))})
+
+
+def plan_shape(query_plan: QueryPlan) -> str:
+    """
+    A hash of the operator tree, i.e., the operators, their attributes and their children, without timings and cardinalities.
+    Two executions have the same shape if the system chose the same plan, which makes it an indicator for plan changes.
+    It is the prefix of the hash the plan stores keep the shape under.
+    """
+    return plan_hash(split_plan(encode_query_plan(query_plan))[0])[:16]
+
+
+class PlanStore:
+    """
+    Content-addressed store of query plans in `<result>_plans/`.
+    A plan is split into its shape, stored under the hash of the timing-free operator tree, and its runtime part, stored under its own hash,
+    so that executions of the same plan share the shape. Each part is compressed and stored once.
+    Uses zstd if the zstandard module is available, gzip otherwise, both are read regardless.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, digest: str, extension: str) -> str:
+        return os.path.join(self.directory, digest + extension)
+
+    def _put(self, document: str) -> str:
+        """Store the document, unless it is already stored, and return its hash"""
+        digest = plan_hash(document)
+        if os.path.exists(self._path(digest, ".json.zst")) or os.path.exists(self._path(digest, ".json.gz")):
+            return digest
+
+        if zstandard is not None:
+            data = zstandard.ZstdCompressor().compress(document.encode())
+            path = self._path(digest, ".json.zst")
+        else:
+            data = gzip.compress(document.encode())
+            path = self._path(digest, ".json.gz")
+
+        # write to a temporary file first, so that a crash does not leave a truncated document under the hash
+        with open(path + ".tmp", "wb") as file:
+            file.write(data)
+        os.replace(path + ".tmp", path)
+        return digest
+
+    def put(self, encoded_plan: str) -> str:
+        """Store the shape and the runtime part of the plan and return the plan cell `<shape hash>:<runtime hash>`"""
+        shape, runtime = split_plan(encoded_plan)
+        return f"{self._put(shape)}:{self._put(runtime)}"
+
+    def get(self, digest: str) -> Optional[str]:
+        """The document stored under the hash, or None if it is not in the store"""
+        path = self._path(digest, ".json.zst")
+        if os.path.exists(path):
+            if zstandard is None:
+                raise ImportError(f"zstandard is required to read {path}")
+            with open(path, "rb") as file:
+                return zstandard.ZstdDecompressor().decompressobj().decompress(file.read()).decode()
+
+        path = self._path(digest, ".json.gz")
+        if os.path.exists(path):
+            with open(path, "rb") as file:
+                return gzip.decompress(file.read()).decode()
+
+        return None
+
+    def resolve(self, cell: Optional[str]) -> Optional[str]:
+        """Resolve the plan cell of a result row, which is either a plan cell of the store or an inline plan"""
+        if not cell or cell.startswith("{"):
+            return cell
+
+        shape, _, runtime = cell.partition(":")
+        if not runtime:
+            # stores of older runs keep the whole plan under its hash
+            return self.get(shape)
+
+        shape, runtime = self.get(shape), self.get(runtime)
+        if shape is None or runtime is None:
+            return None
+        return merge_plan(shape, runtime)
+
+
+def plan_directory(result_file: str) -> str:
+    """The plan store of a result file, i.e., `<result>_plans`"""
+    return os.path.splitext(result_file)[0] + "_plans"
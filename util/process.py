@@ -1,5 +1,6 @@
-import selectors
+import queue
 import subprocess
+import threading
 import time
 
 from util import logger
@@ -22,13 +23,46 @@ class Process:
         logger.log_verbose_process(f'Starting command `{self._command}`')
         self.process = subprocess.Popen(self._command.split(" "), env=self._env, cwd=self._cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
-        self.selector = selectors.DefaultSelector()
-        self.selector.register(self.process.stdout, selectors.EVENT_READ)
-        self.selector.register(self.process.stderr, selectors.EVENT_READ)
+        # Background threads read both pipes, so neither pipe can fill up while the other one is awaited
+        self._lines = queue.Queue()
+        self._open_streams = 2
+        self._readers = [
+            threading.Thread(target=self._read_stream, args=(self.process.stdout, "stdout"), daemon=True),
+            threading.Thread(target=self._read_stream, args=(self.process.stderr, "stderr"), daemon=True),
+        ]
+        for reader in self._readers:
+            reader.start()
+
+    def _read_stream(self, stream, source: str):
+        """Push every line of the stream together with its arrival time, followed by an end marker"""
+        for line in iter(stream.readline, b""):
+            self._lines.put((source, time.time(), line.decode().strip()))
+        self._lines.put((source, time.time(), None))
+
+    def _next_line(self, block: bool = True) -> tuple[str, float, str] | None:
+        """Return the next non-empty line as (source, timestamp, line), or None if no line is available"""
+        while self._open_streams > 0:
+            try:
+                source, timestamp, data = self._lines.get(block=block)
+            except queue.Empty:
+                return None
+
+            if data is None:
+                self._open_streams -= 1
+            elif data:
+                if source == "stdout":
+                    logger.log_verbose_process(f'stdout: {data}')
+                else:
+                    logger.log_verbose_process_stderr(f'stderr: {data}')
+                return source, timestamp, data
+
+        return None
 
     def stop(self):
         self.process.stdin.close()
         return_code = self.process.wait()
+        for reader in self._readers:
+            reader.join()
         if return_code:
             raise subprocess.CalledProcessError(return_code, self._command)
         logger.log_verbose_process(f'Stopped command `{self._command}`')
@@ -48,51 +82,33 @@ class Process:
         logger.log_verbose_process(f'stdin:  {text}')
 
     def wait(self):
+        # Consume the output until both pipes are closed
+        while self._next_line() is not None:
+            pass
+        self.process.wait()
+
+    def readline_stderr_timestamped(self) -> tuple[float, str]:
+        """Return the next line written to stderr together with the time it was read"""
         while True:
-            for key, _ in self.selector.select():
-                data = key.fileobj.readline().decode().strip()
-
-                if data is None:
-                    return
-                elif data:
-                    if key.fileobj is self.process.stdout:
-                        logger.log_verbose_process(f'stdout: {data}')
-                    else:
-                        logger.log_verbose_process_stderr(f'stderr: {data}')
-
-                # Check if the process has terminated
-                if self.process.poll() is not None:
-                    return
-
-    def readline_stderr(self):
-        while True:
-            for key, _ in self.selector.select():
-                data = key.fileobj.readline().decode().strip()
-
-                if data is None:
-                    raise ChildProcessError("process closed")
-                elif data:
-                    if key.fileobj is self.process.stdout:
-                        logger.log_verbose_process(f'stdout: {data}')
-                    else:
-                        logger.log_verbose_process_stderr(f'stderr: {data}')
-                        return data
-
-                # Check if the process has terminated
-                if self.process.poll() is not None:
-                    raise ChildProcessError("process closed")
+            line = self._next_line()
+            if line is None:
+                raise ChildProcessError("process closed")
+
+            source, timestamp, data = line
+            if source == "stderr":
+                return timestamp, data
+
+    def readline_stderr(self) -> str:
+        return self.readline_stderr_timestamped()[1]
 
     def read_and_discard(self):
-        for key, _ in self.selector.select(timeout=0):
-            # Check if the process has terminated
-            if self.process.poll() is not None:
-                raise ChildProcessError("process closed")
+        discarded = False
+        while self._next_line(block=False) is not None:
+            discarded = True
 
-            data = key.fileobj.readline().decode().strip()
-            if key.fileobj is self.process.stdout:
-                logger.log_verbose_process(f'stdout: {data}')
-            else:
-                logger.log_verbose_process_stderr(f'stderr: {data}')
+        # Check if the process has terminated, a process that closed both pipes may not have exited yet
+        if self._open_streams == 0 or (discarded and self.process.poll() is not None):
+            raise ChildProcessError("process closed")
 
     def run(self) -> str:
         logger.log_verbose_process(f'Running command `{self._command}`')
@@ -1,13 +1,19 @@
 import csv
 import datetime
 import decimal
+import io
+import json
 import math
 import os
-from statistics import mean, median
+import time
+from statistics import fmean, median
+from typing import List, Optional, Tuple
 
-import simplejson as json
+import simplejson
 from dbms.dbms import Result
 from queryplan.queryplan import encode_query_plan
+from util.planstore import PlanStore
+from util.resultindex import ResultIndex
 
 
 def sql_encoder(obj):
@@ -19,10 +25,22 @@ def sql_encoder(obj):
 
 
 class ResultCSV:
-    def __init__(self, filename: str, append: bool = False):
+    """
+    Writes the results to a csv, with a record log (see `ResultIndex`) for resuming and crash detection.
+    The durability level controls when rows are written out: after every query, in batches of `rows` rows or `seconds`,
+    or at the end. Rows are buffered in memory in between, so that a crash never leaves a partial row behind.
+    The in-flight marker is written out before every query regardless of the level, so that a crash during a query is always detected.
+    """
+
+    def __init__(self, filename: str, append: bool = False, plan_store: Optional[PlanStore] = None, durability: Optional[dict] = None):
         self.filename = filename
-        self.filename_current = filename + "_current"
         self.append = append
+        self.plan_store = plan_store
+
+        durability = durability or {}
+        self.durability = durability.get("level", "query")
+        self.batch_rows = durability.get("rows", 100)
+        self.batch_seconds = durability.get("seconds", 10)
 
         self.fieldnames = ["title", "dbms", "version", "query", "state"]
         self.metrics = ["client_total", "total", "execution", "compilation"]
@@ -31,30 +49,91 @@ class ResultCSV:
             self.fieldnames.append(metric + "_mean")
             self.fieldnames.append(metric + "_median")
 
-        self.fieldnames.extend(["rows", "message", "extra", "result", "plan"])
+        self.fieldnames.extend(["rows", "message", "extra", "repetitions", "result", "plan"])
 
     def __enter__(self):
         if os.path.exists(self.filename) and self.append:
             self.append = True
         else:
             self.append = False
-        self.file = open(self.filename, "a" if self.append else "w")
-
-        self.writer = csv.DictWriter(self.file, fieldnames=self.fieldnames)
-        if not self.append:
-            self.writer.writeheader()
-            self.file.flush()
+        self._open()
 
+        self.pending = 0
+        self.committed = time.time()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        # The in-flight marker stays the last record, if the driver crashed during a query
+        self._commit()
+        self._close()
+
+    def _open(self):
+        self.index = ResultIndex(self.filename)
+        self.index.open(self.append)
+
+        fieldnames = self.fieldnames
+        if self.append:
+            # Keep the columns of results written by an older version
+            with open(self.filename, "r", newline="") as file:
+                fieldnames = next(csv.reader(file), self.fieldnames)
+
+        self.file = open(self.filename, "a" if self.append else "w", newline="")
+        self.rows = []
+        self.row_buffer = io.StringIO()
+        # rows are written as lists in the order of the columns, columns unknown to the writer stay empty
+        self.columns = fieldnames
+        self.writer = csv.writer(self.row_buffer)
+        if not self.append:
+            self.writer.writerow(fieldnames)
+            self.file.write(self._take_row())
+            self.file.flush()
+        self.size = os.path.getsize(self.filename)
+
+    def _close(self):
         self.file.close()
+        self.index.close()
+
+    def _commit(self):
+        """Write out the buffered rows, then their index records"""
+        if len(self.rows) > 0:
+            self.file.write("".join(self.rows))
+            self.file.flush()
+            self.rows = []
+        self.index.flush()
+
+        self.pending = 0
+        self.committed = time.time()
+
+    @staticmethod
+    def executed(filename: str) -> List[Tuple[str, str, str, float]]:
+        """The already executed queries of a result file as (title, query, state, median of client_total)"""
+        return ResultIndex(filename).executed()
+
+    @staticmethod
+    def in_flight(filename: str) -> Optional[Tuple[str, str]]:
+        """The (title, query) that was running when the driver crashed, if any"""
+        return ResultIndex(filename).in_flight()
 
     def start_olap(self, title: str, query: str):
-        with open(self.filename_current, "w") as file:
-            file.write(f"{title},{query}")
+        self._mark(title, query)
+
+    def _mark(self, title: str, query: str):
+        # Only the index is written out, the index is rebuilt from the csv on resume if buffered rows were lost
+        self.index.mark(title, query, self.size)
+        self.index.flush()
 
     def olap(self, title: str, dbms: str, version: str, query: str, result: Result):
+        self._write(title, dbms, version, query, result)
+        self.pending += 1
+
+        match self.durability:
+            case "query":
+                self._commit()
+            case "batch":
+                if self.pending >= self.batch_rows or time.time() - self.committed >= self.batch_seconds:
+                    self._commit()
+
+    def _write(self, title: str, dbms: str, version: str, query: str, result: Result):
         row = {
             "title": title,
             "dbms": dbms,
@@ -63,23 +142,35 @@ class ResultCSV:
             "state": result.state,
             "rows": result.rows,
             "message": result.message.replace("\n", " "),
-            "extra": json.dumps(result.extra, allow_nan=True),
-            "result": "" if result.result is None else json.dumps(result.result, use_decimal=True, default=sql_encoder, allow_nan=True),
-            "plan":  "" if result.plan is None else encode_query_plan(result.plan),
+            # the standard json module is considerably faster than simplejson, which is only needed for decimals in result sets
+            "extra": json.dumps(result.extra),
+            "repetitions": json.dumps(result.repetitions),
+            "result": "" if result.result is None else "[]" if len(result.result) == 0 else simplejson.dumps(result.result, use_decimal=True, default=sql_encoder, allow_nan=True),
+            "plan":  "" if result.plan is None else self._encode_plan(result),
         }
 
         for metric in self.metrics:
             values = getattr(result, metric)
-            row[metric] = json.dumps(values)
             if len(values) == 0:
-                values = [float('nan')]
-            row[metric + "_mean"] = mean(values)
+                # most systems report only some of the metrics
+                row[metric], row[metric + "_mean"], row[metric + "_median"] = "[]", math.nan, math.nan
+                continue
+            row[metric] = json.dumps(values)
+            row[metric + "_mean"] = fmean(values)
             row[metric + "_median"] = median(values)
 
-        self.writer.writerow(row)
-        self.file.flush()
-
-        try:
-            os.remove(self.filename_current)
-        except Exception:
-            pass
+        self.writer.writerow([row.get(column, "") for column in self.columns])
+        self.rows.append(self._take_row())
+        self.size += len(self.rows[-1].encode())
+        self.index.append(title, query, result.state, row["client_total_median"], self.size)
+
+    def _take_row(self) -> str:
+        row = self.row_buffer.getvalue()
+        self.row_buffer.seek(0)
+        self.row_buffer.truncate()
+        return row
+
+    def _encode_plan(self, result: Result) -> str:
+        """The plan cell, which is the plan's hash in the plan store or the inline plan"""
+        plan = encode_query_plan(result.plan)
+        return plan if self.plan_store is None else self.plan_store.put(plan)
@@ -0,0 +1,134 @@
+import csv
+import io
+import math
+import os
+from statistics import median
+from typing import List, Optional, Tuple
+
+import simplejson as json
+from util import logger
+
+INDEX_FIELDS = ["title", "query", "state", "median", "size"]
+
+# state of the marker record appended before a query is executed
+IN_FLIGHT = "in_flight"
+
+
+class ResultIndex:
+    """
+    Append-only record log `<result csv>.index` with one (title, query, state, median, size) record per result row,
+    so that resuming does not parse the plans and result sets of the result csv.
+    Before a query is executed, an in-flight marker record is appended, which is the last record if the driver crashed during the query.
+    `size` is the size of the result csv after the row was written, the index is up to date if the last size matches the csv.
+    Records are buffered until `flush`. The index may be ahead of the csv, if rows buffered by the result csv were lost in a crash.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.filename_index = filename + ".index"
+        # Marker file of older versions, which contains the query in flight as `title,query`
+        self.filename_legacy_marker = filename + "_current"
+
+    def open(self, append: bool):
+        if append and not self.up_to_date():
+            self.rebuild()
+
+        self.file = open(self.filename_index, "a" if append else "w", newline="")
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def append(self, title: str, query: str, state: str, med: float, size: int):
+        self.writer.writerow([title, query, state, med, size])
+
+    def mark(self, title: str, query: str, size: int):
+        self.writer.writerow([title, query, IN_FLIGHT, "", size])
+
+    def flush(self):
+        self.file.write(self.buffer.getvalue())
+        self.file.flush()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+
+    def _read(self) -> List[list]:
+        with open(self.filename_index, "r", newline="") as file:
+            # a record cut off by a crash is dropped
+            return [record for record in csv.reader(file) if len(record) == len(INDEX_FIELDS)]
+
+    def up_to_date(self) -> bool:
+        if not os.path.exists(self.filename_index) or os.path.exists(self.filename_legacy_marker):
+            return False
+
+        records = self._read()
+        return len(records) > 0 and int(records[-1][4]) == os.path.getsize(self.filename)
+
+    def rebuild(self):
+        """
+        Rebuild the index from the result csv, e.g., after the driver crashed between writing the row and its record.
+        A row cut off by a crash is truncated from the csv, the marker file of older versions is replaced by an in-flight record.
+        """
+        logger.log_driver(f"Rebuilding the index of {self.filename}")
+
+        # The marker of the query in flight during a crash is kept, the rows before it may have been lost
+        marker = None
+        if os.path.exists(self.filename_index):
+            records = self._read()
+            if len(records) > 0 and records[-1][2] == IN_FLIGHT:
+                marker = records[-1][:2]
+        if os.path.exists(self.filename_legacy_marker):
+            with open(self.filename_legacy_marker, "r") as file:
+                line = file.readline().strip()
+            if line:
+                marker = line.rsplit(",", 1)
+
+        size = 0
+        complete = True
+
+        def lines(file):
+            # track the csv size after every row, the csv reader consumes all lines of a (multi-line) row
+            nonlocal size, complete
+            for line in file:
+                size += len(line)
+                complete = line.endswith(b"\n")
+                yield line.decode()
+
+        with open(self.filename, "rb") as csv_file, open(self.filename_index, "w", newline="") as index_file:
+            writer = csv.writer(index_file)
+            reader = csv.DictReader(lines(csv_file))
+            fieldnames = reader.fieldnames
+            valid_size = size
+            try:
+                for row in reader:
+                    if not complete or row[fieldnames[-1]] is None:
+                        raise ValueError("incomplete row")
+                    times = [float(x) for x in json.loads(row["client_total"], allow_nan=True)]
+                    writer.writerow([row["title"], row["query"], row["state"], median(times) if len(times) > 0 else math.nan, size])
+                    valid_size = size
+            except (csv.Error, ValueError, TypeError) as e:
+                logger.log_warn(f"Truncating the incomplete last row of {self.filename}: {e}")
+                os.truncate(self.filename, valid_size)
+
+            if marker is not None:
+                writer.writerow(marker + [IN_FLIGHT, "", valid_size])
+
+        if os.path.exists(self.filename_legacy_marker):
+            os.remove(self.filename_legacy_marker)
+
+    def executed(self) -> List[Tuple[str, str, str, float]]:
+        """The already executed queries as (title, query, state, median of client_total)"""
+        if not self.up_to_date():
+            self.rebuild()
+        return [(title, query, state, float(med)) for title, query, state, med, _ in self._read() if state != IN_FLIGHT]
+
+    def in_flight(self) -> Optional[Tuple[str, str]]:
+        """The (title, query) in flight when the driver crashed, if any"""
+        if not self.up_to_date():
+            self.rebuild()
+
+        records = self._read()
+        if len(records) == 0 or records[-1][2] != IN_FLIGHT:
+            return None
+        return records[-1][0], records[-1][1]
@@ -0,0 +1,144 @@
+import os
+import time
+from statistics import fmean, median
+from typing import List, Optional, Tuple
+
+import duckdb
+import simplejson as json
+from dbms.dbms import Result
+from queryplan.queryplan import encode_query_plan
+from util.planstore import PlanStore, merge_plan, plan_directory, plan_hash, split_plan
+from util.resultcsv import ResultCSV, sql_encoder
+
+METRICS = ["client_total", "total", "execution", "compilation"]
+
+SCHEMA = [
+    f"""create table if not exists results (
+        title varchar, dbms varchar, version varchar, query varchar, state varchar,
+        {", ".join(f"{metric} double[], {metric}_mean double, {metric}_median double" for metric in METRICS)},
+        rows bigint, message varchar, extra json,
+        repetitions struct(index integer, warmup boolean, start double, client_total double, state varchar)[],
+        plan varchar
+    )""",
+    # the shapes and runtime parts of the plans, see `PlanStore`
+    "create table if not exists plans (hash varchar primary key, plan json)",
+    "create table if not exists result_sets (title varchar, query varchar, result json)",
+    "create table if not exists in_flight (title varchar, query varchar)",
+]
+
+# The columns of the result csv, with the plans and result sets joined from their side tables, requires the function `merge_plan`
+CSV_VIEW = f"""
+    select r.title, r.dbms, r.version, r.query, r.state,
+        {", ".join(f"to_json(r.{metric}) as {metric}, r.{metric}_mean, r.{metric}_median" for metric in METRICS)},
+        r.rows, r.message, r.extra, to_json(r.repetitions) as repetitions, coalesce(s.result, '[]'::json) as result,
+        coalesce(merge_plan(p.plan, pr.plan), p.plan) as plan
+    from results r
+    left join result_sets s on s.title = r.title and s.query = r.query
+    left join plans p on p.hash = split_part(r.plan, ':', 1)
+    left join plans pr on pr.hash = split_part(r.plan, ':', 2)
+"""
+
+
+class ResultStore(ResultCSV):
+    """
+    Stores the results in a DuckDB file instead of a csv.
+    The timings are typed list columns of the `results` table, the plans and result sets are kept in the side tables
+    `plans` and `result_sets`, so that scanning the timings does not read them.
+    Like in the plan store, the shape and the runtime part of each plan are stored once in `plans` under their hashes,
+    which the `plan` column of `results` references as `<shape hash>:<runtime hash>`.
+    """
+
+    def _open(self):
+        if not self.append and os.path.exists(self.filename):
+            os.remove(self.filename)
+
+        self.connection = duckdb.connect(self.filename)
+        for statement in SCHEMA:
+            self.connection.execute(statement)
+
+        # rows are inserted in an open transaction, which is committed according to the durability level
+        self.connection.begin()
+
+    def _close(self):
+        self.connection.close()
+
+    def _commit(self):
+        self.connection.commit()
+        self.connection.begin()
+
+        self.pending = 0
+        self.committed = time.time()
+
+    @staticmethod
+    def executed(filename: str) -> List[Tuple[str, str, str, float]]:
+        with duckdb.connect(filename, read_only=True) as connection:
+            return connection.execute("select title, query, state, client_total_median from results").fetchall()
+
+    @staticmethod
+    def in_flight(filename: str) -> Optional[Tuple[str, str]]:
+        with duckdb.connect(filename, read_only=True) as connection:
+            return connection.execute("select title, query from in_flight").fetchone()
+
+    def _mark(self, title: str, query: str):
+        # The marker is committed with the pending rows, it is only in the open transaction otherwise
+        self.connection.execute("delete from in_flight")
+        self.connection.execute("insert into in_flight values (?, ?)", [title, query])
+        self._commit()
+
+    def _write(self, title: str, dbms: str, version: str, query: str, result: Result):
+        row = [title, dbms, version, query, result.state]
+        for metric in METRICS:
+            values = getattr(result, metric)
+            row.append(values)
+            if len(values) == 0:
+                values = [float('nan')]
+            row.extend([fmean(values), median(values)])
+        row.extend([result.rows, result.message.replace("\n", " "), json.dumps(result.extra, allow_nan=True), result.repetitions])
+
+        parts = [] if result.plan is None else split_plan(encode_query_plan(result.plan))
+        hashes = [plan_hash(part) for part in parts]
+        row.append(":".join(hashes) if hashes else None)
+
+        # The result, its plan and the cleared marker are committed together
+        self.connection.execute(f"insert into results values ({', '.join('?' * len(row))})", row)
+        for digest, part in zip(hashes, parts):
+            self.connection.execute("insert into plans values (?, ?) on conflict do nothing", [digest, part])
+        # Result sets default to an empty list, only fetched rows are stored
+        if result.result:
+            self.connection.execute("insert into result_sets values (?, ?, ?)", [title, query, json.dumps(result.result, use_decimal=True, default=sql_encoder, allow_nan=True)])
+        self.connection.execute("delete from in_flight")
+
+
+def connect(filename: str) -> duckdb.DuckDBPyConnection:
+    """
+    Open a result file, either a result csv or a result store, for analysis.
+    The results are exposed as the view `results_csv` with the columns of the result csv.
+    """
+    if filename.endswith(".duckdb"):
+        connection = duckdb.connect(filename, read_only=True)
+        connection.create_function("merge_plan", merge_plan, ["VARCHAR", "VARCHAR"], "VARCHAR")
+        connection.execute(f"create temporary view results_csv as {CSV_VIEW}")
+        return connection
+
+    connection = duckdb.connect()
+    columns = "*"
+    if os.path.isdir(plan_directory(filename)):
+        # the plan cells are hashes into the plan store
+        connection.create_function("resolve_plan", PlanStore(plan_directory(filename)).resolve, ["VARCHAR"], "VARCHAR")
+        columns = "* replace (resolve_plan(plan) as plan)"
+    connection.execute(f"create view results_csv as select {columns} from read_csv('{filename}', header = true, all_varchar = true)")
+    return connection
+
+
+def export_csv(filename: str, path: str):
+    """Export a result store as a result csv"""
+    with connect(filename) as connection:
+        connection.execute(f"copy (select * from results_csv) to '{path}' (header, delimiter ',')")
+
+
+def export_parquet(filename: str, directory: str):
+    """Export the tables of a result store as parquet files, one per table"""
+    os.makedirs(directory, exist_ok=True)
+    with duckdb.connect(filename, read_only=True) as connection:
+        for table in ["results", "plans", "result_sets"]:
+            connection.execute(f"copy {table} to '{os.path.join(directory, table + '.parquet')}' (format parquet)")
@@ -1,4 +1,5 @@
 import os
+import re
 
 
 def transform_schema(schema: dict, escape: str, lowercase: bool) -> dict:
@@ -92,6 +93,11 @@ def create_table_statements_apollo(schema: dict) -> [str]:
 def escape(s: str):
     return f"E'{s}'" if "\\" in s else f"'{s}'"
 
+
+def is_query(query: str) -> bool:
+    """Check whether a statement is a read-only query (select, with, values or table), skipping leading comments"""
+    return re.match(r"(\s+|--[^\n]*(\n|$)|/\*.*?\*/)*(select|with|values|table)\b", query, flags=re.IGNORECASE | re.DOTALL) is not None
+
 MAX_ROWS_PER_COMMAND = 1000000
 
 def copy_statements_postgres(schema: dict, data_dir: str, supports_text: bool = True) -> [str]:
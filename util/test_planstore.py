@@ -0,0 +1,83 @@
+import os
+
+import pytest
+import simplejson as json
+
+from queryplan.plannode import InnerNode, LeafNode
+from queryplan.queryoperator import Join, Result, TableScan
+from queryplan.queryplan import QueryPlan, encode_query_plan
+from util import planstore
+from util.planstore import PlanStore, merge_plan, plan_directory, plan_hash, plan_shape, split_plan
+
+
+def query_plan(cardinality: int, method: str = "hash") -> QueryPlan:
+    join = Join(2)
+    join.type = "inner"
+    join.method = method
+    scans = []
+    for operator_id, table in [(3, "orders"), (4, "lineitem")]:
+        scan = TableScan(operator_id)
+        scan.table_name = table
+        scans.append(LeafNode(scan, cardinality, cardinality, None))
+    return QueryPlan(text="select *\n  from orders, lineitem", plan=InnerNode(Result(1), cardinality, cardinality, [InnerNode(join, cardinality, cardinality, scans, None)], None))
+
+
+def test_split_and_merge():
+    encoded = encode_query_plan(query_plan(10))
+    shape, runtime = split_plan(encoded)
+
+    # the shape holds no cardinalities, the runtime part holds the query text and an entry per operator
+    assert "10" not in shape
+    assert len(json.loads(runtime)[planstore.OPERATORS_KEY]) == 4
+    assert json.loads(merge_plan(shape, runtime)) == json.loads(encoded)
+
+
+def test_plan_shape():
+    # the cardinalities do not change the shape, the operators do
+    assert plan_shape(query_plan(10)) == plan_shape(query_plan(20))
+    assert plan_shape(query_plan(10)) != plan_shape(query_plan(10, "merge"))
+
+    # the shape is the prefix of the hash the store keeps the shape under
+    shape, _ = split_plan(encode_query_plan(query_plan(10)))
+    assert plan_hash(shape).startswith(plan_shape(query_plan(10)))
+
+
+@pytest.mark.parametrize("compression, extension", [("zstd", ".json.zst"), ("gzip", ".json.gz")])
+def test_put_and_resolve(tmp_path, monkeypatch, compression, extension):
+    if compression == "gzip":
+        monkeypatch.setattr(planstore, "zstandard", None)
+    store = PlanStore(str(tmp_path / "results_plans"))
+
+    first = encode_query_plan(query_plan(10))
+    second = encode_query_plan(query_plan(20))
+    cells = [store.put(first), store.put(second), store.put(first)]
+
+    # executions of the same plan share the shape, equal plans share both parts
+    assert cells[0].split(":")[0] == cells[1].split(":")[0]
+    assert cells[0] == cells[2]
+    assert sorted(os.listdir(store.directory)) == sorted({digest + extension for cell in cells for digest in cell.split(":")})
+
+    assert json.loads(store.resolve(cells[0])) == json.loads(first)
+    assert json.loads(store.resolve(cells[1])) == json.loads(second)
+
+
+def test_resolve_cells(tmp_path):
+    store = PlanStore(str(tmp_path / "results_plans"))
+    encoded = encode_query_plan(query_plan(10))
+
+    # result rows without a plan and rows with an inline plan are passed through
+    assert store.resolve(None) is None
+    assert store.resolve("") == ""
+    assert store.resolve(encoded) == encoded
+
+    # stores of older runs keep the whole plan under a single hash
+    digest = store._put(encoded)
+    assert store.resolve(digest) == encoded
+
+    # a plan that is not in the store cannot be resolved
+    assert store.resolve("0" * 64) is None
+    assert store.resolve(f"{digest}:{'0' * 64}") is None
+
+
+def test_plan_directory():
+    assert plan_directory(os.path.join("results", "tpch.csv")) == os.path.join("results", "tpch_plans")
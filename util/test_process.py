@@ -0,0 +1,44 @@
+import sys
+
+import pytest
+
+from util.process import Process
+
+
+def script(tmp_path, source: str) -> str:
+    path = tmp_path / "script.py"
+    path.write_text(source)
+    return f"{sys.executable} {path}"
+
+
+def test_readline_stderr(tmp_path):
+    # the output on stdout is larger than the pipe buffer, reading stderr must not block on it
+    command = script(tmp_path, "import sys\nsys.stdout.write('x' * (1 << 20) + '\\n')\nsys.stdout.flush()\nsys.stderr.write('done\\n')\n")
+    with Process(command) as process:
+        timestamp, line = process.readline_stderr_timestamped()
+        assert line == "done"
+        assert timestamp > 0
+
+
+def test_write(tmp_path):
+    command = script(tmp_path, "import sys\nfor line in sys.stdin:\n    sys.stderr.write(line.upper())\n    sys.stderr.flush()\n")
+    with Process(command) as process:
+        for text in ["select 1;", "select 2;"]:
+            process.write(text)
+            assert process.readline_stderr() == text.upper()
+
+
+def test_process_closed(tmp_path):
+    process = Process(script(tmp_path, "import sys\nsys.stderr.write('bye\\n')\n"))
+    process.start()
+    assert process.readline_stderr() == "bye"
+    with pytest.raises(ChildProcessError):
+        process.readline_stderr()
+    with pytest.raises(ChildProcessError):
+        process.write("select 1;")
+
+
+def test_run(tmp_path):
+    assert Process(script(tmp_path, "print('hello')\n")).run() == "hello\n"
+    with pytest.raises(ChildProcessError):
+        Process(script(tmp_path, "import sys\nsys.exit('failed')\n")).run()
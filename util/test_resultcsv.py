@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from dbms.dbms import Result
+from util.resultcsv import ResultCSV
+from util.resultindex import IN_FLIGHT
+from util.resultstore import ResultStore
+
+FORMATS = [(ResultCSV, ".csv"), (ResultStore, ".duckdb")]
+LEVELS = ["query", "batch", "end"]
+
+
+def result(client_total: float, state: str = Result.SUCCESS) -> Result:
+    result = Result()
+    result.state = state
+    result.client_total = [client_total]
+    return result
+
+
+def crash(results: ResultCSV):
+    """Drop the result file without writing out the buffered rows, as a crash of the driver would"""
+    if isinstance(results, ResultStore):
+        # closing the connection rolls back the open transaction
+        results.connection.close()
+    else:
+        results.file.close()
+        results.index.file.close()
+
+
+@pytest.mark.parametrize("result_class, extension", FORMATS)
+@pytest.mark.parametrize("level", LEVELS)
+def test_crash_during_query(tmp_path, result_class, extension, level):
+    filename = str(tmp_path / ("results" + extension))
+
+    results = result_class(filename, durability={"level": level})
+    results.__enter__()
+    for query in ["1.sql", "2.sql"]:
+        results.start_olap("system", query)
+        results.olap("system", "dbms", "1.0", query, result(1.0))
+    results.start_olap("system", "3.sql")
+    crash(results)
+
+    # the query in flight is detected at every level
+    assert result_class.in_flight(filename) == ("system", "3.sql")
+
+    # the csv loses the rows buffered in batches, the store commits them together with the marker
+    executed = [query for _, query, _, _ in result_class.executed(filename)]
+    if level == "query" or result_class is ResultStore:
+        assert executed == ["1.sql", "2.sql"]
+    else:
+        assert executed == []
+
+    # the resumed run records the crashed query as fatal
+    with result_class(filename, append=True, durability={"level": level}) as results:
+        results.start_olap("system", "3.sql")
+        results.olap("system", "dbms", "1.0", "3.sql", result(0.0, Result.FATAL))
+
+    assert result_class.in_flight(filename) is None
+    assert ("system", "3.sql", Result.FATAL) in [(title, query, state) for title, query, state, _ in result_class.executed(filename)]
+
+
+@pytest.mark.parametrize("marker", ["system,3.sql", ""])
+@pytest.mark.parametrize("index", [True, False])
+def test_resume_legacy_marker(tmp_path, marker, index):
+    filename = str(tmp_path / "results.csv")
+    with ResultCSV(filename) as results:
+        for query in ["1.sql", "2.sql"]:
+            results.start_olap("system", query)
+            results.olap("system", "dbms", "1.0", query, result(1.0))
+
+    # older versions had no index, or an index without markers, and kept the query in flight in a separate file
+    if index:
+        with open(filename + ".index", "r") as file:
+            records = [line for line in file if IN_FLIGHT not in line]
+        with open(filename + ".index", "w") as file:
+            file.writelines(records)
+    else:
+        os.remove(filename + ".index")
+    with open(filename + "_current", "w") as file:
+        file.write(marker)
+
+    assert [query for _, query, _, _ in ResultCSV.executed(filename)] == ["1.sql", "2.sql"]
+    assert ResultCSV.in_flight(filename) == (("system", "3.sql") if marker else None)
+    assert not os.path.exists(filename + "_current")
@@ -0,0 +1,100 @@
+import os
+
+from dbms.dbms import Result
+from util.resultcsv import ResultCSV
+from util.resultindex import IN_FLIGHT, ResultIndex
+
+
+def result(client_total: list[float], rows: list = None) -> Result:
+    result = Result()
+    result.state = Result.SUCCESS
+    result.client_total = client_total
+    result.result = rows
+    return result
+
+
+def write(filename: str, queries: int = 3):
+    with ResultCSV(filename) as results:
+        for i in range(1, queries + 1):
+            results.start_olap("system", f"{i}.sql")
+            # the result sets contain line breaks, so that rows span multiple lines
+            results.olap("system", "dbms", "1.0", f"{i}.sql", result([float(i), float(i) + 2.0], [[f"line\nbreak {i}"]]))
+
+
+def records(filename: str) -> list:
+    return ResultIndex(filename)._read()
+
+
+def test_executed(tmp_path):
+    filename = str(tmp_path / "results.csv")
+    write(filename)
+
+    index = ResultIndex(filename)
+    assert index.up_to_date()
+    assert index.executed() == [("system", f"{i}.sql", Result.SUCCESS, float(i) + 1.0) for i in [1, 2, 3]]
+    assert index.in_flight() is None
+
+    # every row is preceded by its in-flight marker
+    assert [record[2] for record in records(filename)] == [IN_FLIGHT, Result.SUCCESS] * 3
+
+
+def test_rebuild_missing_index(tmp_path):
+    filename = str(tmp_path / "results.csv")
+    write(filename)
+    expected = ResultIndex(filename).executed()
+
+    os.remove(filename + ".index")
+    index = ResultIndex(filename)
+    assert not index.up_to_date()
+    assert index.executed() == expected
+    assert index.up_to_date()
+
+
+def test_rebuild_stale_index(tmp_path):
+    filename = str(tmp_path / "results.csv")
+    write(filename)
+
+    # a record cut off by a crash is dropped, the index is rebuilt because it no longer matches the csv
+    with open(filename + ".index", "rb+") as file:
+        file.truncate(os.path.getsize(filename + ".index") - 3)
+    assert [query for _, query, _, _ in ResultIndex(filename).executed()] == ["1.sql", "2.sql", "3.sql"]
+
+
+def test_truncate_partial_row(tmp_path):
+    filename = str(tmp_path / "results.csv")
+    write(filename)
+    sizes = [int(record[4]) for record in records(filename) if record[2] != IN_FLIGHT]
+
+    # a crash while writing the last row leaves a partial row behind, which is truncated on resume
+    with open(filename, "rb+") as file:
+        file.truncate(sizes[-1] - 10)
+    os.remove(filename + ".index")
+
+    assert [query for _, query, _, _ in ResultCSV.executed(filename)] == ["1.sql", "2.sql"]
+    assert os.path.getsize(filename) == sizes[1]
+
+    # the resumed run appends to the truncated csv
+    with ResultCSV(filename, append=True) as results:
+        results.start_olap("system", "3.sql")
+        results.olap("system", "dbms", "1.0", "3.sql", result([3.0]))
+    assert [query for _, query, _, _ in ResultCSV.executed(filename)] == ["1.sql", "2.sql", "3.sql"]
+
+
+def test_rebuild_keeps_marker(tmp_path):
+    filename = str(tmp_path / "results.csv")
+    write(filename, queries=2)
+
+    # the index is ahead of the csv, if the rows buffered by the result csv were lost in a crash
+    results = ResultCSV(filename, append=True, durability={"level": "end"})
+    results.__enter__()
+    results.start_olap("system", "3.sql")
+    results.olap("system", "dbms", "1.0", "3.sql", result([3.0]))
+    results.start_olap("system", "4.sql")
+    results.file.close()
+    results.index.file.close()
+
+    index = ResultIndex(filename)
+    assert not index.up_to_date()
+    assert index.in_flight() == ("system", "4.sql")
+    assert [query for _, query, _, _ in index.executed()] == ["1.sql", "2.sql"]
+    assert index.up_to_date()
@@ -0,0 +1,127 @@
+import csv
+import os
+
+import duckdb
+import pytest
+import simplejson as json
+
+from dbms.dbms import Result
+from queryplan.plannode import LeafNode
+from queryplan.queryoperator import TableScan
+from queryplan.queryplan import QueryPlan, encode_query_plan
+from util import resultstore
+from util.planstore import PlanStore, plan_directory
+from util.resultcsv import ResultCSV
+from util.resultstore import ResultStore
+
+
+def query_plan(cardinality: int) -> QueryPlan:
+    scan = TableScan(1)
+    scan.table_name = "orders"
+    return QueryPlan(text="select * from orders", plan=LeafNode(scan, cardinality, cardinality, None))
+
+
+def result(client_total: float, rows: list = None, plan: QueryPlan = None) -> Result:
+    result = Result()
+    result.state = Result.SUCCESS
+    result.client_total = [client_total, client_total + 2.0]
+    result.total = [client_total]
+    result.rows = -1 if rows is None else len(rows)
+    result.result = rows
+    result.plan = plan
+    result.extra = {"peak_memory": 1024}
+    return result
+
+
+def write(result_class, filename: str):
+    plan_store = PlanStore(plan_directory(filename)) if result_class is ResultCSV else None
+    with result_class(filename, plan_store=plan_store) as results:
+        results.start_olap("system", "1.sql")
+        results.olap("system", "dbms", "1.0", "1.sql", result(1.0, [[1, "a"]], query_plan(10)))
+        results.start_olap("system", "2.sql")
+        results.olap("system", "dbms", "1.0", "2.sql", result(3.0, [], query_plan(20)))
+        results.start_olap("system", "3.sql")
+        results.olap("system", "dbms", "1.0", "3.sql", result(5.0))
+
+
+@pytest.mark.parametrize("result_class, extension", [(ResultCSV, ".csv"), (ResultStore, ".duckdb")])
+def test_round_trip(tmp_path, result_class, extension):
+    filename = str(tmp_path / ("results" + extension))
+    write(result_class, filename)
+
+    assert [(title, query, state) for title, query, state, _ in result_class.executed(filename)] == [("system", f"{i}.sql", Result.SUCCESS) for i in [1, 2, 3]]
+    assert result_class.in_flight(filename) is None
+
+    # both formats are read through the same view with the columns of the result csv
+    with resultstore.connect(filename) as connection:
+        cursor = connection.execute("select query, client_total, client_total_median, extra, result, plan from results_csv order by query")
+        rows = cursor.fetchall()
+
+    assert [row[0] for row in rows] == ["1.sql", "2.sql", "3.sql"]
+    assert [json.loads(row[1]) for row in rows] == [[1.0, 3.0], [3.0, 5.0], [5.0, 7.0]]
+    assert [float(row[2]) for row in rows] == [2.0, 4.0, 6.0]
+    assert json.loads(rows[0][3]) == {"peak_memory": 1024}
+
+    # the plans are merged back from the plan store or the side table
+    assert json.loads(rows[0][5]) == json.loads(encode_query_plan(query_plan(10)))
+    assert json.loads(rows[1][5]) == json.loads(encode_query_plan(query_plan(20)))
+    assert rows[2][5] is None or rows[2][5] == ""
+    assert json.loads(rows[0][4]) == [[1, "a"]]
+    assert json.loads(rows[1][4]) == []
+
+
+def test_side_tables(tmp_path):
+    filename = str(tmp_path / "results.duckdb")
+    write(ResultStore, filename)
+
+    with duckdb.connect(filename, read_only=True) as connection:
+        # only fetched, non-empty result sets are stored
+        assert connection.execute("select query from result_sets").fetchall() == [("1.sql",)]
+        # both plans have the same shape, which is stored once
+        assert connection.execute("select count(*) from plans").fetchone() == (3,)
+        cells = [cell for cell, in connection.execute("select plan from results order by query").fetchall()]
+        assert cells[0].split(":")[0] == cells[1].split(":")[0]
+        assert cells[2] is None
+
+
+def test_export_csv(tmp_path):
+    filename = str(tmp_path / "results.duckdb")
+    write(ResultStore, filename)
+
+    path = str(tmp_path / "export.csv")
+    resultstore.export_csv(filename, path)
+    with open(path, newline="") as file:
+        rows = list(csv.DictReader(file))
+
+    # the export has the columns of a result csv
+    assert list(rows[0].keys()) == ResultCSV("unused.csv").fieldnames
+    assert [row["query"] for row in rows] == ["1.sql", "2.sql", "3.sql"]
+    assert json.loads(rows[0]["plan"]) == json.loads(encode_query_plan(query_plan(10)))
+
+
+def test_export_parquet(tmp_path):
+    filename = str(tmp_path / "results.duckdb")
+    write(ResultStore, filename)
+
+    directory = str(tmp_path / "parquet")
+    resultstore.export_parquet(filename, directory)
+    assert sorted(os.listdir(directory)) == ["plans.parquet", "result_sets.parquet", "results.parquet"]
+
+
+def test_resume(tmp_path):
+    filename = str(tmp_path / "results.duckdb")
+    write(ResultStore, filename)
+
+    # appending keeps the rows of the previous run
+    with ResultStore(filename, append=True) as results:
+        results.start_olap("system", "4.sql")
+        results.olap("system", "dbms", "1.0", "4.sql", result(7.0))
+
+    assert [query for _, query, _, _ in ResultStore.executed(filename)] == ["1.sql", "2.sql", "3.sql", "4.sql"]
+
+    # a new run starts from an empty store
+    with ResultStore(filename) as results:
+        results.start_olap("system", "5.sql")
+        results.olap("system", "dbms", "1.0", "5.sql", result(9.0))
+
+    assert [query for _, query, _, _ in ResultStore.executed(filename)] == ["5.sql"]